@@ -2,16 +2,22 @@
 Accounting signals to automatically sync data with e-commerce operations
 """
 
+import logging
+
+from django.db import transaction
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from decimal import Decimal
 from orders.models import Order, OrderItem
+from orders.signals import orders_transitioned
 from products.models import Product
 from .models import (
     SalesRecord, InventoryTransaction, ProductCost,
     Invoice, ShippingLabel
 )
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_save, sender=Order)
 def create_sales_record(sender, instance, created, **kwargs):
@@ -112,6 +118,29 @@ def auto_generate_shipping_label(sender, instance, created, **kwargs):
             )
 
 
+# Statuses whose entry triggers one of the Order receivers above
+ACCOUNTING_STATUSES = ('confirmed', 'processing', 'completed')
+
+
+@receiver(orders_transitioned)
+def queue_transitioned_accounting(sender, orders, new_status, **kwargs):
+    """Bulk transitions skip post_save, so queue the accounting side effects"""
+    if new_status not in ACCOUNTING_STATUSES:
+        return
+    from .tasks import sync_transitioned_orders
+
+    order_ids = [order['id'] for order in orders]
+
+    def enqueue():
+        try:
+            sync_transitioned_orders.delay(order_ids)
+        except Exception as e:
+            logger.error(f"Could not queue accounting sync for {len(order_ids)} orders "
+                         f"(ids {order_ids[0]}-{order_ids[-1]}): {str(e)}")
+
+    transaction.on_commit(enqueue)
+
+
 @receiver(post_save, sender=ProductCost)
 def update_existing_inventory_costs(sender, instance, created, **kwargs):
     """Update inventory transaction costs when product cost is updated"""
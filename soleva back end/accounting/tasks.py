@@ -0,0 +1,40 @@
+from celery import shared_task
+from django.db import transaction
+import logging
+
+from orders.models import Order
+from . import signals
+
+logger = logging.getLogger(__name__)
+
+# The post_save receivers that bulk status transitions do not trigger
+ORDER_ACCOUNTING_RECEIVERS = (
+    signals.create_sales_record,
+    signals.create_inventory_transactions,
+    signals.auto_generate_invoice,
+    signals.auto_generate_shipping_label,
+)
+
+
+@shared_task
+def sync_transitioned_orders(order_ids):
+    """
+    Run the accounting side effects for orders moved by a bulk transition
+    """
+    try:
+        synced = 0
+        orders = Order.objects.filter(pk__in=order_ids).order_by('pk')
+        for order in orders.iterator(chunk_size=200):
+            for receiver in ORDER_ACCOUNTING_RECEIVERS:
+                try:
+                    with transaction.atomic():
+                        receiver(sender=Order, instance=order, created=False)
+                except Exception as e:
+                    logger.error(f"Error in {receiver.__name__} for order {order.pk}: {str(e)}")
+            synced += 1
+        logger.info(f"Synced accounting for {synced} transitioned orders")
+        return synced
+
+    except Exception as e:
+        logger.error(f"Error in sync_transitioned_orders task: {str(e)}")
+        return 0
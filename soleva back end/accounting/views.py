@@ -29,6 +29,8 @@ from .services import (
     invoice_generator, label_generator, report_service, calculation_service
 )
 from orders.models import Order
+from admin_panel.reports import ReportJobService
+from utils.db_router import ReplicaReadMixin, use_replica
 
 
 class SalesRecordViewSet(viewsets.ModelViewSet):
@@ -329,7 +331,7 @@ class ShippingLabelViewSet(viewsets.ModelViewSet):
         return response
 
 
-class FinancialReportViewSet(viewsets.ModelViewSet):
+class FinancialReportViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """Financial reports management"""
     queryset = FinancialReport.objects.all()
     serializer_class = FinancialReportSerializer
@@ -360,6 +362,21 @@ class FinancialReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if str(request.data.get('async', '')).lower() in ('1', 'true'):
+            # Long periods are generated by a worker; poll the returned job
+            try:
+                job, _ = ReportJobService.submit('financial', {
+                    'start_date': start_date.isoformat(),
+                    'end_date': end_date.isoformat(),
+                    'report_type': report_type,
+                }, request.user)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {'job_id': str(job.pk), 'status': job.status, 'progress': job.progress, 'result': job.result},
+                status=status.HTTP_202_ACCEPTED
+            )
+        
         try:
             with transaction.atomic():
                 report = report_service.generate_period_report(
@@ -422,6 +439,7 @@ class ExpenseCategoryViewSet(viewsets.ModelViewSet):
 # Dashboard API views
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
+@use_replica
 def dashboard_overview(request):
     """Get dashboard overview data"""
     today = timezone.now().date()
@@ -466,6 +484,7 @@ def dashboard_overview(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
+@use_replica
 def sales_chart_data(request):
     """Get sales chart data for dashboard"""
     days = int(request.query_params.get('days', 30))
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class AdminPanelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'admin_panel'
\ No newline at end of file
+    name = 'admin_panel'
+
+    def ready(self):
+        import admin_panel.signals
+        import utils.db_connections  # noqa: F401  (connection metrics receivers)
@@ -0,0 +1,189 @@
+"""
+Per-customer lifetime metrics and RFM segments
+
+Order changes refresh the metrics of the order's customer; ``rebuild``
+recomputes every customer from orders in bulk. Recency depends on the
+date alone, so ``rescore`` re-applies the recency scores and segments of
+all customers with two UPDATE statements every night.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Max, Min, Q, Sum, Value, When
+from django.utils import timezone
+
+from orders.models import Order
+from .models import CustomerMetrics
+
+# Days since the last order for recency scores 5, 4, 3 and 2 (older scores 1)
+RFM_RECENCY_DAYS = getattr(settings, 'RFM_RECENCY_DAYS', [30, 60, 120, 240])
+
+# Paid orders for frequency scores 5, 4, 3 and 2
+RFM_FREQUENCY_ORDERS = getattr(settings, 'RFM_FREQUENCY_ORDERS', [10, 5, 3, 2])
+
+# Lifetime value (EGP) for monetary scores 5, 4, 3 and 2
+RFM_MONETARY_VALUES = getattr(settings, 'RFM_MONETARY_VALUES', [10000, 5000, 2000, 1000])
+
+# First matching rule wins; customers matching none need attention
+SEGMENT_RULES = [
+    ('prospect', {'paid_order_count': 0}),
+    ('champions', {'recency_score__gte': 4, 'frequency_score__gte': 4}),
+    ('loyal', {'frequency_score__gte': 4}),
+    ('new', {'recency_score__gte': 4, 'frequency_score__lte': 1}),
+    ('potential_loyalist', {'recency_score__gte': 4}),
+    ('at_risk', {'recency_score__lte': 2, 'frequency_score__gte': 3}),
+    ('hibernating', {'recency_score__lte': 2}),
+]
+DEFAULT_SEGMENT = 'need_attention'
+
+PAID = Q(payment_status='paid')
+
+BATCH_SIZE = 1000
+
+
+def threshold_score(value, thresholds) -> int:
+    """5 for the first threshold reached, down to 1 when none is"""
+    for index, threshold in enumerate(thresholds):
+        if value >= threshold:
+            return 5 - index
+    return 1
+
+
+def recency_score(last_order_at, now) -> int:
+    if last_order_at is None:
+        return 1
+    for index, days in enumerate(RFM_RECENCY_DAYS):
+        if last_order_at >= now - timedelta(days=days):
+            return 5 - index
+    return 1
+
+
+def rule_matches(values: Dict, lookups: Dict) -> bool:
+    for lookup, expected in lookups.items():
+        field, _, operator = lookup.partition('__')
+        value = values[field]
+        if operator == 'gte' and not value >= expected:
+            return False
+        if operator == 'lte' and not value <= expected:
+            return False
+        if not operator and value != expected:
+            return False
+    return True
+
+
+def segment_for(values: Dict) -> str:
+    for segment, lookups in SEGMENT_RULES:
+        if rule_matches(values, lookups):
+            return segment
+    return DEFAULT_SEGMENT
+
+
+class CustomerMetricsService:
+    """Maintain and query CustomerMetrics"""
+
+    @staticmethod
+    def order_aggregates() -> Dict:
+        return dict(
+            order_count=Count('pk'),
+            paid_order_count=Count('pk', filter=PAID),
+            lifetime_value=Sum('total_amount', filter=PAID),
+            first_order_at=Min('created_at'),
+            last_order_at=Max('created_at'),
+        )
+
+    @staticmethod
+    def build(user_id: int, row: Dict, now) -> CustomerMetrics:
+        """Metrics and scores of one customer from their order aggregates"""
+        lifetime_value = row['lifetime_value'] or Decimal('0.00')
+        paid_order_count = row['paid_order_count']
+        values = {
+            'paid_order_count': paid_order_count,
+            'recency_score': recency_score(row['last_order_at'], now),
+            'frequency_score': threshold_score(paid_order_count, RFM_FREQUENCY_ORDERS),
+            'monetary_score': threshold_score(lifetime_value, RFM_MONETARY_VALUES),
+        }
+        return CustomerMetrics(
+            user_id=user_id,
+            order_count=row['order_count'],
+            lifetime_value=lifetime_value,
+            average_order_value=(lifetime_value / paid_order_count).quantize(Decimal('0.01')) if paid_order_count else Decimal('0.00'),
+            first_order_at=row['first_order_at'],
+            last_order_at=row['last_order_at'],
+            segment=segment_for(values),
+            **values,
+        )
+
+    @staticmethod
+    def refresh_customer(user_id: Optional[int]) -> Optional[CustomerMetrics]:
+        """Recompute one customer from their orders (an indexed aggregate)"""
+        if user_id is None:
+            return None
+        row = Order.objects.filter(user_id=user_id).aggregate(**CustomerMetricsService.order_aggregates())
+        if not row['order_count']:
+            CustomerMetrics.objects.filter(user_id=user_id).delete()
+            return None
+
+        metrics = CustomerMetricsService.build(user_id, row, timezone.now())
+        fields = [field.name for field in CustomerMetrics._meta.concrete_fields if field.name != 'user']
+        CustomerMetrics.objects.update_or_create(
+            user_id=user_id, defaults={field: getattr(metrics, field) for field in fields}
+        )
+        return metrics
+
+    @staticmethod
+    def order_changed(user_id: Optional[int]) -> None:
+        """Refresh a customer once the order change is committed"""
+        transaction.on_commit(lambda: CustomerMetricsService.refresh_customer(user_id))
+
+    @staticmethod
+    def rebuild() -> int:
+        """Recompute every customer from orders; returns rows written"""
+        now = timezone.now()
+        rows = Order.objects.values('user_id').annotate(
+            **CustomerMetricsService.order_aggregates()
+        ).order_by()
+
+        written = 0
+        with transaction.atomic():
+            CustomerMetrics.objects.all().delete()
+            batch = []
+            for row in rows.iterator(chunk_size=BATCH_SIZE):
+                batch.append(CustomerMetricsService.build(row['user_id'], row, now))
+                if len(batch) >= BATCH_SIZE:
+                    CustomerMetrics.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            CustomerMetrics.objects.bulk_create(batch)
+            written += len(batch)
+        return written
+
+    @staticmethod
+    def rescore() -> int:
+        """Re-apply recency scores and segments as time passes; returns rows updated"""
+        now = timezone.now()
+        updated = CustomerMetrics.objects.update(recency_score=Case(
+            *[
+                When(last_order_at__gte=now - timedelta(days=days), then=Value(5 - index))
+                for index, days in enumerate(RFM_RECENCY_DAYS)
+            ],
+            default=Value(1),
+        ))
+        CustomerMetrics.objects.update(segment=Case(
+            *[When(Q(**lookups), then=Value(segment)) for segment, lookups in SEGMENT_RULES],
+            default=Value(DEFAULT_SEGMENT),
+        ))
+        return updated
+
+    # Readers
+
+    @staticmethod
+    def top_customers(since=None, limit: int = 10):
+        """Customers by lifetime value, optionally only those who ordered since ``since``"""
+        metrics = CustomerMetrics.objects.filter(user__is_staff=False)
+        if since is not None:
+            metrics = metrics.filter(last_order_at__gte=since)
+        return metrics.select_related('user').order_by('-lifetime_value')[:limit]
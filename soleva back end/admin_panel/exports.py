@@ -0,0 +1,255 @@
+"""
+Streaming file exports of the admin reports
+
+Rows are read in keyset-paginated chunks (rows after the last one seen,
+EXPORT_CHUNK_SIZE at a time) so memory stays bounded whatever the table
+size, without server-side cursors, which pgbouncer in transaction mode
+rules out. CSV is written to the response as rows are
+fetched; XLSX is assembled by xlsxwriter in constant-memory mode in a
+temporary file, which is then streamed. Rows past the worksheet limit of
+Excel continue on another worksheet, each with its own header row.
+"""
+
+import csv
+import io
+import re
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+import xlsxwriter
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from orders.models import Order
+from products.models import Product
+from users.models import User
+from .sales import day_start
+
+# Rows fetched per database round trip
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+# Rows written to the CSV buffer before it is flushed to the response
+CSV_FLUSH_ROWS = 500
+
+EXPORT_FORMATS = ['csv', 'xlsx']
+
+# Rows an Excel worksheet can hold, header included; xlsxwriter ignores writes past it
+XLSX_MAX_ROWS = 1048576
+
+# Leading characters that make spreadsheet applications evaluate a cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Phone numbers and signed amounts are left as they are
+PLAIN_NUMBER = re.compile(r'^[+-]?[\d.\s]+$')
+
+
+class ExportSpec(NamedTuple):
+    """Columns of an export, the queryset producing its rows and their unique ordering"""
+    columns: List[Tuple[str, str]]
+    queryset: Callable[[Dict], object]
+    keyset: Tuple[str, ...]
+
+
+def after(keyset: Tuple[str, ...], values: Tuple) -> Q:
+    """Rows that come after ``values`` in ascending ``keyset`` order"""
+    condition = Q(**{f'{keyset[-1]}__gt': values[-1]})
+    for field, value in zip(reversed(keyset[:-1]), reversed(values[:-1])):
+        condition = Q(**{f'{field}__gt': value}) | (Q(**{field: value}) & condition)
+    return condition
+
+
+def export_period(params) -> Tuple[date, date]:
+    """[start, end] days from ``days`` or ``start_date``/``end_date``; raises ValueError"""
+    today = timezone.localdate()
+    if params.get('start_date') or params.get('end_date'):
+        start = date.fromisoformat(params.get('start_date', ''))
+        end = date.fromisoformat(params['end_date']) if params.get('end_date') else today
+    else:
+        days = int(params.get('days', 30))
+        if days < 1:
+            raise ValueError('days must be positive')
+        start, end = today - timedelta(days=days), today
+    if start > end:
+        raise ValueError('start_date is after end_date')
+    return start, end
+
+
+def order_rows(params):
+    start, end = export_period(params)
+    orders = Order.objects.filter(
+        created_at__gte=day_start(start), created_at__lt=day_start(end + timedelta(days=1))
+    )
+    for field in ['status', 'payment_status', 'payment_method']:
+        if params.get(field):
+            orders = orders.filter(**{field: params[field]})
+    return orders
+
+
+def customer_rows(params):
+    return User.objects.filter(is_staff=False).annotate(
+        order_count=Count('orders'),
+        total_spent=Sum('orders__total_amount', filter=Q(orders__payment_status='paid')),
+    )
+
+
+def inventory_rows(params):
+    products = Product.objects.filter(is_active=True)
+    if params.get('low_stock') in ('1', 'true'):
+        products = products.filter(track_inventory=True, inventory_quantity__lte=F('low_stock_threshold'))
+    return products
+
+
+EXPORTS = {
+    'orders': ExportSpec(
+        columns=[
+            ('Order number', 'order_number'),
+            ('Created at', 'created_at'),
+            ('Status', 'status'),
+            ('Payment status', 'payment_status'),
+            ('Payment method', 'payment_method'),
+            ('Customer name', 'customer_name'),
+            ('Customer email', 'customer_email'),
+            ('Customer phone', 'customer_phone'),
+            ('Governorate', 'shipping_governorate'),
+            ('City', 'shipping_city'),
+            ('Subtotal', 'subtotal'),
+            ('Shipping cost', 'shipping_cost'),
+            ('Discount', 'discount_amount'),
+            ('Total', 'total_amount'),
+            ('Coupon', 'coupon_code'),
+        ],
+        queryset=order_rows,
+        keyset=('created_at', 'id'),
+    ),
+    'customers': ExportSpec(
+        columns=[
+            ('ID', 'id'),
+            ('Email', 'email'),
+            ('First name', 'first_name'),
+            ('Last name', 'last_name'),
+            ('Phone', 'phone_number'),
+            ('Verified', 'is_verified'),
+            ('Active', 'is_active'),
+            ('Joined', 'date_joined'),
+            ('Orders', 'order_count'),
+            ('Total spent (paid)', 'total_spent'),
+        ],
+        queryset=customer_rows,
+        keyset=('id',),
+    ),
+    'inventory': ExportSpec(
+        columns=[
+            ('ID', 'id'),
+            ('SKU', 'sku'),
+            ('Name', 'name_en'),
+            ('Category', 'category__name_en'),
+            ('Price', 'price'),
+            ('Track inventory', 'track_inventory'),
+            ('Inventory quantity', 'inventory_quantity'),
+            ('Low stock threshold', 'low_stock_threshold'),
+        ],
+        queryset=inventory_rows,
+        keyset=('inventory_quantity', 'id'),
+    ),
+}
+
+
+class ReportExporter:
+    """Render an export as a CSV stream or an XLSX file"""
+
+    @staticmethod
+    def cell(value):
+        """Plain value for a cell (local times, strings for phone numbers and the like)"""
+        if value is None:
+            return ''
+        if isinstance(value, datetime):
+            return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, (bool, int, float, Decimal, str)):
+            return value
+        return str(value)
+
+    @staticmethod
+    def csv_cell(value):
+        """Quote text that a spreadsheet would otherwise run as a formula"""
+        if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not PLAIN_NUMBER.match(value):
+            return f"'{value}"
+        return value
+
+    @staticmethod
+    def rows(name: str, params) -> Tuple[List[str], Iterator[Tuple]]:
+        """Header and a lazy row iterator; raises KeyError/ValueError on a bad request"""
+        spec = EXPORTS[name]
+        header = [title for title, _ in spec.columns]
+        width = len(spec.columns)
+        queryset = spec.queryset(params).order_by(*spec.keyset).values_list(
+            *[field for _, field in spec.columns], *spec.keyset
+        )
+        # Streamed responses are iterated after the view returns; keep the
+        # database (a replica) routed while the view ran
+        queryset = queryset.using(queryset.db)
+
+        def chunks():
+            last = None
+            while True:
+                page = queryset if last is None else queryset.filter(after(spec.keyset, last))
+                chunk = list(page[:EXPORT_CHUNK_SIZE])
+                for row in chunk:
+                    yield [ReportExporter.cell(value) for value in row[:width]]
+                if len(chunk) < EXPORT_CHUNK_SIZE:
+                    return
+                last = chunk[-1][width:]
+
+        return header, chunks()
+
+    @staticmethod
+    def csv_stream(header: List[str], rows: Iterable[List]) -> Iterator[str]:
+        """CSV text, flushed every CSV_FLUSH_ROWS rows"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # Byte order mark so Excel opens Arabic text as UTF-8
+        buffer.write('\ufeff')
+        writer.writerow(header)
+
+        pending = 0
+        for row in rows:
+            writer.writerow([ReportExporter.csv_cell(value) for value in row])
+            pending += 1
+            if pending >= CSV_FLUSH_ROWS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+                pending = 0
+        yield buffer.getvalue()
+
+    @staticmethod
+    def xlsx_file(header: List[str], rows: Iterable[List], title: str):
+        """Temporary file holding the workbook, positioned at its start"""
+        output = tempfile.TemporaryFile()
+        workbook = xlsxwriter.Workbook(output, {
+            'constant_memory': True,
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+        })
+        bold = workbook.add_format({'bold': True})
+
+        sheets = 0
+        index = XLSX_MAX_ROWS
+        for row in rows:
+            if index >= XLSX_MAX_ROWS:
+                sheets += 1
+                suffix = f' ({sheets})' if sheets > 1 else ''
+                worksheet = workbook.add_worksheet(title[:31 - len(suffix)] + suffix)
+                worksheet.write_row(0, 0, header, bold)
+                index = 1
+            worksheet.write_row(index, 0, [float(value) if isinstance(value, Decimal) else value for value in row])
+            index += 1
+        if not sheets:
+            workbook.add_worksheet(title[:31]).write_row(0, 0, header, bold)
+        workbook.close()
+        output.seek(0)
+        return output
@@ -0,0 +1,95 @@
+"""
+Measure the connection setup overhead persistent connections remove
+
+Concurrent threads replay request cycles (request_started, a small query,
+request_finished, as the WSGI handler does) once with connections closed
+after every request and once with them kept for ``--conn-max-age``.
+"""
+
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+from utils.db_connections import ConnectionMetrics
+
+
+class Command(BaseCommand):
+    help = 'Compare request latency with per-request and persistent database connections under concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='Request cycles per thread')
+        parser.add_argument('--queries', type=int, default=3, help='Queries per request')
+        parser.add_argument('--conn-max-age', type=int, default=60)
+        parser.add_argument('--database', default='default')
+
+    def request_cycles(self, alias: str, requests: int, queries: int, timings: List[float]) -> None:
+        connection = connections[alias]
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    for _ in range(queries):
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+                request_finished.send(sender=self.__class__)
+                timings.append(time.perf_counter() - start)
+        finally:
+            connection.close()
+
+    def run(self, alias: str, conn_max_age: int, options) -> Dict:
+        settings_dict = connections.settings[alias]
+        previous = settings_dict.get('CONN_MAX_AGE', 0)
+        settings_dict['CONN_MAX_AGE'] = conn_max_age
+        connections[alias].close()
+        opened_before = ConnectionMetrics.snapshot()['databases'][alias]['connections_opened']
+
+        timings: List[float] = []
+        threads = [
+            threading.Thread(target=self.request_cycles, args=(alias, options['requests'], options['queries'], timings))
+            for _ in range(options['threads'])
+        ]
+        start = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            settings_dict['CONN_MAX_AGE'] = previous
+        elapsed = time.perf_counter() - start
+
+        timings.sort()
+        return {
+            'requests': len(timings),
+            'connections': ConnectionMetrics.snapshot()['databases'][alias]['connections_opened'] - opened_before,
+            'mean_ms': statistics.mean(timings) * 1000,
+            'p95_ms': timings[int(len(timings) * 0.95) - 1] * 1000,
+            'throughput': len(timings) / elapsed,
+        }
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in connections:
+            raise CommandError(f'Unknown database: {alias}')
+        if connections[alias].vendor == 'sqlite' and connections[alias].is_in_memory_db():
+            raise CommandError('In-memory SQLite databases cannot be shared between threads')
+
+        results = {
+            'per-request': self.run(alias, 0, options),
+            'persistent': self.run(alias, options['conn_max_age'], options),
+        }
+        self.stdout.write(f"{'mode':<12} {'requests':>9} {'connections':>12} {'mean ms':>9} {'p95 ms':>9} {'req/s':>9}")
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<12} {result['requests']:>9} {result['connections']:>12} "
+                f"{result['mean_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['throughput']:>9.0f}"
+            )
+        saved = results['per-request']['mean_ms'] - results['persistent']['mean_ms']
+        self.stdout.write(self.style.SUCCESS(f'Connection setup removed: {saved:.2f} ms per request'))
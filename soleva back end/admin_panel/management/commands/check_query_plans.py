@@ -0,0 +1,142 @@
+"""
+EXPLAIN the hottest order and product queries and check they use an index
+
+Run against a database seeded with realistic volumes (a staging copy). On
+small tables PostgreSQL rightly prefers sequential scans, so by default the
+plans are taken with ``enable_seqscan`` off: the check is then whether an
+index *can* serve the query. Pass ``--planner-choice`` to keep the planner's
+own choice once the tables are large enough for it to matter.
+"""
+
+from datetime import timedelta
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from orders.models import Order, OrderStatusHistory
+from products.models import Product
+
+# Plan fragments showing an index lookup, per database vendor
+INDEX_SCANS = {
+    'postgresql': ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan'),
+    'sqlite': ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY KEY', 'USING PRIMARY KEY'),
+}
+
+
+class QueryPlan(NamedTuple):
+    """A hot query and the index expected to serve it (any index when None)"""
+    name: str
+    queryset: Callable[[], object]
+    index: Optional[Tuple] = None
+    vendors: Tuple[str, ...] = ('postgresql', 'sqlite')
+
+
+def index_name(model, *fields) -> str:
+    """Name Django gave the Meta index on ``fields``, or a named functional index"""
+    for index in model._meta.indexes:
+        if tuple(index.fields) == fields or index.name in fields:
+            return index.name
+    raise LookupError(f'{model.__name__} has no index on {fields}')
+
+
+def recent():
+    return timezone.now() - timedelta(days=30)
+
+
+QUERY_PLANS = [
+    QueryPlan(
+        'track_order',
+        lambda: Order.objects.filter(order_number='SOL-00000000'),
+    ),
+    QueryPlan(
+        'orders_by_customer_email',
+        lambda: Order.objects.filter(customer_email__iexact='customer@example.com'),
+        index=(Order, 'orders_customer_email_ci_idx'),
+        # SQLite turns iexact into LIKE, which no index serves
+        vendors=('postgresql',),
+    ),
+    QueryPlan(
+        'orders_by_status_and_date',
+        lambda: Order.objects.filter(status='pending', created_at__gte=recent()).order_by('-created_at'),
+        index=(Order, 'status', 'created_at'),
+    ),
+    QueryPlan(
+        'paid_orders_by_date',
+        lambda: Order.objects.filter(payment_status='paid', created_at__gte=recent()),
+        index=(Order, 'payment_status', 'created_at'),
+    ),
+    QueryPlan(
+        'customer_orders',
+        lambda: Order.objects.filter(user_id=1).order_by('-created_at'),
+        index=(Order, 'user', 'created_at'),
+    ),
+    QueryPlan(
+        'order_timeline',
+        lambda: OrderStatusHistory.objects.filter(order_id=1).order_by('created_at'),
+        index=(OrderStatusHistory, 'order', 'created_at'),
+    ),
+    QueryPlan(
+        'product_listing',
+        lambda: Product.objects.filter(is_active=True).order_by('-created_at')[:20],
+        index=(Product, 'is_active', 'created_at'),
+        # SQLite cannot match a bare boolean column (WHERE is_active) to an index
+        vendors=('postgresql',),
+    ),
+    QueryPlan(
+        'category_listing',
+        lambda: Product.objects.filter(category_id=1, is_active=True),
+        index=(Product, 'category', 'is_active'),
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot order/product queries and fail when one does not use its index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=len(QUERY_PLANS), help='Check only the first N queries')
+        parser.add_argument('--planner-choice', action='store_true',
+                            help="Keep sequential scans enabled (meaningful on production-sized data)")
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only failures')
+
+    def explain(self, queryset) -> str:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql' and not self.planner_choice:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def plan_problem(self, plan: QueryPlan, text: str) -> Optional[str]:
+        """Why the plan fails, or None"""
+        if not any(scan in text for scan in INDEX_SCANS[connection.vendor]):
+            return 'no index scan'
+        if plan.index is not None:
+            expected = index_name(*plan.index)
+            if expected not in text:
+                return f'expected index {expected}'
+        return None
+
+    def handle(self, *args, **options):
+        if connection.vendor not in INDEX_SCANS:
+            raise CommandError(f'Query plans cannot be checked on {connection.vendor}')
+        self.planner_choice = options['planner_choice']
+
+        failures = []
+        for plan in QUERY_PLANS[:options['top']]:
+            if connection.vendor not in plan.vendors:
+                self.stdout.write(f'SKIP {plan.name} (not applicable to {connection.vendor})')
+                continue
+            text = self.explain(plan.queryset())
+            problem = self.plan_problem(plan, text)
+            if problem:
+                failures.append(plan.name)
+                self.stdout.write(self.style.ERROR(f'FAIL {plan.name}: {problem}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK   {plan.name}'))
+            if problem or options['verbose_plans']:
+                self.stdout.write(text)
+
+        if failures:
+            raise CommandError(f"{len(failures)} queries do not use their index: {', '.join(failures)}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from admin_panel.customers import CustomerMetricsService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-customer lifetime metrics and RFM segments from orders'
+
+    def handle(self, *args, **options):
+        written = CustomerMetricsService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt metrics for {written} customers'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from admin_panel.sales import SalesFactService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales facts behind the admin dashboards from orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Number of past days to rebuild (default: all order history)')
+
+    def handle(self, *args, **options):
+        written = SalesFactService.rebuild_all(options['days'])
+        period = f'the last {options["days"]} days' if options['days'] else 'all order history'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} sales fact rows for {period}'))
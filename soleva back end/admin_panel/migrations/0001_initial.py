@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('product_id', models.PositiveIntegerField(verbose_name='product ID')),
+                ('payment_status', models.CharField(max_length=20, verbose_name='payment status')),
+                ('product_name', models.CharField(max_length=255, verbose_name='product name')),
+                ('quantity', models.IntegerField(default=0, verbose_name='quantity')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='revenue')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'Daily Product Sales Fact',
+                'verbose_name_plural': 'Daily Product Sales Facts',
+                'db_table': 'admin_daily_product_sales_facts',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='day')),
+                ('status', models.CharField(max_length=20, verbose_name='status')),
+                ('payment_status', models.CharField(max_length=20, verbose_name='payment status')),
+                ('payment_method', models.CharField(max_length=50, verbose_name='payment method')),
+                ('governorate', models.CharField(blank=True, max_length=100, verbose_name='governorate')),
+                ('orders', models.IntegerField(default=0, verbose_name='orders')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='revenue')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'Daily Sales Fact',
+                'verbose_name_plural': 'Daily Sales Facts',
+                'db_table': 'admin_daily_sales_facts',
+                'indexes': [models.Index(fields=['day', 'payment_status'], name='admin_daily_day_9fd70d_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailysalesfact',
+            constraint=models.UniqueConstraint(fields=('day', 'status', 'payment_status', 'payment_method', 'governorate'), name='unique_daily_sales_fact'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyproductsalesfact',
+            index=models.Index(fields=['day', 'payment_status'], name='admin_daily_day_f3e80c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyproductsalesfact',
+            constraint=models.UniqueConstraint(fields=('day', 'product_id', 'payment_status'), name='unique_daily_product_sales_fact'),
+        ),
+    ]
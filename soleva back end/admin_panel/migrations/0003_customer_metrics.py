@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('admin_panel', '0002_report_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerMetrics',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='customer_metrics', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='order count')),
+                ('paid_order_count', models.PositiveIntegerField(default=0, verbose_name='paid order count')),
+                ('lifetime_value', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='lifetime value')),
+                ('average_order_value', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='average order value')),
+                ('first_order_at', models.DateTimeField(blank=True, null=True, verbose_name='first order at')),
+                ('last_order_at', models.DateTimeField(blank=True, null=True, verbose_name='last order at')),
+                ('recency_score', models.PositiveSmallIntegerField(default=1, verbose_name='recency score')),
+                ('frequency_score', models.PositiveSmallIntegerField(default=1, verbose_name='frequency score')),
+                ('monetary_score', models.PositiveSmallIntegerField(default=1, verbose_name='monetary score')),
+                ('segment', models.CharField(choices=[('champions', 'Champions'), ('loyal', 'Loyal'), ('potential_loyalist', 'Potential Loyalist'), ('new', 'New'), ('need_attention', 'Need Attention'), ('at_risk', 'At Risk'), ('hibernating', 'Hibernating'), ('prospect', 'Prospect')], default='prospect', max_length=20, verbose_name='segment')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'Customer Metrics',
+                'verbose_name_plural': 'Customer Metrics',
+                'db_table': 'admin_customer_metrics',
+                'indexes': [models.Index(fields=['-lifetime_value'], name='admin_custo_lifetim_31ef14_idx'), models.Index(fields=['-order_count'], name='admin_custo_order_c_9a6b9f_idx'), models.Index(fields=['last_order_at'], name='admin_custo_last_or_e191bd_idx'), models.Index(fields=['segment', '-lifetime_value'], name='admin_custo_segment_c48498_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:29
+
+import admin_panel.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0003_customer_metrics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='result_file',
+            field=models.FileField(blank=True, storage=admin_panel.models.private_storage, upload_to=admin_panel.models.report_file_path, verbose_name='result file'),
+        ),
+    ]
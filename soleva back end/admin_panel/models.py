@@ -0,0 +1,200 @@
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class PrivateFileStorage(FileSystemStorage):
+    """Files outside MEDIA_ROOT, served only by API views that check permissions"""
+
+    def url(self, name):
+        raise ValueError('Private files have no public URL')
+
+
+def private_storage():
+    return PrivateFileStorage(location=settings.PRIVATE_MEDIA_ROOT)
+
+
+def report_file_path(instance, filename):
+    # A random directory keeps paths unguessable while the download keeps its readable name
+    return f'reports/{timezone.now():%Y/%m}/{uuid.uuid4().hex}/{filename}'
+
+
+class DailySalesFact(models.Model):
+    """Orders and order value per day, status, payment status, payment method and governorate"""
+
+    day = models.DateField(_('day'))
+    status = models.CharField(_('status'), max_length=20)
+    payment_status = models.CharField(_('payment status'), max_length=20)
+    payment_method = models.CharField(_('payment method'), max_length=50)
+    governorate = models.CharField(_('governorate'), max_length=100, blank=True)
+
+    # Aggregates (signed so a transition can be applied as -1/+1 in any order)
+    orders = models.IntegerField(_('orders'), default=0)
+    revenue = models.DecimalField(_('revenue'), max_digits=14, decimal_places=2, default=0)
+
+    # Timestamps
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Daily Sales Fact')
+        verbose_name_plural = _('Daily Sales Facts')
+        db_table = 'admin_daily_sales_facts'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'status', 'payment_status', 'payment_method', 'governorate'],
+                name='unique_daily_sales_fact'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'payment_status']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}/{self.payment_status}: {self.orders} orders"
+
+
+class DailyProductSalesFact(models.Model):
+    """Units and line revenue per day, product and order payment status"""
+
+    day = models.DateField(_('day'))
+    product_id = models.PositiveIntegerField(_('product ID'))
+    payment_status = models.CharField(_('payment status'), max_length=20)
+    product_name = models.CharField(_('product name'), max_length=255)
+
+    # Aggregates
+    quantity = models.IntegerField(_('quantity'), default=0)
+    revenue = models.DecimalField(_('revenue'), max_digits=14, decimal_places=2, default=0)
+
+    # Timestamps
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Daily Product Sales Fact')
+        verbose_name_plural = _('Daily Product Sales Facts')
+        db_table = 'admin_daily_product_sales_facts'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'product_id', 'payment_status'],
+                name='unique_daily_product_sales_fact'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'payment_status']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_name}: {self.quantity} sold"
+
+
+class ReportJob(models.Model):
+    """A report computed in the background; identical requests share one job"""
+
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('running', _('Running')),
+        ('completed', _('Completed')),
+        ('failed', _('Failed')),
+    ]
+    ACTIVE_STATUSES = ['pending', 'running']
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    report = models.CharField(_('report'), max_length=50)
+    params = models.JSONField(_('parameters'), default=dict, blank=True)
+    params_hash = models.CharField(_('parameters hash'), max_length=64)
+
+    # Progress
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(_('progress'), default=0)
+    error = models.TextField(_('error'), blank=True)
+
+    # Result (JSON reports) or file (exports)
+    result = models.JSONField(_('result'), blank=True, null=True, encoder=DjangoJSONEncoder)
+    result_file = models.FileField(_('result file'), upload_to=report_file_path, storage=private_storage, blank=True)
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True,
+        related_name='report_jobs'
+    )
+
+    # Timestamps
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    started_at = models.DateTimeField(_('started at'), blank=True, null=True)
+    finished_at = models.DateTimeField(_('finished at'), blank=True, null=True)
+    expires_at = models.DateTimeField(_('expires at'), blank=True, null=True)
+
+    class Meta:
+        verbose_name = _('Report Job')
+        verbose_name_plural = _('Report Jobs')
+        db_table = 'admin_report_jobs'
+        ordering = ['-created_at']
+        constraints = [
+            # At most one computation in flight per report and parameters
+            models.UniqueConstraint(
+                fields=['params_hash'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_report_job'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['params_hash', 'status']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.report} ({self.status}, {self.progress}%)"
+
+
+class CustomerMetrics(models.Model):
+    """Lifetime order metrics and RFM scores of a customer"""
+
+    SEGMENT_CHOICES = [
+        ('champions', _('Champions')),
+        ('loyal', _('Loyal')),
+        ('potential_loyalist', _('Potential Loyalist')),
+        ('new', _('New')),
+        ('need_attention', _('Need Attention')),
+        ('at_risk', _('At Risk')),
+        ('hibernating', _('Hibernating')),
+        ('prospect', _('Prospect')),
+    ]
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+        related_name='customer_metrics'
+    )
+
+    # Lifetime metrics (value counts paid orders only)
+    order_count = models.PositiveIntegerField(_('order count'), default=0)
+    paid_order_count = models.PositiveIntegerField(_('paid order count'), default=0)
+    lifetime_value = models.DecimalField(_('lifetime value'), max_digits=14, decimal_places=2, default=0)
+    average_order_value = models.DecimalField(_('average order value'), max_digits=12, decimal_places=2, default=0)
+    first_order_at = models.DateTimeField(_('first order at'), blank=True, null=True)
+    last_order_at = models.DateTimeField(_('last order at'), blank=True, null=True)
+
+    # RFM scores (1-5) and segment
+    recency_score = models.PositiveSmallIntegerField(_('recency score'), default=1)
+    frequency_score = models.PositiveSmallIntegerField(_('frequency score'), default=1)
+    monetary_score = models.PositiveSmallIntegerField(_('monetary score'), default=1)
+    segment = models.CharField(_('segment'), max_length=20, choices=SEGMENT_CHOICES, default='prospect')
+
+    # Timestamps
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Customer Metrics')
+        verbose_name_plural = _('Customer Metrics')
+        db_table = 'admin_customer_metrics'
+        indexes = [
+            models.Index(fields=['-lifetime_value']),
+            models.Index(fields=['-order_count']),
+            models.Index(fields=['last_order_at']),
+            models.Index(fields=['segment', '-lifetime_value']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.segment} ({self.lifetime_value})"
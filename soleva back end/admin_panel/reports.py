@@ -0,0 +1,362 @@
+"""
+Admin reports computed in the background
+
+A report is submitted with its parameters and gets a ReportJob; a Celery
+worker computes it, updating the job's progress, and stores the result as
+JSON on the job or as a file (exports). Jobs are keyed by a hash of the
+report and its normalised parameters: a request matching a job in flight,
+or a finished one that has not expired, gets that job instead of starting
+another computation.
+"""
+
+import hashlib
+import json
+import logging
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from accounting.models import FinancialReport
+from accounting.serializers import FinancialReportSerializer
+from accounting.services import report_service
+from coupons.serializers import CouponBulkGenerateSerializer
+from coupons.services import CouponBulkService
+from users.models import User
+from utils.db_router import replica_reads
+from .customers import CustomerMetricsService
+from .exports import EXPORTS, EXPORT_CHUNK_SIZE, EXPORT_FORMATS, ReportExporter, export_period
+from .models import ReportJob
+from .sales import SalesFactService, day_start
+
+logger = logging.getLogger(__name__)
+
+# Finished results are reused for identical requests for this many seconds
+REPORT_JOB_RESULT_TTL = getattr(settings, 'REPORT_JOB_RESULT_TTL', 900)
+
+# A job still pending or running after this many seconds is considered lost
+REPORT_JOB_TIMEOUT = getattr(settings, 'REPORT_JOB_TIMEOUT', 1800)
+
+# Finished jobs and their files are deleted after this many days
+REPORT_JOB_RETENTION_DAYS = getattr(settings, 'REPORT_JOB_RETENTION_DAYS', 7)
+
+EXPORT_PARAMS = ['days', 'start_date', 'end_date', 'status', 'payment_status', 'payment_method', 'low_stock']
+
+
+class ReportSpec(NamedTuple):
+    """Parameter normaliser and builder of a report; file reports return (filename, file)"""
+    params: Callable[[Dict], Dict]
+    build: Callable[[Dict, Callable[[int], None]], object]
+    file: bool = False
+
+
+# Parameters
+
+def days_params(params) -> Dict:
+    days = int(params.get('days', 30))
+    if not 1 <= days <= 3650:
+        raise ValueError('days must be between 1 and 3650')
+    return {'days': days}
+
+
+def financial_params(params) -> Dict:
+    start = date.fromisoformat(str(params.get('start_date', '')))
+    end = date.fromisoformat(str(params.get('end_date', '')))
+    report_type = params.get('report_type', 'custom')
+    if start > end:
+        raise ValueError('start_date is after end_date')
+    if report_type not in dict(FinancialReport.REPORT_TYPES):
+        raise ValueError(f'Unknown report_type: {report_type}')
+    return {'start_date': start.isoformat(), 'end_date': end.isoformat(), 'report_type': report_type}
+
+
+def export_params(name: str) -> Callable[[Dict], Dict]:
+    def normalise(params) -> Dict:
+        normalised = {key: str(params[key]) for key in EXPORT_PARAMS if params.get(key) not in (None, '')}
+        normalised['file_format'] = params.get('file_format', 'xlsx')
+        if normalised['file_format'] not in EXPORT_FORMATS:
+            raise ValueError(f"file_format must be one of: {', '.join(EXPORT_FORMATS)}")
+        if name == 'orders':
+            start, end = export_period(normalised)
+            for key in ['days', 'start_date', 'end_date']:
+                normalised.pop(key, None)
+            normalised.update({'start_date': start.isoformat(), 'end_date': end.isoformat()})
+        return normalised
+    return normalise
+
+
+def coupon_campaign_params(params) -> Dict:
+    serializer = CouponBulkGenerateSerializer(data=params)
+    if not serializer.is_valid():
+        raise ValueError(json.dumps(serializer.errors))
+    return json.loads(json.dumps(serializer.validated_data, cls=DjangoJSONEncoder))
+
+
+# Builders
+
+def sales_report_data(params, progress=None) -> Dict:
+    """Sales summary, payment method breakdown and daily trend"""
+    days = params['days']
+    start_date = timezone.localdate() - timedelta(days=days)
+
+    # Sales summary
+    summary = SalesFactService.facts(start_date).aggregate(
+        total_orders=Sum('orders'),
+        paid_orders=Sum('orders', filter=Q(payment_status='paid')),
+        total_revenue=Sum('revenue', filter=Q(payment_status='paid')),
+    )
+    total_orders = summary['total_orders'] or 0
+    paid_orders = summary['paid_orders'] or 0
+    total_revenue = summary['total_revenue'] or Decimal('0.00')
+
+    # Payment method breakdown
+    payment_methods = SalesFactService.breakdown(
+        'payment_method', start_date, payment_status='paid'
+    ).order_by('-revenue')
+
+    # Daily sales trend
+    daily_sales = SalesFactService.daily_sales(start_date)
+
+    return {
+        'summary': {
+            'total_orders': total_orders,
+            'paid_orders': paid_orders,
+            'total_revenue': total_revenue,
+            'conversion_rate': (paid_orders / total_orders * 100) if total_orders > 0 else 0,
+        },
+        'payment_methods': list(payment_methods),
+        'daily_sales': list(daily_sales),
+        'period_days': days,
+    }
+
+
+def customer_report_data(params, progress=None) -> Dict:
+    """Customer counts and top customers by paid lifetime value"""
+    days = params['days']
+    start_date = timezone.localdate() - timedelta(days=days)
+    customers = User.objects.filter(is_staff=False)
+
+    # Customer summary and segments
+    summary = customers.aggregate(
+        total_customers=Count('pk', filter=Q(is_active=True)),
+        new_customers=Count('pk', filter=Q(date_joined__date__gte=start_date)),
+        verified_customers=Count('pk', filter=Q(is_active=True, is_verified=True)),
+    )
+    if progress:
+        progress(30)
+
+    # Customer activity
+    active_customers = customers.filter(
+        orders__created_at__date__gte=start_date
+    ).distinct().count()
+    if progress:
+        progress(60)
+
+    # Top customers by lifetime value among those who ordered in the period
+    top_customers = CustomerMetricsService.top_customers(day_start(start_date))
+
+    total_customers = summary['total_customers']
+    verified_customers = summary['verified_customers']
+    return {
+        'summary': {
+            'total_customers': total_customers,
+            'new_customers': summary['new_customers'],
+            'active_customers': active_customers,
+            'verified_customers': verified_customers,
+            'verification_rate': (verified_customers / total_customers * 100) if total_customers > 0 else 0,
+        },
+        'top_customers': [
+            {
+                'id': metrics.user_id,
+                'full_name': metrics.user.full_name,
+                'email': metrics.user.email,
+                'total_spent': metrics.lifetime_value,
+                'order_count': metrics.order_count,
+                'paid_order_count': metrics.paid_order_count,
+                'segment': metrics.segment,
+            }
+            for metrics in top_customers
+        ],
+        'period_days': days,
+    }
+
+
+def financial_report_data(params, progress=None) -> Dict:
+    """Accounting period report (stored as a FinancialReport with its PDF and Excel files)"""
+    with transaction.atomic():
+        report = report_service.generate_period_report(
+            date.fromisoformat(params['start_date']),
+            date.fromisoformat(params['end_date']),
+            params['report_type']
+        )
+    return FinancialReportSerializer(report).data
+
+
+def export_file(name: str) -> Callable:
+    def build(params, progress) -> Tuple[str, object]:
+        total = EXPORTS[name].queryset(params).count()
+        header, rows = ReportExporter.rows(name, params)
+
+        def counted(rows):
+            for index, row in enumerate(rows, start=1):
+                if index % EXPORT_CHUNK_SIZE == 0:
+                    progress(index * 100 // max(total, 1))
+                yield row
+
+        file_format = params['file_format']
+        if file_format == 'xlsx':
+            output = ReportExporter.xlsx_file(header, counted(rows), name)
+        else:
+            output = tempfile.TemporaryFile()
+            for text in ReportExporter.csv_stream(header, counted(rows)):
+                output.write(text.encode('utf-8'))
+            output.seek(0)
+        return f"{name}-{timezone.localtime().strftime('%Y%m%d%H%M%S')}.{file_format}", output
+    return build
+
+
+def coupon_campaign_file(params, progress) -> Tuple[str, object]:
+    """Generate a coupon campaign and store its codes as CSV"""
+    serializer = CouponBulkGenerateSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    template = dict(serializer.validated_data)
+    count = template.pop('count')
+    length = template.pop('length')
+    prefix = template.pop('prefix')
+
+    output = tempfile.TemporaryFile()
+    # All or nothing, like the synchronous endpoint
+    with transaction.atomic():
+        code_chunks = CouponBulkService.generate(count, template, length=length, prefix=prefix)
+        for text in CouponBulkService.csv_rows(code_chunks, template):
+            output.write(text.encode('utf-8'))
+    output.seek(0)
+    return f"coupons-{prefix or 'campaign'}-{timezone.localtime().strftime('%Y%m%d%H%M%S')}.csv", output
+
+
+REPORTS = {
+    'sales': ReportSpec(params=days_params, build=sales_report_data),
+    'customers': ReportSpec(params=days_params, build=customer_report_data),
+    'financial': ReportSpec(params=financial_params, build=financial_report_data),
+    'coupon_campaign': ReportSpec(params=coupon_campaign_params, build=coupon_campaign_file, file=True),
+    **{
+        f'{name}_export': ReportSpec(params=export_params(name), build=export_file(name), file=True)
+        for name in EXPORTS
+    },
+}
+
+
+class ReportJobService:
+    """Submit, run and clean up background report jobs"""
+
+    @staticmethod
+    def params_hash(report: str, params: Dict) -> str:
+        canonical = json.dumps([report, params], sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def submit(report: str, params, user=None) -> Tuple[ReportJob, bool]:
+        """(job, created): a reusable job for these parameters or a new one; raises KeyError/ValueError"""
+        params = REPORTS[report].params(params)
+        params_hash = ReportJobService.params_hash(report, params)
+        now = timezone.now()
+
+        # A job whose worker died never finishes; let a new one replace it
+        ReportJob.objects.filter(
+            params_hash=params_hash,
+            status__in=ReportJob.ACTIVE_STATUSES,
+            created_at__lt=now - timedelta(seconds=REPORT_JOB_TIMEOUT)
+        ).update(status='failed', error='Timed out', finished_at=now)
+
+        existing = ReportJobService.reusable(params_hash, now)
+        if existing is not None:
+            return existing, False
+
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(
+                    report=report, params=params, params_hash=params_hash, requested_by=user
+                )
+        except IntegrityError:
+            # The same report was submitted concurrently
+            existing = ReportJobService.reusable(params_hash, now)
+            if existing is None:
+                raise
+            return existing, False
+
+        transaction.on_commit(lambda: ReportJobService.enqueue(job))
+        return job, True
+
+    @staticmethod
+    def reusable(params_hash: str, now) -> Optional[ReportJob]:
+        return ReportJob.objects.filter(params_hash=params_hash).filter(
+            Q(status__in=ReportJob.ACTIVE_STATUSES) | Q(status='completed', expires_at__gt=now)
+        ).order_by('-created_at').first()
+
+    @staticmethod
+    def enqueue(job: ReportJob) -> None:
+        from .tasks import run_report_job
+
+        try:
+            run_report_job.delay(str(job.pk))
+        except Exception as e:
+            logger.error(f"Could not queue report job {job.pk}: {str(e)}")
+            ReportJob.objects.filter(pk=job.pk).update(
+                status='failed', error='Could not queue the report', finished_at=timezone.now()
+            )
+
+    @staticmethod
+    def run(job_id) -> Optional[ReportJob]:
+        """Compute a pending job; None when another worker already claimed it"""
+        claimed = ReportJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', started_at=timezone.now()
+        )
+        if not claimed:
+            return None
+        job = ReportJob.objects.get(pk=job_id)
+        spec = REPORTS[job.report]
+
+        def progress(percent: int) -> None:
+            ReportJob.objects.filter(pk=job.pk).update(progress=max(0, min(int(percent), 99)))
+
+        try:
+            # Progress updates touch only ReportJob, so report reads stay on the replica
+            with replica_reads():
+                output = spec.build(job.params, progress)
+            if spec.file:
+                filename, handle = output
+                try:
+                    job.result_file.save(filename, File(handle), save=False)
+                finally:
+                    handle.close()
+            else:
+                job.result = output
+            job.status = 'completed'
+            job.progress = 100
+            job.expires_at = timezone.now() + timedelta(seconds=REPORT_JOB_RESULT_TTL)
+        except Exception as e:
+            logger.error(f"Report job {job.pk} ({job.report}) failed: {str(e)}")
+            job.status = 'failed'
+            job.error = str(e)
+
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'progress', 'result', 'result_file', 'error', 'expires_at', 'finished_at'])
+        return job
+
+    @staticmethod
+    def cleanup(days: int = REPORT_JOB_RETENTION_DAYS) -> int:
+        """Delete jobs created more than ``days`` days ago, with their files"""
+        old_jobs = ReportJob.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=days)
+        ).exclude(status__in=ReportJob.ACTIVE_STATUSES)
+        for job in old_jobs.exclude(result_file='').only('pk', 'result_file').iterator():
+            job.result_file.delete(save=False)
+        deleted, _ = old_jobs.delete()
+        return deleted
@@ -0,0 +1,250 @@
+"""
+Daily sales facts read by the admin dashboards
+
+Order saves move an order's contribution between fact buckets as its
+status, payment status or totals change, so dashboards sum a few rows per
+day instead of scanning orders. The deltas are computed when the order
+changes but applied once its transaction commits, in a short transaction
+of their own that locks fact rows in key order: checkouts do not hold the
+shared per-day rows, and two of them cannot deadlock on them. ``rebuild`` recomputes a range of days from
+the raw rows (backfills and drift repair).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from .models import DailySalesFact, DailyProductSalesFact
+
+logger = logging.getLogger(__name__)
+
+ORDER_FACT_FIELDS = ['status', 'payment_status', 'payment_method', 'shipping_governorate', 'total_amount']
+ORDER_KEY_FIELDS = ['day', 'status', 'payment_status', 'payment_method', 'governorate']
+PRODUCT_KEY_FIELDS = ['day', 'product_id', 'payment_status']
+
+# Days re-synchronised from raw orders by the nightly reconciliation
+SALES_FACT_RECONCILE_DAYS = 3
+
+
+def order_day(created_at) -> date:
+    return timezone.localtime(created_at).date()
+
+
+def day_start(day: date) -> datetime:
+    """Aware local midnight starting ``day``"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def order_state(order: Order, values: Optional[Dict] = None) -> Optional[Tuple]:
+    """(fact key, revenue) an order contributes, or None before it is saved
+
+    ``values`` supplies fields (as stored) that the instance has deferred.
+    """
+    if order.pk is None:
+        return None
+    fields = {
+        field: values[field] if values and field in values else getattr(order, field)
+        for field in ORDER_FACT_FIELDS + ['created_at']
+    }
+    if fields['created_at'] is None:
+        return None
+    key = (
+        order_day(fields['created_at']), fields['status'], fields['payment_status'],
+        fields['payment_method'], fields['shipping_governorate'] or '',
+    )
+    return key, fields['total_amount'] or Decimal('0.00')
+
+
+class SalesFactService:
+    """Maintain and read DailySalesFact / DailyProductSalesFact"""
+
+    @staticmethod
+    def apply(model, key_fields, deltas: Dict[Tuple, Dict], names: Optional[Dict] = None) -> None:
+        """Add signed deltas to fact rows, creating missing ones, in key order"""
+        # Missing product ids (deleted products) sort first instead of failing to compare
+        for key, values in sorted(deltas.items(), key=lambda item: [(part is not None, part) for part in item[0]]):
+            if not any(values.values()):
+                continue
+            lookup = dict(zip(key_fields, key))
+            defaults = {'product_name': names[key]} if names else {}
+            fact, _ = model.objects.get_or_create(**lookup, defaults=defaults)
+            changes = {field: F(field) + value for field, value in values.items()}
+            if names and fact.product_name != names[key]:
+                changes['product_name'] = names[key]
+            model.objects.filter(pk=fact.pk).update(updated_at=timezone.now(), **changes)
+
+    @staticmethod
+    def record(order_deltas: Optional[Dict] = None, item_changes: Iterable[Tuple[Tuple, Dict, int]] = ()) -> None:
+        """Apply order fact deltas and (bucket, item values, sign) product changes once committed"""
+        product_deltas = defaultdict(lambda: {'quantity': 0, 'revenue': Decimal('0.00')})
+        names = {}
+        for (day, payment_status), item, sign in item_changes:
+            key = (day, item['product_id'], payment_status)
+            product_deltas[key]['quantity'] += sign * item['quantity']
+            product_deltas[key]['revenue'] += sign * item['total_price']
+            names[key] = item['product_name'][:255]
+        if not order_deltas and not product_deltas:
+            return
+
+        def apply_committed():
+            with transaction.atomic():
+                if order_deltas:
+                    SalesFactService.apply(DailySalesFact, ORDER_KEY_FIELDS, order_deltas)
+                if product_deltas:
+                    SalesFactService.apply(DailyProductSalesFact, PRODUCT_KEY_FIELDS, product_deltas, names)
+
+        # A failure here must not fail the committed order; the nightly
+        # reconciliation repairs the facts
+        transaction.on_commit(apply_committed, robust=True)
+
+    @staticmethod
+    def order_changed(previous: Optional[Tuple], current: Optional[Tuple], order_id: int) -> None:
+        """Move an order (and its items) from its previous bucket to its current one"""
+        if previous == current:
+            return
+
+        deltas = defaultdict(lambda: {'orders': 0, 'revenue': Decimal('0.00')})
+        if previous:
+            deltas[previous[0]]['orders'] -= 1
+            deltas[previous[0]]['revenue'] -= previous[1]
+        if current:
+            deltas[current[0]]['orders'] += 1
+            deltas[current[0]]['revenue'] += current[1]
+
+        # Product facts follow the order's payment status; new and deleted
+        # orders are covered by the item signals
+        item_changes = []
+        if previous and current and previous[0][2] != current[0][2]:
+            items = list(OrderItem.objects.filter(order_id=order_id).values(
+                'product_id', 'product_name', 'quantity', 'total_price'
+            ))
+            item_changes = (
+                [((previous[0][0], previous[0][2]), item, -1) for item in items] +
+                [((current[0][0], current[0][2]), item, 1) for item in items]
+            )
+        SalesFactService.record(deltas, item_changes)
+
+    @staticmethod
+    def status_changed(orders: Iterable[Dict], new_status: str) -> None:
+        """Move bulk-transitioned orders (values before the change) to ``new_status`` in one pass"""
+        deltas = defaultdict(lambda: {'orders': 0, 'revenue': Decimal('0.00')})
+        for order in orders:
+            day = order_day(order['created_at'])
+            rest = (order['payment_status'], order['payment_method'], order['shipping_governorate'] or '')
+            revenue = order['total_amount'] or Decimal('0.00')
+            deltas[(day, order['status']) + rest]['orders'] -= 1
+            deltas[(day, order['status']) + rest]['revenue'] -= revenue
+            deltas[(day, new_status) + rest]['orders'] += 1
+            deltas[(day, new_status) + rest]['revenue'] += revenue
+        SalesFactService.record(deltas)
+
+    @staticmethod
+    def items_changed(changes: Iterable[Tuple[Tuple, Dict, int]]) -> None:
+        """Apply (bucket, item values, sign) changes to the product facts"""
+        SalesFactService.record(item_changes=changes)
+
+    @staticmethod
+    def rebuild(start: date, end: date) -> int:
+        """Recompute the facts of days in [start, end) from orders; returns rows written"""
+        orders = Order.objects.filter(created_at__gte=day_start(start), created_at__lt=day_start(end)).annotate(
+            day=TruncDate('created_at')
+        )
+        order_facts = [
+            DailySalesFact(
+                day=row['day'],
+                status=row['status'],
+                payment_status=row['payment_status'],
+                payment_method=row['payment_method'],
+                governorate=row['shipping_governorate'] or '',
+                orders=row['orders'],
+                revenue=row['revenue'] or Decimal('0.00'),
+            )
+            for row in orders.values(
+                'day', 'status', 'payment_status', 'payment_method', 'shipping_governorate'
+            ).annotate(orders=Count('id'), revenue=Sum('total_amount')).order_by()
+        ]
+
+        items = OrderItem.objects.filter(
+            order__created_at__gte=day_start(start), order__created_at__lt=day_start(end)
+        ).annotate(day=TruncDate('order__created_at'))
+        product_facts = [
+            DailyProductSalesFact(
+                day=row['day'],
+                product_id=row['product_id'],
+                payment_status=row['order__payment_status'],
+                product_name=row['name'][:255],
+                quantity=row['units'] or 0,
+                revenue=row['line_revenue'] or Decimal('0.00'),
+            )
+            for row in items.values('day', 'product_id', 'order__payment_status').annotate(
+                name=Max('product_name'), units=Sum('quantity'), line_revenue=Sum('total_price')
+            ).order_by()
+        ]
+
+        with transaction.atomic():
+            DailySalesFact.objects.filter(day__gte=start, day__lt=end).delete()
+            DailyProductSalesFact.objects.filter(day__gte=start, day__lt=end).delete()
+            DailySalesFact.objects.bulk_create(order_facts, batch_size=1000)
+            DailyProductSalesFact.objects.bulk_create(product_facts, batch_size=1000)
+        return len(order_facts) + len(product_facts)
+
+    @staticmethod
+    def rebuild_all(days: Optional[int] = None, chunk_days: int = 31) -> int:
+        """Backfill the last ``days`` days (all order history when None), a month at a time"""
+        end = timezone.localdate() + timedelta(days=1)
+        if days is None:
+            first = Order.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            if first is None:
+                return 0
+            start = order_day(first)
+        else:
+            start = end - timedelta(days=days)
+
+        written = 0
+        while start < end:
+            chunk_end = min(start + timedelta(days=chunk_days), end)
+            written += SalesFactService.rebuild(start, chunk_end)
+            start = chunk_end
+        return written
+
+    # Readers
+
+    @staticmethod
+    def facts(since: Optional[date] = None, until: Optional[date] = None):
+        facts = DailySalesFact.objects.all()
+        if since is not None:
+            facts = facts.filter(day__gte=since)
+        if until is not None:
+            facts = facts.filter(day__lte=until)
+        return facts
+
+    @staticmethod
+    def daily_sales(since: date, payment_status: str = 'paid'):
+        """Orders and revenue per day"""
+        return SalesFactService.facts(since).filter(payment_status=payment_status).values('day').annotate(
+            orders=Sum('orders'), revenue=Sum('revenue')
+        ).order_by('day')
+
+    @staticmethod
+    def breakdown(field: str, since: date, **filters):
+        """Orders and revenue per value of one dimension"""
+        return SalesFactService.facts(since).filter(**filters).values(field).annotate(
+            count=Sum('orders'), revenue=Sum('revenue')
+        ).exclude(count=0)
+
+    @staticmethod
+    def top_products(since: date, limit: int = 10, payment_status: str = 'paid'):
+        """Best selling products by units"""
+        return DailyProductSalesFact.objects.filter(day__gte=since, payment_status=payment_status).values(
+            'product_name'
+        ).annotate(
+            quantity_sold=Sum('quantity'), revenue=Sum('revenue')
+        ).filter(quantity_sold__gt=0).order_by('-quantity_sold')[:limit]
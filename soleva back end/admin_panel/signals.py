@@ -0,0 +1,150 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from orders.signals import orders_transitioned
+from utils.live_metrics import LiveMetrics
+from .customers import CustomerMetricsService
+from .sales import SalesFactService, ORDER_FACT_FIELDS, order_day, order_state
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_SALES_STATE = object()
+
+ORDER_ITEM_FACT_FIELDS = ['product_id', 'product_name', 'quantity', 'total_price']
+
+
+@receiver(post_save, sender=Order)
+def count_live_order(sender, instance, created, **kwargs):
+    """Add new orders to the live dashboard counters once they are committed"""
+    if created:
+        transaction.on_commit(lambda: LiveMetrics.record_order(instance.total_amount))
+
+
+@receiver(post_save, sender=Cart)
+def touch_live_cart(sender, instance, **kwargs):
+    """Mark a cart as active on the live dashboard"""
+    LiveMetrics.touch_cart(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CartItem)
+def touch_live_cart_item(sender, instance, **kwargs):
+    """Cart item changes keep their cart active"""
+    LiveMetrics.touch_cart(instance.cart_id)
+
+
+@receiver(post_init, sender=Order)
+def remember_sales_state(sender, instance, **kwargs):
+    """Keep the fact bucket an order was loaded with, to diff against on save"""
+    if instance.get_deferred_fields().intersection(ORDER_FACT_FIELDS + ['created_at']):
+        instance._sales_state = UNKNOWN_SALES_STATE
+    else:
+        instance._sales_state = order_state(instance)
+
+
+def unsaved_values(instance, fields, update_fields):
+    """Stored values of ``fields`` the save did not write (deferred or left out of update_fields)"""
+    unsaved = instance.get_deferred_fields().intersection(fields)
+    if update_fields is not None:
+        unsaved |= set(fields) - set(update_fields)
+    if not unsaved:
+        return {}
+    return type(instance).objects.filter(pk=instance.pk).values(*unsaved).first() or {}
+
+
+@receiver([pre_save, pre_delete], sender=Order)
+def load_sales_state(sender, instance, raw=False, **kwargs):
+    """Read the stored bucket of an order loaded without its fact fields"""
+    if raw or instance._sales_state is not UNKNOWN_SALES_STATE:
+        return
+    stored = Order.objects.filter(pk=instance.pk).values(*ORDER_FACT_FIELDS, 'created_at').first()
+    instance._sales_state = order_state(instance, stored) if stored else None
+
+
+@receiver(post_save, sender=Order)
+def update_sales_facts(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Move the order between sales fact buckets (and refresh its customer) when its status or totals change"""
+    if raw:
+        return
+    previous = instance._sales_state
+    current = order_state(instance, unsaved_values(instance, ORDER_FACT_FIELDS + ['created_at'], update_fields))
+    SalesFactService.order_changed(previous, current, instance.pk)
+    if previous != current:
+        CustomerMetricsService.order_changed(instance.user_id)
+    instance._sales_state = current
+
+
+@receiver(pre_delete, sender=Order)
+def load_deleted_order_customer(sender, instance, **kwargs):
+    """Load a deferred customer while the row still exists, for the metrics refresh"""
+    if 'user_id' in instance.get_deferred_fields():
+        instance.refresh_from_db(fields=['user_id'])
+
+
+@receiver(post_delete, sender=Order)
+def remove_sales_facts(sender, instance, **kwargs):
+    """Take a deleted order out of the sales facts and its customer's metrics"""
+    SalesFactService.order_changed(instance._sales_state, None, instance.pk)
+    CustomerMetricsService.order_changed(instance.user_id)
+
+
+@receiver(orders_transitioned, sender=Order)
+def move_transitioned_sales_facts(sender, orders, new_status, **kwargs):
+    """Move a batch of bulk status transitions between sales fact buckets"""
+    # Customer metrics do not depend on order status, so they need no refresh
+    SalesFactService.status_changed(orders, new_status)
+
+
+@receiver(post_init, sender=OrderItem)
+def remember_item_state(sender, instance, **kwargs):
+    """Keep the values an order line was loaded with"""
+    if instance.pk is None:
+        instance._sales_item = None
+    elif instance.get_deferred_fields().intersection(ORDER_ITEM_FACT_FIELDS):
+        instance._sales_item = UNKNOWN_SALES_STATE
+    else:
+        instance._sales_item = {field: getattr(instance, field) for field in ORDER_ITEM_FACT_FIELDS}
+
+
+@receiver([pre_save, pre_delete], sender=OrderItem)
+def load_item_state(sender, instance, raw=False, **kwargs):
+    """Read the stored values of an order line loaded without its fact fields"""
+    if raw or instance._sales_item is not UNKNOWN_SALES_STATE:
+        return
+    instance._sales_item = OrderItem.objects.filter(pk=instance.pk).values(*ORDER_ITEM_FACT_FIELDS).first()
+
+
+def item_bucket(order_id):
+    """(day, payment status) of the order a line belongs to"""
+    order = Order.objects.filter(pk=order_id).values('created_at', 'payment_status').first()
+    return (order_day(order['created_at']), order['payment_status']) if order else None
+
+
+@receiver(post_save, sender=OrderItem)
+def update_product_sales_facts(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Add an order line (or its change) to the product sales facts"""
+    if raw:
+        return
+    stored = unsaved_values(instance, ORDER_ITEM_FACT_FIELDS, update_fields)
+    current = {field: stored[field] if field in stored else getattr(instance, field) for field in ORDER_ITEM_FACT_FIELDS}
+    if current == instance._sales_item:
+        return
+    bucket = item_bucket(instance.order_id)
+    if bucket:
+        changes = [(bucket, current, 1)]
+        if instance._sales_item:
+            changes.append((bucket, instance._sales_item, -1))
+        SalesFactService.items_changed(changes)
+    instance._sales_item = current
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_product_sales_facts(sender, instance, **kwargs):
+    """Take a deleted order line out of the product sales facts"""
+    bucket = item_bucket(instance.order_id)
+    if bucket and instance._sales_item:
+        SalesFactService.items_changed([(bucket, instance._sales_item, -1)])
@@ -0,0 +1,71 @@
+from celery import shared_task
+import logging
+
+from .customers import CustomerMetricsService
+from .reports import ReportJobService
+from .sales import SalesFactService, SALES_FACT_RECONCILE_DAYS
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reconcile_sales_facts():
+    """
+    Re-sync the sales facts of recent days with the raw orders
+    """
+    try:
+        written = SalesFactService.rebuild_all(SALES_FACT_RECONCILE_DAYS)
+        logger.info(f"Reconciled {written} sales fact rows")
+        return written
+
+    except Exception as e:
+        logger.error(f"Error in reconcile_sales_facts task: {str(e)}")
+        return 0
+
+
+@shared_task
+def run_report_job(job_id):
+    """
+    Compute a queued report job
+    """
+    try:
+        job = ReportJobService.run(job_id)
+        if job is None:
+            logger.info(f"Report job {job_id} was already claimed")
+            return None
+        logger.info(f"Report job {job_id} finished: {job.status}")
+        return job.status
+
+    except Exception as e:
+        logger.error(f"Error in run_report_job task: {str(e)}")
+        return 0
+
+
+@shared_task
+def cleanup_report_jobs():
+    """
+    Delete old report jobs and their files
+    """
+    try:
+        deleted = ReportJobService.cleanup()
+        logger.info(f"Deleted {deleted} old report jobs")
+        return deleted
+
+    except Exception as e:
+        logger.error(f"Error in cleanup_report_jobs task: {str(e)}")
+        return 0
+
+
+@shared_task
+def rescore_customer_metrics():
+    """
+    Re-apply the time-dependent RFM scores and segments
+    """
+    try:
+        updated = CustomerMetricsService.rescore()
+        logger.info(f"Rescored {updated} customers")
+        return updated
+
+    except Exception as e:
+        logger.error(f"Error in rescore_customer_metrics task: {str(e)}")
+        return 0
@@ -12,14 +12,24 @@ urlpatterns = [
     path('stats/sales/', views.sales_stats, name='sales_stats'),
     path('stats/customers/', views.customer_stats, name='customer_stats'),
     path('stats/products/', views.product_stats, name='product_stats'),
+    path('stats/live/', views.live_stats, name='live_stats'),
+    path('stats/live/stream/', views.live_stats_stream, name='live_stats_stream'),
+    path('stats/live/stream/token/', views.live_stats_stream_token, name='live_stats_stream_token'),
     
     # Reports
     path('reports/sales/', views.sales_report, name='sales_report'),
     path('reports/customers/', views.customer_report, name='customer_report'),
     path('reports/inventory/', views.inventory_report, name='inventory_report'),
+    path('reports/<str:report>/export/', views.export_report, name='export_report'),
+    path('reports/jobs/', views.submit_report_job, name='submit_report_job'),
+    path('reports/jobs/<uuid:job_id>/', views.report_job_detail, name='report_job_detail'),
+    path('reports/jobs/<uuid:job_id>/download/', views.report_job_download, name='report_job_download'),
     
     # Quick actions
     path('actions/low-stock/', views.low_stock_products, name='low_stock_products'),
     path('actions/pending-orders/', views.pending_orders, name='pending_orders'),
     path('actions/recent-customers/', views.recent_customers, name='recent_customers'),
+    
+    # System
+    path('system/db-connections/', views.database_connections, name='database_connections'),
 ]
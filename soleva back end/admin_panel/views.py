@@ -1,37 +1,83 @@
-from rest_framework import permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework import permissions, status
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.decorators import (
+    api_view, permission_classes, authentication_classes, renderer_classes, throttle_classes
+)
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import Token
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.db.models import Count, Sum, Avg, Q, F
-from django.db import models
+from django.db import connections, models
 from django.utils import timezone
 from datetime import timedelta, date
 from decimal import Decimal
+import asyncio
+import json
+import time
 
 from users.models import User
 from products.models import Product, Category
 from orders.models import Order
 from tracking.models import TrackingEvent
+from utils.db_connections import ConnectionMetrics
+from utils.db_router import use_replica
+from utils.live_metrics import LiveMetrics, LIVE_METRICS_INTERVAL
+from utils.stats import StatsQuery
+from .customers import CustomerMetricsService
+from .exports import EXPORTS, EXPORT_FORMATS, ReportExporter
+from .models import ReportJob
+from .reports import REPORTS, ReportJobService, customer_report_data, days_params, sales_report_data
+from .sales import SalesFactService, day_start
+
+# Rows of the low stock list returned by inventory_report
+LOW_STOCK_REPORT_LIMIT = 100
+
+# A stream is closed after this many seconds; the client fetches a new stream token and reconnects
+LIVE_STREAM_DURATION = 300
+LIVE_STREAM_RETRY_MS = 2000
+
+# Stream tokens travel in the URL (and so in access logs): single use, and only this long
+LIVE_STREAM_TOKEN_LIFETIME = 60
+
+# Comment frame interval; keeps proxies from timing out an idle stream
+LIVE_STREAM_KEEPALIVE = 15
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def admin_dashboard(request):
     """Admin dashboard overview"""
-    today = timezone.now().date()
+    today = timezone.localdate()
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
     
+    # Order figures come from the daily sales facts
+    sales = SalesFactService.facts().aggregate(
+        total_orders=Sum('orders'),
+        today_orders=Sum('orders', filter=Q(day=today)),
+        today_revenue=Sum('revenue', filter=Q(day=today, payment_status='paid')),
+        pending_orders=Sum('orders', filter=Q(status='pending')),
+    )
+    
     # Quick stats
-    total_orders = Order.objects.count()
+    total_orders = sales['total_orders'] or 0
     total_customers = User.objects.filter(is_active=True, is_staff=False).count()
     total_products = Product.objects.filter(is_active=True).count()
     
     # Today's stats
-    today_orders = Order.objects.filter(created_at__date=today).count()
-    today_revenue = Order.objects.filter(
-        created_at__date=today,
-        payment_status='paid'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
+    today_orders = sales['today_orders'] or 0
+    today_revenue = sales['today_revenue'] or Decimal('0.00')
     
     # Recent activity
     recent_orders = Order.objects.select_related('user').order_by('-created_at')[:5]
@@ -41,7 +87,7 @@ def admin_dashboard(request):
     ).order_by('-date_joined')[:5]
     
     # Pending actions
-    pending_orders = Order.objects.filter(status='pending').count()
+    pending_orders = sales['pending_orders'] or 0
     low_stock_products = Product.objects.filter(
         track_inventory=True,
         inventory_quantity__lte=F('low_stock_threshold')
@@ -88,49 +134,60 @@ def admin_dashboard(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def overview_stats(request):
     """Overview statistics"""
-    today = timezone.now().date()
+    today = timezone.localdate()
     yesterday = today - timedelta(days=1)
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
     
-    # Orders stats
-    total_orders = Order.objects.count()
-    today_orders = Order.objects.filter(created_at__date=today).count()
-    yesterday_orders = Order.objects.filter(created_at__date=yesterday).count()
-    week_orders = Order.objects.filter(created_at__date__gte=week_ago).count()
-    month_orders = Order.objects.filter(created_at__date__gte=month_ago).count()
-    
-    # Revenue stats
-    total_revenue = Order.objects.filter(
-        payment_status='paid'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-    
-    today_revenue = Order.objects.filter(
-        created_at__date=today,
-        payment_status='paid'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-    
-    yesterday_revenue = Order.objects.filter(
-        created_at__date=yesterday,
-        payment_status='paid'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
+    # Orders and revenue stats from the daily sales facts
+    key = f'overview:global:{today.isoformat()}'
+    paid = Q(payment_status='paid')
+    sales = StatsQuery(SalesFactService.facts()).sum(
+        'total_orders', 'orders', default=0
+    ).sum(
+        'today_orders', 'orders', default=0, day=today
+    ).sum(
+        'yesterday_orders', 'orders', default=0, day=yesterday
+    ).sum(
+        'week_orders', 'orders', default=0, day__gte=week_ago
+    ).sum(
+        'month_orders', 'orders', default=0, day__gte=month_ago
+    ).sum(
+        'total_revenue', 'revenue', paid
+    ).sum(
+        'today_revenue', 'revenue', paid, day=today
+    ).sum(
+        'yesterday_revenue', 'revenue', paid, day=yesterday
+    ).cached(f'{key}:sales')
+    total_orders = sales['total_orders']
+    today_orders = sales['today_orders']
+    yesterday_orders = sales['yesterday_orders']
+    week_orders = sales['week_orders']
+    month_orders = sales['month_orders']
+    total_revenue = sales['total_revenue']
+    today_revenue = sales['today_revenue']
+    yesterday_revenue = sales['yesterday_revenue']
     
     # Customer stats
-    total_customers = User.objects.filter(is_active=True, is_staff=False).count()
-    new_customers_today = User.objects.filter(
-        date_joined__date=today,
-        is_staff=False
-    ).count()
+    customers = StatsQuery(User.objects.filter(is_staff=False)).count(
+        'total', is_active=True
+    ).count(
+        'new_today', date_joined__gte=day_start(today)
+    ).cached(f'{key}:customers')
+    total_customers = customers['total']
+    new_customers_today = customers['new_today']
     
     # Product stats
-    total_products = Product.objects.filter(is_active=True).count()
-    out_of_stock = Product.objects.filter(
-        is_active=True,
-        track_inventory=True,
-        inventory_quantity=0
-    ).count()
+    products = StatsQuery(Product.objects.filter(is_active=True)).count(
+        'total'
+    ).count(
+        'out_of_stock', track_inventory=True, inventory_quantity=0
+    ).cached(f'{key}:products')
+    total_products = products['total']
+    out_of_stock = products['out_of_stock']
     
     # Calculate growth rates
     order_growth = ((today_orders - yesterday_orders) / yesterday_orders * 100) if yesterday_orders > 0 else 0
@@ -164,47 +221,31 @@ def overview_stats(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def sales_stats(request):
     """Sales statistics"""
-    days = int(request.GET.get('days', 30))
-    start_date = timezone.now().date() - timedelta(days=days)
+    try:
+        days = days_params(request.GET)['days']
+    except ValueError:
+        return Response({'error': 'days must be a number between 1 and 3650'}, status=status.HTTP_400_BAD_REQUEST)
+    start_date = timezone.localdate() - timedelta(days=days)
     
     # Sales by day
-    daily_sales = Order.objects.filter(
-        created_at__date__gte=start_date,
-        payment_status='paid'
-    ).extra(
-        select={'day': 'date(created_at)'}
-    ).values('day').annotate(
-        orders=Count('id'),
-        revenue=Sum('total_amount')
-    ).order_by('day')
+    daily_sales = list(SalesFactService.daily_sales(start_date))
     
     # Sales by status
-    status_breakdown = Order.objects.filter(
-        created_at__date__gte=start_date
-    ).values('status').annotate(
-        count=Count('id')
-    ).order_by('-count')
+    status_breakdown = SalesFactService.breakdown('status', start_date).values('status', 'count').order_by('-count')
     
     # Top selling products
-    from orders.models import OrderItem
-    top_products = OrderItem.objects.filter(
-        order__created_at__date__gte=start_date,
-        order__payment_status='paid'
-    ).values('product_name').annotate(
-        quantity_sold=Sum('quantity'),
-        revenue=Sum('total_price')
-    ).order_by('-quantity_sold')[:10]
+    top_products = SalesFactService.top_products(start_date)
     
     # Average order value
-    avg_order_value = Order.objects.filter(
-        created_at__date__gte=start_date,
-        payment_status='paid'
-    ).aggregate(avg=Avg('total_amount'))['avg'] or Decimal('0.00')
+    paid_orders = sum(day['orders'] for day in daily_sales)
+    paid_revenue = sum((day['revenue'] for day in daily_sales), Decimal('0.00'))
+    avg_order_value = (paid_revenue / paid_orders) if paid_orders > 0 else Decimal('0.00')
     
     stats = {
-        'daily_sales': list(daily_sales),
+        'daily_sales': daily_sales,
         'status_breakdown': list(status_breakdown),
         'top_products': list(top_products),
         'average_order_value': avg_order_value,
@@ -216,9 +257,13 @@ def sales_stats(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def customer_stats(request):
     """Customer statistics"""
-    days = int(request.GET.get('days', 30))
+    try:
+        days = days_params(request.GET)['days']
+    except ValueError:
+        return Response({'error': 'days must be a number between 1 and 3650'}, status=status.HTTP_400_BAD_REQUEST)
     start_date = timezone.now().date() - timedelta(days=days)
     
     # New customers by day
@@ -239,14 +284,8 @@ def customer_stats(request):
         is_verified=True
     ).count()
     
-    # Top customers by orders
-    top_customers = User.objects.filter(
-        is_staff=False,
-        orders__created_at__date__gte=start_date
-    ).annotate(
-        order_count=Count('orders'),
-        total_spent=Sum('orders__total_amount')
-    ).order_by('-total_spent')[:10]
+    # Top customers by lifetime value among those who ordered in the period
+    top_customers = CustomerMetricsService.top_customers(day_start(start_date))
     
     # Customer locations (top governorates)
     top_locations = Order.objects.filter(
@@ -262,13 +301,15 @@ def customer_stats(request):
         'verification_rate': (verified_customers / total_customers * 100) if total_customers > 0 else 0,
         'top_customers': [
             {
-                'id': customer.id,
-                'full_name': customer.full_name,
-                'email': customer.email,
-                'order_count': customer.order_count,
-                'total_spent': customer.total_spent,
+                'id': metrics.user_id,
+                'full_name': metrics.user.full_name,
+                'email': metrics.user.email,
+                'order_count': metrics.order_count,
+                'paid_order_count': metrics.paid_order_count,
+                'total_spent': metrics.lifetime_value,
+                'segment': metrics.segment,
             }
-            for customer in top_customers
+            for metrics in top_customers
         ],
         'top_locations': list(top_locations),
         'period_days': days,
@@ -279,6 +320,7 @@ def customer_stats(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def product_stats(request):
     """Product statistics"""
     # Inventory stats
@@ -331,6 +373,7 @@ def product_stats(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def low_stock_products(request):
     """Get low stock products"""
     low_stock = Product.objects.filter(
@@ -417,120 +460,31 @@ def recent_customers(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def sales_report(request):
-    """Sales report with detailed analytics"""
-    days = int(request.GET.get('days', 30))
-    start_date = timezone.now().date() - timedelta(days=days)
-    
-    # Sales summary
-    total_orders = Order.objects.filter(created_at__date__gte=start_date).count()
-    paid_orders = Order.objects.filter(
-        created_at__date__gte=start_date,
-        payment_status='paid'
-    ).count()
-    total_revenue = Order.objects.filter(
-        created_at__date__gte=start_date,
-        payment_status='paid'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-    
-    # Payment method breakdown
-    payment_methods = Order.objects.filter(
-        created_at__date__gte=start_date,
-        payment_status='paid'
-    ).values('payment_method').annotate(
-        count=Count('id'),
-        revenue=Sum('total_amount')
-    ).order_by('-revenue')
-    
-    # Daily sales trend
-    daily_sales = Order.objects.filter(
-        created_at__date__gte=start_date,
-        payment_status='paid'
-    ).extra(
-        select={'day': 'date(created_at)'}
-    ).values('day').annotate(
-        orders=Count('id'),
-        revenue=Sum('total_amount')
-    ).order_by('day')
-    
-    report_data = {
-        'summary': {
-            'total_orders': total_orders,
-            'paid_orders': paid_orders,
-            'total_revenue': total_revenue,
-            'conversion_rate': (paid_orders / total_orders * 100) if total_orders > 0 else 0,
-        },
-        'payment_methods': list(payment_methods),
-        'daily_sales': list(daily_sales),
-        'period_days': days,
-    }
-    
-    return Response(report_data)
+    """Sales report with detailed analytics (heavy ranges can be run as a report job)"""
+    try:
+        params = days_params(request.GET)
+    except ValueError:
+        return Response({'error': 'days must be a number between 1 and 3650'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(sales_report_data(params))
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def customer_report(request):
-    """Customer report with detailed analytics"""
-    days = int(request.GET.get('days', 30))
-    start_date = timezone.now().date() - timedelta(days=days)
-    
-    # Customer summary
-    total_customers = User.objects.filter(is_active=True, is_staff=False).count()
-    new_customers = User.objects.filter(
-        date_joined__date__gte=start_date,
-        is_staff=False
-    ).count()
-    
-    # Customer activity
-    active_customers = User.objects.filter(
-        is_staff=False,
-        orders__created_at__date__gte=start_date
-    ).distinct().count()
-    
-    # Customer segments
-    verified_customers = User.objects.filter(
-        is_active=True,
-        is_staff=False,
-        is_verified=True
-    ).count()
-    
-    # Top customers by spending
-    top_customers = User.objects.filter(
-        is_staff=False,
-        orders__created_at__date__gte=start_date,
-        orders__payment_status='paid'
-    ).annotate(
-        total_spent=Sum('orders__total_amount'),
-        order_count=Count('orders')
-    ).order_by('-total_spent')[:10]
-    
-    report_data = {
-        'summary': {
-            'total_customers': total_customers,
-            'new_customers': new_customers,
-            'active_customers': active_customers,
-            'verified_customers': verified_customers,
-            'verification_rate': (verified_customers / total_customers * 100) if total_customers > 0 else 0,
-        },
-        'top_customers': [
-            {
-                'id': customer.id,
-                'full_name': customer.full_name,
-                'email': customer.email,
-                'total_spent': customer.total_spent,
-                'order_count': customer.order_count,
-            }
-            for customer in top_customers
-        ],
-        'period_days': days,
-    }
-    
-    return Response(report_data)
+    """Customer report with detailed analytics (heavy ranges can be run as a report job)"""
+    try:
+        params = days_params(request.GET)
+    except ValueError:
+        return Response({'error': 'days must be a number between 1 and 3650'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(customer_report_data(params))
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def inventory_report(request):
     """Inventory report with stock analysis"""
     # Stock levels
@@ -571,12 +525,14 @@ def inventory_report(request):
         ))
     ).order_by('-total_products')
     
-    # Low stock products details
+    # Low stock products details (the full list is available as an export)
     low_stock_products = Product.objects.filter(
         is_active=True,
         track_inventory=True,
         inventory_quantity__lte=F('low_stock_threshold')
-    ).select_related('category').order_by('inventory_quantity')
+    ).order_by('inventory_quantity').values(
+        'id', 'name_en', 'sku', 'category__name_en', 'inventory_quantity', 'low_stock_threshold', 'price'
+    )[:LOW_STOCK_REPORT_LIMIT]
     
     report_data = {
         'summary': {
@@ -589,16 +545,227 @@ def inventory_report(request):
         'category_breakdown': list(category_stock),
         'low_stock_products': [
             {
-                'id': product.id,
-                'name': product.name_en,
-                'sku': product.sku,
-                'category': product.category.name_en if product.category else '',
-                'inventory_quantity': product.inventory_quantity,
-                'low_stock_threshold': product.low_stock_threshold,
-                'price': product.price,
+                'id': product['id'],
+                'name': product['name_en'],
+                'sku': product['sku'],
+                'category': product['category__name_en'] or '',
+                'inventory_quantity': product['inventory_quantity'],
+                'low_stock_threshold': product['low_stock_threshold'],
+                'price': product['price'],
             }
             for product in low_stock_products
         ],
     }
     
     return Response(report_data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@use_replica
+def export_report(request, report):
+    """Download orders, customers or inventory as CSV (streamed) or XLSX"""
+    file_format = request.GET.get('file_format', 'csv')
+    if report not in EXPORTS:
+        return Response({'error': f'Unknown export: {report}'}, status=status.HTTP_404_NOT_FOUND)
+    if file_format not in EXPORT_FORMATS:
+        return Response(
+            {'error': f"file_format must be one of: {', '.join(EXPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        header, rows = ReportExporter.rows(report, request.GET)
+    except ValueError:
+        return Response(
+            {'error': 'Invalid period, use days or start_date/end_date (YYYY-MM-DD)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    filename = f"{report}-{timezone.localtime().strftime('%Y%m%d%H%M%S')}.{file_format}"
+    if file_format == 'xlsx':
+        return FileResponse(
+            ReportExporter.xlsx_file(header, rows, report),
+            as_attachment=True,
+            filename=filename,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    
+    # Rows are fetched and sent while the file downloads
+    response = StreamingHttpResponse(ReportExporter.csv_stream(header, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Report jobs
+def report_job_data(request, job):
+    data = {
+        'id': str(job.pk),
+        'report': job.report,
+        'params': job.params,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+        'expires_at': job.expires_at,
+        'result': job.result,
+        'download_url': None,
+    }
+    if job.result_file:
+        data['download_url'] = request.build_absolute_uri(
+            reverse('admin_panel:report_job_download', args=[job.pk])
+        )
+    return data
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def submit_report_job(request):
+    """Queue a report; identical requests share the job in flight or its recent result"""
+    report = request.data.get('report')
+    if report not in REPORTS:
+        return Response(
+            {'error': f"report must be one of: {', '.join(REPORTS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        job, created = ReportJobService.submit(report, request.data.get('params') or {}, request.user)
+    except (TypeError, ValueError) as e:
+        return Response({'error': f'Invalid parameters: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    response_status = status.HTTP_200_OK if job.status == 'completed' else status.HTTP_202_ACCEPTED
+    return Response(report_job_data(request, job), status=response_status)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def report_job_detail(request, job_id):
+    """Poll a report job's progress and result"""
+    job = get_object_or_404(ReportJob, pk=job_id)
+    return Response(report_job_data(request, job))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def report_job_download(request, job_id):
+    """Download the file produced by an export job"""
+    job = get_object_or_404(ReportJob, pk=job_id, status='completed')
+    if not job.result_file:
+        return Response({'error': 'This report has no file'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        handle = job.result_file.open('rb')
+    except FileNotFoundError:
+        return Response({'error': 'This report file is no longer available'}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(handle, as_attachment=True, filename=job.result_file.name.rsplit('/', 1)[-1])
+
+
+# Live metrics
+class EventStreamRenderer(BaseRenderer):
+    """Lets EventSource clients (Accept: text/event-stream) through content negotiation"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class LiveStreamToken(Token):
+    """Token that only opens the live metrics stream; access tokens are not accepted in its place"""
+    token_type = 'live_stream'
+    lifetime = timedelta(seconds=LIVE_STREAM_TOKEN_LIFETIME)
+
+
+class LiveStreamTokenAuthentication(JWTAuthentication):
+    """Live stream token from the ``token`` query parameter; EventSource cannot send headers"""
+    
+    def authenticate(self, request):
+        raw_token = request.query_params.get('token')
+        if not raw_token:
+            return None
+        try:
+            validated_token = LiveStreamToken(raw_token)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        if not cache.add(f"live_stream_token:{validated_token['jti']}", 1, LIVE_STREAM_TOKEN_LIFETIME):
+            raise AuthenticationFailed('Stream token already used')
+        return self.get_user(validated_token), validated_token
+
+
+class LiveMetricsStream:
+    """SSE frames for one client: a snapshot whenever the counters change, a comment as keep-alive"""
+    
+    def __init__(self):
+        self.last_payload = None
+        self.last_sent = 0.0
+        self.deadline = time.monotonic() + LIVE_STREAM_DURATION
+    
+    def frame(self, snapshot):
+        payload = {key: value for key, value in snapshot.items() if key != 'generated_at'}
+        if payload != self.last_payload:
+            self.last_payload = payload
+            self.last_sent = time.monotonic()
+            return f'event: metrics\ndata: {json.dumps(snapshot, cls=DjangoJSONEncoder)}\n\n'
+        if time.monotonic() - self.last_sent >= LIVE_STREAM_KEEPALIVE:
+            self.last_sent = time.monotonic()
+            return ': keep-alive\n\n'
+        return ''
+    
+    def __iter__(self):
+        # Under the gevent workers the sleep only parks this greenlet
+        yield f'retry: {LIVE_STREAM_RETRY_MS}\n\n'
+        # Snapshots come from the cache, so the database connection authentication
+        # used would otherwise sit idle until the stream ends
+        connections.close_all()
+        while time.monotonic() < self.deadline:
+            frame = self.frame(LiveMetrics.snapshot())
+            if frame:
+                yield frame
+            time.sleep(LIVE_METRICS_INTERVAL)
+    
+    async def __aiter__(self):
+        yield f'retry: {LIVE_STREAM_RETRY_MS}\n\n'
+        await sync_to_async(connections.close_all)()
+        while time.monotonic() < self.deadline:
+            frame = self.frame(await sync_to_async(LiveMetrics.snapshot)())
+            if frame:
+                yield frame
+            await asyncio.sleep(LIVE_METRICS_INTERVAL)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def live_stats(request):
+    """Current live dashboard counters (polling fallback for the stream)"""
+    return Response(LiveMetrics.snapshot())
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def live_stats_stream_token(request):
+    """Single-use token for opening the live stats stream as ``?token=``"""
+    token = LiveStreamToken.for_user(request.user)
+    return Response({'token': str(token), 'expires_in': LIVE_STREAM_TOKEN_LIFETIME})
+
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication, LiveStreamTokenAuthentication, SessionAuthentication])
+@permission_classes([permissions.IsAdminUser])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+@throttle_classes([])
+def live_stats_stream(request):
+    """Server-sent event stream of live dashboard counters"""
+    stream = LiveMetricsStream()
+    events = stream.__aiter__() if isinstance(request._request, ASGIRequest) else iter(stream)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def database_connections(request):
+    """Connection reuse of the worker process that served this request"""
+    return Response(ConnectionMetrics.snapshot())
@@ -34,6 +34,33 @@ class Cart(models.Model):
         """Get cart subtotal"""
         return sum(item.total_price for item in self.items.all())
     
+    @property
+    def total_weight(self):
+        """Get total cart weight in kg (500g default per item without a weight)"""
+        from products.models import Product, ProductVariant
+        
+        default_weight = Decimal('0.500')
+        items = list(self.items.all())
+        variant_weights = dict(
+            ProductVariant.objects.filter(
+                id__in=[item.variant_id for item in items if item.variant_id]
+            ).values_list('id', 'weight')
+        )
+        product_weights = dict(
+            Product.objects.filter(
+                id__in=[item.product_id for item in items]
+            ).values_list('id', 'weight')
+        )
+        
+        total = Decimal('0.000')
+        for item in items:
+            if item.product_id not in product_weights:
+                continue
+            weight = variant_weights.get(item.variant_id) if item.variant_id else None
+            weight = weight or product_weights[item.product_id] or default_weight
+            total += weight * item.quantity
+        return total
+    
     def clear(self):
         """Clear all items from cart"""
         self.items.all().delete()
@@ -15,6 +15,7 @@ from .serializers import (
 )
 from products.models import Product, ProductVariant
 from coupons.models import Coupon
+from shipping.services import ShippingQuoteEngine, DEFAULT_SHIPPING_COST
 
 User = get_user_model()
 
@@ -431,22 +432,21 @@ def cart_summary(request):
     items_count = cart.total_items
     
     # Calculate total weight (for shipping)
-    total_weight = Decimal('0.000')
-    for item in cart.items.all():
-        try:
-            if item.variant_id:
-                variant = ProductVariant.objects.get(id=item.variant_id)
-                weight = variant.weight or variant.product.weight or Decimal('0.500')  # Default 500g
-            else:
-                product = Product.objects.get(id=item.product_id)
-                weight = product.weight or Decimal('0.500')  # Default 500g
-            
-            total_weight += weight * item.quantity
-        except (Product.DoesNotExist, ProductVariant.DoesNotExist):
-            continue
+    total_weight = cart.total_weight
+    
+    # Quote against the requested destination, or the user's default address
+    governorate = request.query_params.get('governorate_id') or request.query_params.get('governorate')
+    city = request.query_params.get('city_id') or request.query_params.get('city')
+    if not governorate:
+        default_address = request.user.addresses.filter(is_default=True, is_active=True).first()
+        if default_address:
+            governorate, city = default_address.governorate, default_address.city
+    
+    if governorate:
+        shipping_cost = ShippingQuoteEngine.order_shipping_cost(governorate, city, total_weight, subtotal)
+    else:
+        shipping_cost = DEFAULT_SHIPPING_COST
     
-    # For now, set default values (will be calculated properly with shipping/coupon integration)
-    shipping_cost = Decimal('30.00')  # Default shipping cost
     tax_amount = Decimal('0.00')      # No tax for now
     discount_amount = Decimal('0.00')  # No discount for now
     
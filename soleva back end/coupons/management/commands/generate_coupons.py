@@ -0,0 +1,118 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from coupons.serializers import CouponBulkTemplateSerializer
+from coupons.services import (
+    CouponBulkService, COUPON_BULK_CHUNK_SIZE, COUPON_CODE_MAX_LENGTH, COUPON_CODE_MIN_LENGTH
+)
+
+
+class Command(BaseCommand):
+    help = 'Generate or import unique single-use coupons for a campaign'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, help='Number of coupons to generate')
+        parser.add_argument('--import-file', help='CSV file with codes to import instead of generating')
+        parser.add_argument('--output', help='Write generated codes to this CSV file (default: stdout)')
+        parser.add_argument('--length', type=int, default=10,
+                            help=f'Random part length of each code ({COUPON_CODE_MIN_LENGTH}-{COUPON_CODE_MAX_LENGTH})')
+        parser.add_argument('--prefix', default='', help='Prefix prepended to each generated code')
+        parser.add_argument('--chunk-size', type=int, default=COUPON_BULK_CHUNK_SIZE, help='Rows per bulk insert')
+
+        # Campaign template
+        parser.add_argument('--name-en', required=True)
+        parser.add_argument('--name-ar', required=True)
+        parser.add_argument('--discount-type', choices=['percentage', 'fixed_amount'], required=True)
+        parser.add_argument('--discount-value', required=True)
+        parser.add_argument('--max-discount-amount')
+        parser.add_argument('--minimum-order-amount')
+        parser.add_argument('--usage-limit', type=int, default=1)
+        parser.add_argument('--usage-limit-per-customer', type=int)
+        parser.add_argument('--free-shipping', action='store_true')
+        parser.add_argument('--valid-from', default=timezone.now().date().isoformat())
+        parser.add_argument('--valid-until')
+
+    def handle(self, *args, **options):
+        if bool(options['count']) == bool(options['import_file']):
+            raise CommandError('Pass exactly one of --count or --import-file.')
+
+        template = self.get_template(options)
+        started = time.monotonic()
+
+        if options['import_file']:
+            created_count, skipped_count = self.import_codes(options['import_file'], template, options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Imported {created_count} coupons, skipped {skipped_count} '
+                f'in {time.monotonic() - started:.1f}s'
+            ))
+            return
+
+        count = options['count']
+        try:
+            code_chunks = CouponBulkService.generate(
+                count, template,
+                length=options['length'],
+                prefix=options['prefix'],
+                chunk_size=options['chunk_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Insert the whole campaign before writing anything, so the output
+        # never lists codes from a run that failed halfway
+        with transaction.atomic():
+            code_chunks = list(self.progress(code_chunks, count))
+
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for text in CouponBulkService.csv_rows(code_chunks, template):
+                output.write(text)
+        finally:
+            if options['output']:
+                output.close()
+
+        self.stderr.write(self.style.SUCCESS(
+            f'Generated {count} coupons in {time.monotonic() - started:.1f}s'
+        ))
+
+    def get_template(self, options):
+        """Validate the campaign settings with the API serializer"""
+        data = {
+            'name_en': options['name_en'],
+            'name_ar': options['name_ar'],
+            'discount_type': options['discount_type'],
+            'discount_value': options['discount_value'],
+            'max_discount_amount': options['max_discount_amount'],
+            'minimum_order_amount': options['minimum_order_amount'],
+            'usage_limit': options['usage_limit'],
+            'usage_limit_per_customer': options['usage_limit_per_customer'],
+            'free_shipping': options['free_shipping'],
+            'valid_from': options['valid_from'],
+            'valid_until': options['valid_until'],
+        }
+        serializer = CouponBulkTemplateSerializer(data={k: v for k, v in data.items() if v is not None})
+        if not serializer.is_valid():
+            raise CommandError(f'Invalid coupon settings: {serializer.errors}')
+        return dict(serializer.validated_data)
+
+    def import_codes(self, path, template, chunk_size):
+        """Import codes from a CSV file"""
+        created_count = skipped_count = 0
+        with open(path, newline='', encoding='utf-8-sig') as stream:
+            for created, skipped in CouponBulkService.import_codes(
+                CouponBulkService.read_codes_csv(stream), template, chunk_size=chunk_size
+            ):
+                created_count += len(created)
+                skipped_count += len(skipped)
+        return created_count, skipped_count
+
+    def progress(self, code_chunks, total):
+        """Report progress on stderr so stdout stays a clean CSV"""
+        generated = 0
+        for codes in code_chunks:
+            generated += len(codes)
+            self.stderr.write(f'  {generated}/{total} coupons created', ending='\r')
+            yield codes
+        self.stderr.write('')
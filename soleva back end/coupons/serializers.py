@@ -129,6 +129,47 @@ class CouponCreateUpdateSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class CouponBulkTemplateSerializer(CouponCreateUpdateSerializer):
+    """Shared coupon settings for a bulk-generated or imported campaign"""
+    
+    usage_limit = serializers.IntegerField(required=False, allow_null=True, default=1)
+    
+    class Meta(CouponCreateUpdateSerializer.Meta):
+        fields = [
+            'name_en', 'name_ar', 'description_en', 'description_ar',
+            'discount_type', 'discount_value', 'max_discount_amount',
+            'minimum_order_amount', 'usage_limit', 'usage_limit_per_customer',
+            'free_shipping', 'valid_from', 'valid_until', 'is_active'
+        ]
+
+
+class CouponBulkGenerateSerializer(CouponBulkTemplateSerializer):
+    """Serializer for bulk coupon generation requests"""
+    
+    count = serializers.IntegerField(min_value=1, max_value=1000000)
+    length = serializers.IntegerField(min_value=6, max_value=20, default=10)
+    prefix = serializers.CharField(max_length=10, required=False, allow_blank=True, default='')
+    
+    class Meta(CouponBulkTemplateSerializer.Meta):
+        fields = CouponBulkTemplateSerializer.Meta.fields + ['count', 'length', 'prefix']
+    
+    def validate_prefix(self, value):
+        """Validate and clean code prefix"""
+        value = value.upper().strip()
+        if value and not value.replace('-', '').isalnum():
+            raise serializers.ValidationError("Prefix may only contain letters, digits and dashes.")
+        return value
+    
+    def validate(self, attrs):
+        """Keep generated codes within the length accepted by validation"""
+        attrs = super().validate(attrs)
+        if len(attrs.get('prefix', '')) + attrs.get('length', 10) > 20:
+            raise serializers.ValidationError({
+                'prefix': 'Prefix and code length together cannot exceed 20 characters.'
+            })
+        return attrs
+
+
 class CouponUsageSerializer(serializers.ModelSerializer):
     """Coupon usage serializer"""
     
@@ -0,0 +1,209 @@
+"""
+Bulk coupon generation and import for campaigns
+"""
+
+import csv
+import io
+import logging
+import secrets
+import string
+from typing import Dict, Iterable, Iterator, List, Tuple
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import Coupon
+
+logger = logging.getLogger(__name__)
+
+COUPON_CODE_ALPHABET = string.ascii_uppercase + string.digits
+COUPON_BULK_CHUNK_SIZE = 5000
+
+# Larger campaigns are generated by a background report job instead of the request
+COUPON_SYNC_GENERATE_LIMIT = getattr(settings, 'COUPON_SYNC_GENERATE_LIMIT', 20000)
+COUPON_CODE_MAX_LENGTH = Coupon._meta.get_field('code').max_length
+
+# Shorter random parts are guessable and run out of unused codes
+COUPON_CODE_MIN_LENGTH = 6
+
+# Scalar Coupon fields a campaign template may set; codes are generated per row
+COUPON_TEMPLATE_FIELDS = [
+    'name_en', 'name_ar', 'description_en', 'description_ar',
+    'discount_type', 'discount_value', 'max_discount_amount',
+    'minimum_order_amount', 'free_shipping', 'usage_limit',
+    'usage_limit_per_customer', 'first_time_customers_only',
+    'exclude_sale_items', 'valid_from', 'valid_until', 'is_active',
+]
+
+CSV_HEADER = ['code', 'name_en', 'discount_type', 'discount_value', 'valid_from', 'valid_until']
+
+# Map every byte to an alphabet character; bytes past the last full
+# multiple of the alphabet size are dropped so the output stays uniform
+_ALPHABET_SIZE = len(COUPON_CODE_ALPHABET)
+_UNIFORM_LIMIT = 256 - (256 % _ALPHABET_SIZE)
+_BYTE_TABLE = bytes(
+    ord(COUPON_CODE_ALPHABET[byte % _ALPHABET_SIZE]) if byte < _UNIFORM_LIMIT else 0
+    for byte in range(256)
+)
+_REJECTED_BYTES = bytes(range(_UNIFORM_LIMIT, 256))
+
+
+class CouponBulkService:
+    """Generate and import large batches of single-use coupon codes"""
+
+    @staticmethod
+    def random_codes(count: int, length: int = 8, prefix: str = '') -> List[str]:
+        """Draw ``count`` codes from the OS CSPRNG in one pass"""
+        needed = count * length
+        pool = bytearray()
+        while len(pool) < needed:
+            # Over-draw to cover rejected bytes, then strip them in C
+            raw = secrets.token_bytes(needed - len(pool) + 64)
+            pool += raw.translate(_BYTE_TABLE, _REJECTED_BYTES)
+        text = pool[:needed].decode('ascii')
+        return [prefix + text[index:index + length] for index in range(0, needed, length)]
+
+    @staticmethod
+    def existing_codes(codes: Iterable[str]) -> set:
+        """Return the subset of ``codes`` already stored, in one query"""
+        return set(Coupon.objects.filter(code__in=list(codes)).values_list('code', flat=True))
+
+    @staticmethod
+    def build_coupons(codes: Iterable[str], template: Dict) -> List[Coupon]:
+        """Instantiate unsaved coupons sharing the campaign template"""
+        fields = {name: template[name] for name in COUPON_TEMPLATE_FIELDS if name in template}
+        return [Coupon(code=code, **fields) for code in codes]
+
+    @staticmethod
+    def _insert_chunk(codes: List[str], template: Dict) -> List[str]:
+        """Insert one chunk, dropping codes that appeared concurrently"""
+        while codes:
+            try:
+                with transaction.atomic():
+                    Coupon.objects.bulk_create(
+                        CouponBulkService.build_coupons(codes, template),
+                        batch_size=len(codes),
+                    )
+                return codes
+            except IntegrityError:
+                taken = CouponBulkService.existing_codes(codes)
+                if not taken:
+                    raise
+                codes = [code for code in codes if code not in taken]
+        return codes
+
+    @staticmethod
+    def check_format(count: int, length: int, prefix: str = '') -> None:
+        """Raise ValueError unless ``count`` codes of this shape can be generated"""
+        if length < COUPON_CODE_MIN_LENGTH:
+            raise ValueError(f'Code length must be at least {COUPON_CODE_MIN_LENGTH} characters.')
+        if len(prefix) + length > COUPON_CODE_MAX_LENGTH:
+            raise ValueError(f'Prefix and code length cannot exceed {COUPON_CODE_MAX_LENGTH} characters.')
+        if count < 1:
+            raise ValueError('Count must be positive.')
+
+    @staticmethod
+    def generate(count: int, template: Dict, length: int = 8, prefix: str = '',
+                 chunk_size: int = COUPON_BULK_CHUNK_SIZE) -> Iterator[List[str]]:
+        """
+        Generate ``count`` unique coupons, yielding the codes of each inserted chunk
+
+        Collisions are resolved per chunk: duplicates within the run are
+        removed with a set and clashes with stored codes with one ``code__in``
+        query, so the database sees two statements per chunk. The format is
+        checked before the first chunk is requested; raises ValueError.
+        """
+        prefix = prefix.upper()
+        CouponBulkService.check_format(count, length, prefix)
+        return CouponBulkService._generate_chunks(count, template, length, prefix, chunk_size)
+
+    @staticmethod
+    def _generate_chunks(count: int, template: Dict, length: int, prefix: str,
+                         chunk_size: int) -> Iterator[List[str]]:
+        seen = set()
+        remaining = count
+        while remaining > 0:
+            batch_size = min(chunk_size, remaining)
+            candidates = []
+            for code in CouponBulkService.random_codes(batch_size, length, prefix):
+                if code not in seen:
+                    seen.add(code)
+                    candidates.append(code)
+
+            taken = CouponBulkService.existing_codes(candidates)
+            if taken:
+                candidates = [code for code in candidates if code not in taken]
+
+            inserted = CouponBulkService._insert_chunk(candidates, template)
+            remaining -= len(inserted)
+            if inserted:
+                yield inserted
+
+        logger.info(f"Generated {count} coupons with prefix '{prefix}'")
+
+    @staticmethod
+    def import_codes(codes: Iterable[str], template: Dict,
+                     chunk_size: int = COUPON_BULK_CHUNK_SIZE) -> Iterator[Tuple[List[str], List[str]]]:
+        """
+        Import externally supplied codes, yielding (created, skipped) per chunk
+
+        Codes are upper-cased like ``validate_code``; blanks, duplicates and
+        codes that already exist are skipped rather than failing the import.
+        """
+        seen = set()
+        chunk = []
+
+        def flush(batch):
+            taken = CouponBulkService.existing_codes(batch)
+            fresh = [code for code in batch if code not in taken]
+            created = CouponBulkService._insert_chunk(fresh, template)
+            created_set = set(created)
+            return created, [code for code in batch if code not in created_set]
+
+        for raw_code in codes:
+            code = (raw_code or '').strip().upper()
+            if not code or len(code) > COUPON_CODE_MAX_LENGTH or code in seen:
+                continue
+            seen.add(code)
+            chunk.append(code)
+            if len(chunk) >= chunk_size:
+                yield flush(chunk)
+                chunk = []
+
+        if chunk:
+            yield flush(chunk)
+
+    @staticmethod
+    def read_codes_csv(stream) -> Iterator[str]:
+        """Read codes from the first column (or a ``code`` column) of a CSV"""
+        reader = csv.reader(stream)
+        code_index = 0
+        for row_number, row in enumerate(reader):
+            if not row:
+                continue
+            if row_number == 0 and 'code' in [cell.strip().lower() for cell in row]:
+                code_index = [cell.strip().lower() for cell in row].index('code')
+                continue
+            if code_index < len(row):
+                yield row[code_index]
+
+    @staticmethod
+    def csv_rows(code_chunks: Iterable[List[str]], template: Dict) -> Iterator[str]:
+        """Render generated codes as CSV text, one chunk at a time"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_HEADER)
+
+        row_suffix = [
+            template.get('name_en', ''),
+            template.get('discount_type', ''),
+            template.get('discount_value', ''),
+            template.get('valid_from', ''),
+            template.get('valid_until') or '',
+        ]
+        yield buffer.getvalue()
+
+        for codes in code_chunks:
+            buffer.seek(0)
+            buffer.truncate(0)
+            writer.writerows([code, *row_suffix] for code in codes)
+            yield buffer.getvalue()
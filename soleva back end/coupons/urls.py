@@ -15,6 +15,10 @@ urlpatterns = [
     path('<int:pk>/update/', views.CouponUpdateView.as_view(), name='coupon_update'),
     path('<int:pk>/delete/', views.CouponDeleteView.as_view(), name='coupon_delete'),
     
+    # Bulk campaign generation and import (admin)
+    path('bulk/generate/', views.bulk_generate_coupons, name='bulk_generate_coupons'),
+    path('bulk/import/', views.bulk_import_coupons, name='bulk_import_coupons'),
+    
     # Coupon usage statistics
     path('stats/', views.coupon_stats, name='coupon_stats'),
     path('<int:pk>/usage/', views.coupon_usage, name='coupon_usage'),
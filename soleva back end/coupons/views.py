@@ -3,16 +3,22 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Count, Sum, Q
 from django.core.cache import cache
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from decimal import Decimal
 
+from admin_panel.reports import ReportJobService
+from admin_panel.views import report_job_data
 from .models import Coupon, CouponUsage
 from .serializers import (
     CouponSerializer, CouponCreateUpdateSerializer,
-    CouponUsageSerializer, CouponValidationSerializer
+    CouponUsageSerializer, CouponValidationSerializer,
+    CouponBulkGenerateSerializer, CouponBulkTemplateSerializer
 )
+from .services import CouponBulkService, COUPON_SYNC_GENERATE_LIMIT
 
 
 def check_active_offers_block_coupons(cart_items):
@@ -21,10 +27,7 @@ def check_active_offers_block_coupons(cart_items):
         return False
     
     try:
-        from offers.models import FlashSale, SpecialOffer, FlashSaleProduct
-        from django.utils import timezone
-        
-        now = timezone.now()
+        from offers.services import PromotionIndex
         
         # Get product IDs from cart
         product_ids = [str(item.get('product_id', '')) for item in cart_items if item.get('product_id')]
@@ -32,46 +35,8 @@ def check_active_offers_block_coupons(cart_items):
         if not product_ids:
             return False
         
-        # Check for active flash sales with products in cart
-        flash_sales_with_products = FlashSale.objects.filter(
-            is_active=True,
-            start_time__lte=now,
-            end_time__gte=now,
-            products__product_id__in=product_ids,
-            products__is_available=True
-        ).exists()
-        
-        if flash_sales_with_products:
-            return True
-        
-        # Check for active special offers applicable to cart products
-        special_offers = SpecialOffer.objects.filter(
-            is_active=True,
-            start_time__lte=now,
-            show_on_product_page=True
-        ).filter(
-            Q(end_time__isnull=True) | Q(end_time__gte=now)
-        )
-        
-        for offer in special_offers:
-            # Check if offer applies to any cart products
-            if offer.applicable_products.filter(id__in=product_ids).exists():
-                return True
-            
-            # Check if offer applies through categories
-            if offer.applicable_categories.exists():
-                from products.models import Product
-                cart_products = Product.objects.filter(id__in=product_ids)
-                cart_category_ids = list(cart_products.values_list('category_id', flat=True))
-                
-                if offer.applicable_categories.filter(id__in=cart_category_ids).exists():
-                    return True
-            
-            # If no specific products or categories, offer applies to all
-            if not offer.applicable_products.exists() and not offer.applicable_categories.exists():
-                return True
-        
-        return False
+        # Single lookup against the precomputed set of promoted products
+        return PromotionIndex.has_promoted_products(product_ids)
         
     except ImportError:
         # If offers app is not available, don't block coupons
@@ -377,3 +342,77 @@ def coupon_usage(request, pk):
             'has_previous': page_obj.has_previous(),
         }
     })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def bulk_generate_coupons(request):
+    """
+    Generate a campaign of unique coupons and stream their codes as CSV (admin only)
+
+    Campaigns over COUPON_SYNC_GENERATE_LIMIT codes are queued as a
+    ``coupon_campaign`` report job; the response is the job to poll.
+    """
+    serializer = CouponBulkGenerateSerializer(data=request.data)
+    
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    template = dict(serializer.validated_data)
+    count = template.pop('count')
+    length = template.pop('length')
+    prefix = template.pop('prefix')
+    
+    if count > COUPON_SYNC_GENERATE_LIMIT:
+        # Too large for one request; a report job generates it and keeps the CSV for download
+        job, created = ReportJobService.submit('coupon_campaign', request.data, request.user)
+        response_status = status.HTTP_200_OK if job.status == 'completed' else status.HTTP_202_ACCEPTED
+        return Response(report_job_data(request, job), status=response_status)
+    
+    # Insert the whole campaign before streaming, so a dropped download
+    # cannot leave a partial campaign behind
+    try:
+        with transaction.atomic():
+            code_chunks = list(CouponBulkService.generate(count, template, length=length, prefix=prefix))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(
+        CouponBulkService.csv_rows(code_chunks, template),
+        content_type='text/csv'
+    )
+    filename = f"coupons-{prefix or 'campaign'}-{timezone.now().strftime('%Y%m%d%H%M%S')}.csv"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def bulk_import_coupons(request):
+    """Import coupon codes from an uploaded CSV file (admin only)"""
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({
+            'error': 'A CSV file with coupon codes is required.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = CouponBulkTemplateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    import io
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig')
+    
+    created_count = 0
+    skipped = []
+    for created, skipped_codes in CouponBulkService.import_codes(
+        CouponBulkService.read_codes_csv(stream), serializer.validated_data
+    ):
+        created_count += len(created)
+        skipped.extend(skipped_codes)
+    
+    return Response({
+        'message': f'{created_count} coupons imported successfully.',
+        'created_count': created_count,
+        'skipped_count': len(skipped),
+        'skipped_codes': skipped[:100],
+    }, status=status.HTTP_201_CREATED)
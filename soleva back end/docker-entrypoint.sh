@@ -101,6 +101,14 @@ mkdir -p /app/logs
 # Start the server with better error handling
 log "Starting Django server with Gunicorn..."
 
+# gevent serves every request in a new greenlet with its own database
+# connection; a persistent one would outlive its greenlet, so web workers
+# close connections per request unless told otherwise. In docker-compose they
+# connect to pgbouncer (DB_HOST=pgbouncer, DB_POOL_MODE=transaction), which
+# keeps the PostgreSQL connections open, so a per-request connection only
+# costs a local handshake with the pooler. Celery keeps DB_CONN_MAX_AGE.
+export DB_CONN_MAX_AGE="${WEB_DB_CONN_MAX_AGE:-0}"
+
 # Enable reload only when DEBUG is true
 GUNICORN_ARGS=(
     --bind 0.0.0.0:8000
@@ -5,3 +5,6 @@ class OffersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'offers'
     verbose_name = 'Offers & Flash Sales'
+    
+    def ready(self):
+        import offers.signals
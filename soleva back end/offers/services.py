@@ -0,0 +1,158 @@
+"""
+Promotion index - precomputed set of products currently under a running offer
+"""
+
+import logging
+from datetime import timedelta
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from utils.cache import VersionedCache
+from .models import FlashSale, FlashSaleProduct, SpecialOffer
+
+logger = logging.getLogger(__name__)
+
+PROMOTION_CACHE_NAMESPACE = 'promoted_products'
+
+# Upper bound on snapshot age; the real timeout is cut at the next offer start/end
+PROMOTION_SNAPSHOT_MAX_AGE = 300
+
+
+class PromotionIndex:
+    """Set of product IDs under an active flash sale or special offer"""
+
+    @staticmethod
+    def running_flash_sales(now=None):
+        """Flash sales that are running at ``now`` (mirrors FlashSale.is_running)"""
+        now = now or timezone.now()
+        return FlashSale.objects.filter(
+            is_active=True,
+            start_time__lte=now,
+            end_time__gte=now,
+        ).filter(
+            Q(total_usage_limit__isnull=True) | Q(current_usage_count__lt=F('total_usage_limit'))
+        )
+
+    @staticmethod
+    def running_special_offers(now=None):
+        """Special offers shown on product pages that are running at ``now``"""
+        now = now or timezone.now()
+        return SpecialOffer.objects.filter(
+            is_active=True,
+            start_time__lte=now,
+            show_on_product_page=True,
+        ).filter(
+            Q(end_time__isnull=True) | Q(end_time__gte=now)
+        )
+
+    @staticmethod
+    def build_snapshot(now=None):
+        """Compute the promotion set from the database"""
+        from products.models import Product
+
+        now = now or timezone.now()
+
+        # Flash sale products that are still available (mirrors FlashSaleProduct.is_available)
+        product_ids = set(
+            FlashSaleProduct.objects.filter(
+                flash_sale__in=PromotionIndex.running_flash_sales(now)
+            ).filter(
+                Q(quantity_limit__isnull=True) | Q(quantity_limit=0) |
+                Q(sold_quantity__lt=F('quantity_limit'))
+            ).values_list('product_id', flat=True)
+        )
+
+        offer_ids = set(PromotionIndex.running_special_offers(now).values_list('id', flat=True))
+        applies_to_all = False
+
+        if offer_ids:
+            product_links = SpecialOffer.applicable_products.through.objects.filter(
+                specialoffer_id__in=offer_ids
+            ).values_list('specialoffer_id', 'product_id')
+            category_links = SpecialOffer.applicable_categories.through.objects.filter(
+                specialoffer_id__in=offer_ids
+            ).values_list('specialoffer_id', 'category_id')
+
+            restricted_offers = set()
+            category_ids = set()
+            for offer_id, product_id in product_links:
+                restricted_offers.add(offer_id)
+                product_ids.add(product_id)
+            for offer_id, category_id in category_links:
+                restricted_offers.add(offer_id)
+                category_ids.add(category_id)
+
+            # An offer without product or category restrictions applies to every product
+            applies_to_all = bool(offer_ids - restricted_offers)
+
+            if category_ids and not applies_to_all:
+                product_ids.update(
+                    Product.objects.filter(category_id__in=category_ids).values_list('id', flat=True)
+                )
+
+        return {
+            'applies_to_all': applies_to_all,
+            'product_ids': frozenset(str(product_id) for product_id in product_ids),
+            'built_at': now,
+            'valid_until': PromotionIndex.next_boundary(now),
+        }
+
+    @staticmethod
+    def next_boundary(now=None):
+        """Earliest moment an offer starts or ends, after which the snapshot is stale"""
+        now = now or timezone.now()
+        horizon = now + timedelta(seconds=PROMOTION_SNAPSHOT_MAX_AGE)
+
+        candidates = [horizon]
+        candidates.extend(
+            FlashSale.objects.filter(is_active=True).aggregate(
+                next_start=Min('start_time', filter=Q(start_time__gt=now)),
+                next_end=Min('end_time', filter=Q(end_time__gte=now)),
+            ).values()
+        )
+        candidates.extend(
+            SpecialOffer.objects.filter(is_active=True, show_on_product_page=True).aggregate(
+                next_start=Min('start_time', filter=Q(start_time__gt=now)),
+                next_end=Min('end_time', filter=Q(end_time__gte=now)),
+            ).values()
+        )
+        return min(moment for moment in candidates if moment is not None)
+
+    @staticmethod
+    def get_snapshot():
+        """Get the cached promotion snapshot, rebuilding it when stale"""
+        now = timezone.now()
+        snapshot = VersionedCache.get_or_build(
+            PROMOTION_CACHE_NAMESPACE,
+            lambda: PromotionIndex.build_snapshot(now),
+            'snapshot',
+            timeout=PROMOTION_SNAPSHOT_MAX_AGE,
+        )
+        if snapshot['valid_until'] < now:
+            # An offer started or ended since the snapshot was built
+            PromotionIndex.invalidate()
+            snapshot = VersionedCache.get_or_build(
+                PROMOTION_CACHE_NAMESPACE,
+                lambda: PromotionIndex.build_snapshot(now),
+                'snapshot',
+                timeout=PROMOTION_SNAPSHOT_MAX_AGE,
+            )
+        return snapshot
+
+    @staticmethod
+    def has_promoted_products(product_ids):
+        """Check whether any of the given products is currently under promotion"""
+        product_ids = {str(product_id) for product_id in product_ids if product_id}
+        if not product_ids:
+            return False
+
+        snapshot = PromotionIndex.get_snapshot()
+        if snapshot['applies_to_all']:
+            return True
+        return not snapshot['product_ids'].isdisjoint(product_ids)
+
+    @staticmethod
+    def invalidate():
+        """Drop the current snapshot; the next lookup rebuilds it"""
+        VersionedCache.bump_version(PROMOTION_CACHE_NAMESPACE)
+        logger.debug("Promotion index invalidated")
@@ -0,0 +1,48 @@
+"""
+Keep the promotion index in sync with offer and product changes
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from products.models import Product
+from .models import FlashSale, FlashSaleProduct, SpecialOffer
+from .services import PromotionIndex
+
+# Product fields the promotion set depends on (category offers expand to products)
+PROMOTION_PRODUCT_FIELDS = {'category', 'category_id'}
+
+
+def invalidate_on_commit():
+    """Bump once the change is visible, so a rebuild cannot cache the old rows"""
+    transaction.on_commit(PromotionIndex.invalidate)
+
+
+@receiver(post_save, sender=FlashSale)
+@receiver(post_delete, sender=FlashSale)
+@receiver(post_save, sender=FlashSaleProduct)
+@receiver(post_delete, sender=FlashSaleProduct)
+@receiver(post_save, sender=SpecialOffer)
+@receiver(post_delete, sender=SpecialOffer)
+def invalidate_promotion_index(sender, instance, **kwargs):
+    """Rebuild the promoted products set when an offer changes"""
+    invalidate_on_commit()
+
+
+@receiver(m2m_changed, sender=SpecialOffer.applicable_products.through)
+@receiver(m2m_changed, sender=SpecialOffer.applicable_categories.through)
+def invalidate_promotion_index_on_targets(sender, instance, action, **kwargs):
+    """Rebuild the promoted products set when offer targeting changes"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_on_commit()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_promotion_index_on_product(sender, instance, created=False, **kwargs):
+    """Category-based offers expand to products, so category moves affect the set"""
+    # Stock and counter saves pass update_fields and leave the set alone
+    update_fields = kwargs.get('update_fields')
+    if update_fields and PROMOTION_PRODUCT_FIELDS.isdisjoint(update_fields):
+        return
+    invalidate_on_commit()
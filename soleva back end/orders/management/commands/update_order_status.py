@@ -1,8 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.db import transaction
 from datetime import timedelta
-from orders.models import Order, OrderStatusHistory
+from orders.models import Order
+from orders.services import OrderStateMachine
 
 
 class Command(BaseCommand):
@@ -41,8 +41,7 @@ class Command(BaseCommand):
                     'payment_status': 'payment_approved',
                     'created_at__gte': now - timedelta(hours=24)  # Only recent orders
                 },
-                'new_status': 'confirmed',
-                'update_field': 'confirmed_at'
+                'new_status': 'confirmed'
             },
             {
                 'name': 'Auto-process confirmed orders after 2 hours',
@@ -51,8 +50,7 @@ class Command(BaseCommand):
                     'confirmed_at__lte': now - timedelta(hours=2),
                     'confirmed_at__gte': now - timedelta(days=7)  # Not too old
                 },
-                'new_status': 'processing',
-                'update_field': None
+                'new_status': 'processing'
             },
             {
                 'name': 'Auto-ship processed orders after 1 day',
@@ -61,8 +59,7 @@ class Command(BaseCommand):
                     'updated_at__lte': now - timedelta(days=1),
                     'updated_at__gte': now - timedelta(days=5)  # Not too old
                 },
-                'new_status': 'shipped',
-                'update_field': 'shipped_at'
+                'new_status': 'shipped'
             },
             {
                 'name': 'Auto-deliver shipped orders after 3 days',
@@ -71,8 +68,7 @@ class Command(BaseCommand):
                     'shipped_at__lte': now - timedelta(days=3),
                     'shipped_at__gte': now - timedelta(days=14)  # Not too old
                 },
-                'new_status': 'delivered',
-                'update_field': 'delivered_at'
+                'new_status': 'delivered'
             }
         ]
         
@@ -81,49 +77,36 @@ class Command(BaseCommand):
             
             # Get orders matching the rule
             orders = Order.objects.filter(**rule['filter'])
-            count = orders.count()
             
-            if count == 0:
-                self.stdout.write(f"  No orders found matching criteria")
+            if dry_run:
+                count = orders.count()
+                updated_orders += count
+                if count == 0:
+                    self.stdout.write(f"  No orders found matching criteria")
+                    continue
+                self.stdout.write(f"  Would update {count} orders to {rule['new_status']}")
+                for order_number in orders.values_list('order_number', flat=True)[:20]:
+                    self.stdout.write(f"    {order_number}")
+                if count > 20:
+                    self.stdout.write(f"    ... and {count - 20} more")
                 continue
-                
-            self.stdout.write(f"  Found {count} orders to update")
             
-            if not dry_run:
-                with transaction.atomic():
-                    for order in orders:
-                        old_status = order.status
-                        order.status = rule['new_status']
-                        
-                        # Update timestamp field if specified
-                        if rule['update_field']:
-                            setattr(order, rule['update_field'], now)
-                        
-                        order.save()
-                        
-                        # Create status history
-                        OrderStatusHistory.objects.create(
-                            order=order,
-                            previous_status=old_status,
-                            new_status=rule['new_status'],
-                            comment=f'Automatically updated by system: {rule["name"]}',
-                            changed_by=None  # System update
-                        )
-                        
-                        updated_orders += 1
-                        
-                        self.stdout.write(
-                            f"  Updated order {order.order_number}: {old_status} → {rule['new_status']}"
-                        )
+            # One UPDATE and one history insert per batch; timestamps follow the new status
+            count = OrderStateMachine.bulk_transition(
+                orders,
+                rule['new_status'],
+                comment=f'Automatically updated by system: {rule["name"]}'
+            )
+            updated_orders += count
+            
+            if count == 0:
+                self.stdout.write(f"  No orders found matching criteria")
             else:
-                for order in orders:
-                    self.stdout.write(
-                        f"  Would update order {order.order_number}: {order.status} → {rule['new_status']}"
-                    )
+                self.stdout.write(f"  Updated {count} orders to {rule['new_status']}")
         
         if dry_run:
             self.stdout.write(
-                self.style.SUCCESS(f'\nDRY RUN: Would have updated {sum(Order.objects.filter(**rule["filter"]).count() for rule in rules)} orders')
+                self.style.SUCCESS(f'\nDRY RUN: Would have updated {updated_orders} orders')
             )
         else:
             self.stdout.write(
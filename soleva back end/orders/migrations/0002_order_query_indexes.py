@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:05
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+from utils.migrations import AddIndexConcurrently, RemoveIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Concurrent index builds cannot run inside a transaction; orders stay writable meanwhile
+    atomic = False
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    # The new indexes are built before the ones they replace are dropped
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='orders_status_11db6c_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['payment_status', 'created_at'], name='orders_payment_c29932_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(django.db.models.functions.text.Upper('customer_email'), name='orders_customer_email_ci_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='orders_order_n_1336be_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='orders_status_762191_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='orders_payment_050188_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='orders_custome_cf1fac_idx',
+        ),
+    ]
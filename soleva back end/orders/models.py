@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from decimal import Decimal
@@ -125,13 +126,15 @@ class Order(models.Model):
         verbose_name = _('Order')
         verbose_name_plural = _('Orders')
         db_table = 'orders'
+        # order_number is covered by its unique constraint, and the status
+        # indexes serve both equality filters and date ranges within a status
         indexes = [
-            models.Index(fields=['order_number']),
             models.Index(fields=['user', 'created_at']),
-            models.Index(fields=['status']),
-            models.Index(fields=['payment_status']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['payment_status', 'created_at']),
             models.Index(fields=['created_at']),
-            models.Index(fields=['customer_email']),
+            # customer_email__iexact compiles to UPPER(customer_email) = UPPER(%s)
+            models.Index(Upper('customer_email'), name='orders_customer_email_ci_idx'),
         ]
     
     def __str__(self):
@@ -283,23 +283,11 @@ class OrderUpdateSerializer(serializers.ModelSerializer):
     
     def validate_status(self, value):
         """Validate status transition"""
-        if self.instance:
+        from .services import OrderStateMachine
+
+        if self.instance and value != self.instance.status:
             current_status = self.instance.status
-            
-            # Define allowed status transitions
-            allowed_transitions = {
-                'pending': ['confirmed', 'cancelled'],
-                'confirmed': ['processing', 'cancelled'],
-                'processing': ['shipped', 'cancelled'],
-                'shipped': ['out_for_delivery', 'delivered'],
-                'out_for_delivery': ['delivered', 'failed_delivery'],
-                'delivered': ['returned'],  # Only if return requested
-                'cancelled': [],  # Cannot change from cancelled
-                'refunded': [],   # Cannot change from refunded
-                'returned': [],   # Cannot change from returned
-            }
-            
-            if value not in allowed_transitions.get(current_status, []):
+            if not OrderStateMachine.can_transition(current_status, value):
                 raise serializers.ValidationError(
                     f"Cannot change status from '{current_status}' to '{value}'"
                 )
@@ -0,0 +1,242 @@
+"""
+Order status transitions and tracking snapshots
+
+Legal transitions are declared once in ORDER_TRANSITIONS. Single orders
+go through ``transition`` (a normal save, so post_save receivers run);
+``bulk_transition`` moves whole querysets with one UPDATE and one history
+insert per batch and announces each batch with ``orders_transitioned``.
+
+Tracking pages are polled; their payload is cached per order (and language)
+with an ETag, under a per-order version bumped whenever the order, its
+history or its shipments change.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone, translation
+
+from utils.cache import CACHE_TIMEOUTS, ConditionalCache, VersionedCache
+from .models import Order, OrderStatusHistory
+from .serializers import OrderTrackingSerializer
+from .signals import orders_transitioned
+
+logger = logging.getLogger(__name__)
+
+ORDER_TRANSITIONS = {
+    'pending': ['confirmed', 'cancelled'],
+    'confirmed': ['processing', 'shipped', 'cancelled'],
+    'processing': ['shipped', 'cancelled'],
+    'shipped': ['out_for_delivery', 'delivered', 'returned'],
+    'out_for_delivery': ['delivered', 'returned'],
+    'delivered': ['returned', 'refunded'],
+    'returned': ['refunded'],
+    'cancelled': ['refunded'],
+    'refunded': [],
+}
+
+# Timestamp recorded when an order enters a status
+STATUS_TIMESTAMPS = {
+    'confirmed': 'confirmed_at',
+    'shipped': 'shipped_at',
+    'delivered': 'delivered_at',
+    'cancelled': 'cancelled_at',
+}
+
+# Fields loaded per order by bulk transitions and sent to receivers
+BULK_TRANSITION_FIELDS = [
+    'id', 'order_number', 'user_id', 'status', 'payment_status', 'payment_method',
+    'shipping_governorate', 'total_amount', 'created_at',
+]
+
+BULK_TRANSITION_BATCH_SIZE = 1000
+
+
+class InvalidTransition(ValueError):
+    """A status change not declared in ORDER_TRANSITIONS"""
+
+
+class OrderStateMachine:
+    """Validate and apply order status transitions"""
+
+    @staticmethod
+    def can_transition(from_status: str, to_status: str) -> bool:
+        return to_status in ORDER_TRANSITIONS.get(from_status, [])
+
+    @staticmethod
+    def sources(to_status: str, from_statuses: Optional[Iterable[str]] = None) -> List[str]:
+        """Statuses an order may move to ``to_status`` from (optionally narrowed)"""
+        if to_status not in ORDER_TRANSITIONS:
+            raise InvalidTransition(f'Unknown order status: {to_status}')
+        sources = [status for status, targets in ORDER_TRANSITIONS.items() if to_status in targets]
+        if from_statuses is not None:
+            sources = [status for status in sources if status in from_statuses]
+        return sources
+
+    @staticmethod
+    def transition(order: Order, new_status: str, changed_by=None, comment: str = '') -> Order:
+        """Move one order, saving it and recording its history"""
+        if not OrderStateMachine.can_transition(order.status, new_status):
+            raise InvalidTransition(f'Order {order.order_number} cannot go from {order.status} to {new_status}')
+
+        previous_status = order.status
+        order.status = new_status
+        if new_status in STATUS_TIMESTAMPS:
+            setattr(order, STATUS_TIMESTAMPS[new_status], timezone.now())
+        with transaction.atomic():
+            order.save()
+            OrderStatusHistory.objects.create(
+                order=order,
+                previous_status=previous_status,
+                new_status=new_status,
+                comment=comment,
+                changed_by=changed_by
+            )
+        return order
+
+    @staticmethod
+    def bulk_transition(queryset, new_status: str, changed_by=None, comment: str = '',
+                        from_statuses: Optional[Iterable[str]] = None,
+                        batch_size: int = BULK_TRANSITION_BATCH_SIZE) -> int:
+        """
+        Move every order of ``queryset`` that may legally enter ``new_status``
+
+        Each batch locks its rows, updates them with one statement, inserts
+        their history rows with one statement and sends
+        ``orders_transitioned``. Returns the number of orders moved.
+        """
+        sources = OrderStateMachine.sources(new_status, from_statuses)
+        if not sources:
+            return 0
+        eligible = queryset.filter(status__in=sources).order_by('pk')
+
+        moved = 0
+        last_pk = 0
+        while True:
+            candidate_ids = list(eligible.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not candidate_ids:
+                break
+            last_pk = candidate_ids[-1]
+
+            with transaction.atomic():
+                # Re-checked under the row locks in case an order moved meanwhile
+                rows = list(
+                    Order.objects.select_for_update().filter(pk__in=candidate_ids, status__in=sources)
+                    .values(*BULK_TRANSITION_FIELDS)
+                )
+                if rows:
+                    now = timezone.now()
+                    changes = {'status': new_status, 'updated_at': now}
+                    if new_status in STATUS_TIMESTAMPS:
+                        changes[STATUS_TIMESTAMPS[new_status]] = now
+                    Order.objects.filter(pk__in=[row['id'] for row in rows]).update(**changes)
+
+                    OrderStatusHistory.objects.bulk_create([
+                        OrderStatusHistory(
+                            order_id=row['id'],
+                            previous_status=row['status'],
+                            new_status=new_status,
+                            comment=comment,
+                            changed_by=changed_by
+                        )
+                        for row in rows
+                    ])
+                    orders_transitioned.send(sender=Order, orders=rows, new_status=new_status, changed_at=now)
+                    moved += len(rows)
+
+            if len(candidate_ids) < batch_size:
+                break
+
+        logger.info(f"Moved {moved} orders to {new_status}")
+        return moved
+
+
+TRACKING_NAMESPACE = 'order_tracking:{}'
+TRACKING_NUMBER_KEY = 'order_tracking_number:{}'
+
+
+class OrderTrackingService:
+    """Cached tracking payloads of single orders"""
+
+    @staticmethod
+    def build(order: Order) -> Dict:
+        """Tracking payload, its validators and the owner fields used for access checks"""
+        status_display = dict(Order.ORDER_STATUS_CHOICES)
+        timeline = [
+            {
+                'status': new_status,
+                'status_display': str(status_display.get(new_status, new_status)),
+                'timestamp': created_at,
+                'comment': comment,
+            }
+            for new_status, created_at, comment in order.status_history.order_by('created_at').values_list(
+                'new_status', 'created_at', 'comment'
+            )
+        ]
+        data = OrderTrackingSerializer({
+            'order_number': order.order_number,
+            'status': order.status,
+            'status_display': str(order.get_status_display()),
+            'tracking_number': order.tracking_number,
+            'courier_company': order.courier_company,
+            'estimated_delivery_date': order.estimated_delivery_date,
+            'timeline': timeline,
+            'current_location': '',  # Would integrate with courier API
+            'last_update': order.updated_at,
+        }).data
+        snapshot = ConditionalCache.make_snapshot(dict(data))
+        snapshot['user_id'] = order.user_id
+        snapshot['email'] = order.customer_email.lower()
+        return snapshot
+
+    @staticmethod
+    def snapshot(order_id) -> Optional[Dict]:
+        """
+        Snapshot of an order in the active language
+
+        Snapshots live in a per-order versioned namespace. Invalidation bumps
+        the version after commit, so a snapshot built from pre-commit data
+        and stored late lands under a version nobody reads any more.
+        """
+        language = translation.get_language() or settings.LANGUAGE_CODE
+
+        def build():
+            order = Order.objects.filter(pk=order_id).first()
+            return OrderTrackingService.build(order) if order is not None else None
+
+        return VersionedCache.get_or_build(
+            TRACKING_NAMESPACE.format(order_id), build, language,
+            timeout='long', version_timeout=CACHE_TIMEOUTS['extra_long'],
+        )
+
+    @staticmethod
+    def by_id(order_id) -> Optional[Dict]:
+        return OrderTrackingService.snapshot(order_id)
+
+    @staticmethod
+    def by_number(order_number: str) -> Optional[Dict]:
+        # Order numbers never change, so the number -> id mapping needs no invalidation
+        number_key = TRACKING_NUMBER_KEY.format(order_number)
+        try:
+            order_id = cache.get(number_key)
+        except Exception as e:
+            logger.warning(f"Tracking cache unavailable: {str(e)}")
+            order_id = None
+        if order_id is None:
+            order_id = Order.objects.filter(order_number=order_number).values_list('pk', flat=True).first()
+            if order_id is None:
+                return None
+            try:
+                cache.set(number_key, order_id, CACHE_TIMEOUTS['extra_long'])
+            except Exception as e:
+                logger.warning(f"Tracking cache unavailable: {str(e)}")
+        return OrderTrackingService.snapshot(order_id)
+
+    @staticmethod
+    def invalidate(order_ids: Iterable[int]) -> None:
+        """Move the given orders to new snapshot versions"""
+        for order_id in set(order_ids):
+            VersionedCache.bump_version(TRACKING_NAMESPACE.format(order_id))
@@ -0,0 +1,39 @@
+"""
+Signals sent by the orders app, and tracking cache invalidation
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+# Sent once per batch of a bulk status transition, inside its transaction, with
+# ``orders`` (dicts of the fields in BULK_TRANSITION_FIELDS, holding the previous
+# status), ``new_status`` and ``changed_at``. Per-order post_save is not sent, so
+# receivers that react to status changes (accounting, sales facts) hook this too.
+orders_transitioned = Signal()
+
+
+def invalidate_tracking(order_ids):
+    from .services import OrderTrackingService
+
+    order_ids = list(order_ids)
+    transaction.on_commit(lambda: OrderTrackingService.invalidate(order_ids))
+
+
+@receiver([post_save, post_delete], sender='orders.Order')
+def invalidate_order_tracking(sender, instance, **kwargs):
+    """Status, tracking number or delivery estimate may have changed"""
+    invalidate_tracking([instance.pk])
+
+
+@receiver([post_save, post_delete], sender='orders.OrderStatusHistory')
+@receiver([post_save, post_delete], sender='orders.OrderShipment')
+def invalidate_related_tracking(sender, instance, **kwargs):
+    """A timeline entry or shipment of the order changed"""
+    invalidate_tracking([instance.order_id])
+
+
+@receiver(orders_transitioned)
+def invalidate_transitioned_tracking(sender, orders, **kwargs):
+    """Bulk status transitions change every order in the batch"""
+    invalidate_tracking(order['id'] for order in orders)
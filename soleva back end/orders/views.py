@@ -4,22 +4,26 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.db.models import Q, Count, Sum, Avg
+from django.db.models import Q
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from datetime import timedelta, date
+from datetime import datetime, time, timedelta, date
 from decimal import Decimal
 
 from .models import Order, OrderItem, OrderStatusHistory, PaymentProof
 from .serializers import (
     OrderListSerializer, OrderDetailSerializer, OrderCreateSerializer,
-    OrderUpdateSerializer, OrderTrackingSerializer, OrderStatsSerializer,
+    OrderUpdateSerializer, OrderStatsSerializer,
     PaymentProofSerializer, PaymentProofUploadSerializer, PaymentProofVerificationSerializer
 )
+from .services import InvalidTransition, OrderStateMachine, OrderTrackingService
 from cart.models import Cart, CartItem
 from products.models import Product, ProductVariant
 from coupons.models import Coupon, CouponUsage
 from notifications.models import Notification
+from shipping.services import ShippingQuoteEngine
+from utils.cache import ConditionalCache
+from utils.stats import StatsQuery
 
 User = get_user_model()
 
@@ -29,7 +33,13 @@ class OrderViewSet(ModelViewSet):
     
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'payment_status', 'payment_method', 'created_at']
+    filterset_fields = {
+        'status': ['exact'],
+        'payment_status': ['exact'],
+        'payment_method': ['exact'],
+        'created_at': ['exact', 'gte', 'lt'],
+        'customer_email': ['iexact'],
+    }
     search_fields = ['order_number', 'customer_email', 'customer_name']
     ordering_fields = ['created_at', 'total_amount', 'order_number']
     ordering = ['-created_at']
@@ -80,31 +90,33 @@ class OrderViewSet(ModelViewSet):
         """Update order (admin only)"""
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
-        old_status = instance.status
         
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        if serializer.is_valid():
-            order = serializer.save()
+        with transaction.atomic():
+            # Locked so the transition is validated against the current status
+            order = Order.objects.select_for_update().get(pk=instance.pk)
+            old_status = order.status
             
-            # Create status history entry if status changed
-            if order.status != old_status:
-                OrderStatusHistory.objects.create(
-                    order=order,
-                    previous_status=old_status,
-                    new_status=order.status,
-                    comment=request.data.get('status_comment', ''),
-                    changed_by=request.user
-                )
-                
-                # Send notification based on new status
-                self._send_status_notification(order)
+            serializer = self.get_serializer(order, data=request.data, partial=partial)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
-            return Response({
-                'message': 'Order updated successfully.',
-                'order': OrderDetailSerializer(order, context={'request': request}).data
-            })
+            # Status goes through the state machine for its timestamp and history
+            new_status = serializer.validated_data.pop('status', old_status)
+            order = serializer.save()
+            if new_status != old_status:
+                OrderStateMachine.transition(
+                    order, new_status, changed_by=request.user,
+                    comment=request.data.get('status_comment', '')
+                )
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Send notification based on new status
+        if order.status != old_status:
+            self._send_status_notification(order)
+        
+        return Response({
+            'message': 'Order updated successfully.',
+            'order': OrderDetailSerializer(order, context={'request': request}).data
+        })
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -117,28 +129,24 @@ class OrderViewSet(ModelViewSet):
                 'error': 'You can only cancel your own orders.'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        if not order.can_be_cancelled:
-            return Response({
-                'error': 'This order cannot be cancelled.'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Cancel the order
-        old_status = order.status
-        order.status = 'cancelled'
-        order.cancelled_at = timezone.now()
-        order.save()
-        
-        # Create status history
-        OrderStatusHistory.objects.create(
-            order=order,
-            previous_status=old_status,
-            new_status='cancelled',
-            comment=request.data.get('reason', 'Cancelled by user'),
-            changed_by=request.user
-        )
-        
-        # Restore inventory (if needed)
-        self._restore_inventory(order)
+        with transaction.atomic():
+            # Locked so concurrent cancels cannot restore the inventory twice
+            order = Order.objects.select_for_update().get(pk=order.pk)
+            if not order.can_be_cancelled:
+                return Response({
+                    'error': 'This order cannot be cancelled.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                OrderStateMachine.transition(
+                    order, 'cancelled', changed_by=request.user,
+                    comment=request.data.get('reason', 'Cancelled by user')
+                )
+            except InvalidTransition as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Restore inventory (if needed)
+            self._restore_inventory(order)
         
         # Send cancellation notification
         self._send_order_notification(order, 'order_cancelled')
@@ -150,39 +158,16 @@ class OrderViewSet(ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def tracking(self, request, pk=None):
-        """Get order tracking information"""
-        order = self.get_object()
+        """Get order tracking information (revalidate with If-None-Match)"""
+        snapshot = OrderTrackingService.by_id(pk) if str(pk).isdigit() else None
         
-        # Check permissions
-        if order.user != request.user and not request.user.is_staff:
+        # Customers only see their own orders
+        if snapshot is None or (snapshot['user_id'] != request.user.pk and not request.user.is_staff):
             return Response({
-                'error': 'Access denied.'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        # Build timeline from status history
-        timeline = []
-        for history in order.status_history.all().order_by('created_at'):
-            timeline.append({
-                'status': history.new_status,
-                'status_display': dict(Order.ORDER_STATUS_CHOICES).get(history.new_status, history.new_status),
-                'timestamp': history.created_at,
-                'comment': history.comment,
-            })
-        
-        tracking_data = {
-            'order_number': order.order_number,
-            'status': order.status,
-            'status_display': order.get_status_display(),
-            'tracking_number': order.tracking_number,
-            'courier_company': order.courier_company,
-            'estimated_delivery_date': order.estimated_delivery_date,
-            'timeline': timeline,
-            'current_location': '',  # Would integrate with courier API
-            'last_update': order.updated_at,
-        }
+                'error': 'Order not found.'
+            }, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = OrderTrackingSerializer(tracking_data)
-        return Response(serializer.data)
+        return ConditionalCache.response(request, snapshot, private=True)
     
     @action(detail=True, methods=['post'])
     def reorder(self, request, pk=None):
@@ -373,17 +358,13 @@ class OrderViewSet(ModelViewSet):
         return order
     
     def _calculate_shipping_cost(self, cart, shipping_address):
-        """Calculate shipping cost (simplified)"""
-        # This would integrate with the shipping system
-        # For now, return a fixed cost based on governorate
-        base_cost = Decimal('30.00')  # Base shipping cost
-        
-        # Premium governorates (Cairo, Giza, Alexandria)
-        premium_governorates = ['Cairo', 'Giza', 'Alexandria']
-        if shipping_address.governorate in premium_governorates:
-            return base_cost
-        else:
-            return base_cost + Decimal('10.00')  # Additional cost for other governorates
+        """Calculate shipping cost from the shipping rate table"""
+        return ShippingQuoteEngine.order_shipping_cost(
+            shipping_address.governorate,
+            shipping_address.city,
+            weight=cart.total_weight,
+            order_total=cart.subtotal,
+        )
     
     def _get_product_sku(self, cart_item):
         """Get product SKU"""
@@ -485,37 +466,38 @@ def order_stats(request):
         # Admin gets global stats
         orders = Order.objects.all()
     
-    today = timezone.now().date()
-    month_start = today.replace(day=1)
-    
-    stats = {
-        'total_orders': orders.count(),
-        'pending_orders': orders.filter(status='pending').count(),
-        'confirmed_orders': orders.filter(status='confirmed').count(),
-        'shipped_orders': orders.filter(status='shipped').count(),
-        'delivered_orders': orders.filter(status='delivered').count(),
-        'cancelled_orders': orders.filter(status='cancelled').count(),
-        
-        'total_revenue': orders.filter(
-            status__in=['delivered', 'shipped', 'confirmed']
-        ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00'),
-        
-        'average_order_value': orders.aggregate(
-            avg=Avg('total_amount')
-        )['avg'] or Decimal('0.00'),
-        
-        'today_orders': orders.filter(created_at__date=today).count(),
-        'today_revenue': orders.filter(
-            created_at__date=today,
-            status__in=['delivered', 'shipped', 'confirmed']
-        ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00'),
-        
-        'month_orders': orders.filter(created_at__date__gte=month_start).count(),
-        'month_revenue': orders.filter(
-            created_at__date__gte=month_start,
-            status__in=['delivered', 'shipped', 'confirmed']
-        ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00'),
-    }
+    today = timezone.localdate()
+    today_start = timezone.make_aware(datetime.combine(today, time.min))
+    month_start = timezone.make_aware(datetime.combine(today.replace(day=1), time.min))
+    revenue = Q(status__in=['delivered', 'shipped', 'confirmed'])
+    
+    # All counters in one scan, cached briefly per scope
+    scope = 'global' if request.user.is_staff else f'user:{request.user.pk}'
+    stats = StatsQuery(orders).count(
+        'total_orders'
+    ).count(
+        'pending_orders', status='pending'
+    ).count(
+        'confirmed_orders', status='confirmed'
+    ).count(
+        'shipped_orders', status='shipped'
+    ).count(
+        'delivered_orders', status='delivered'
+    ).count(
+        'cancelled_orders', status='cancelled'
+    ).sum(
+        'total_revenue', 'total_amount', revenue
+    ).avg(
+        'average_order_value', 'total_amount'
+    ).count(
+        'today_orders', created_at__gte=today_start
+    ).sum(
+        'today_revenue', 'total_amount', revenue, created_at__gte=today_start
+    ).count(
+        'month_orders', created_at__gte=month_start
+    ).sum(
+        'month_revenue', 'total_amount', revenue, created_at__gte=month_start
+    ).cached(f'orders:{scope}:{today.isoformat()}')
     
     serializer = OrderStatsSerializer(stats)
     return Response(serializer.data)
@@ -533,40 +515,13 @@ def track_order(request):
             'error': 'Order number and email are required.'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        order = Order.objects.get(
-            order_number=order_number,
-            customer_email__iexact=email
-        )
-    except Order.DoesNotExist:
+    snapshot = OrderTrackingService.by_number(order_number)
+    if snapshot is None or snapshot['email'] != email:
         return Response({
             'error': 'Order not found.'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    # Build timeline
-    timeline = []
-    for history in order.status_history.all().order_by('created_at'):
-        timeline.append({
-            'status': history.new_status,
-            'status_display': dict(Order.ORDER_STATUS_CHOICES).get(history.new_status, history.new_status),
-            'timestamp': history.created_at,
-            'comment': history.comment,
-        })
-    
-    tracking_data = {
-        'order_number': order.order_number,
-        'status': order.status,
-        'status_display': order.get_status_display(),
-        'tracking_number': order.tracking_number,
-        'courier_company': order.courier_company,
-        'estimated_delivery_date': order.estimated_delivery_date,
-        'timeline': timeline,
-        'current_location': '',
-        'last_update': order.updated_at,
-    }
-    
-    serializer = OrderTrackingSerializer(tracking_data)
-    return Response(serializer.data)
+    return ConditionalCache.response(request, snapshot, private=True)
 
 
 class PaymentProofViewSet(ModelViewSet):
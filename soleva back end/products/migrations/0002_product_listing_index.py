@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+from utils.migrations import AddIndexConcurrently, RemoveIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Concurrent index builds cannot run inside a transaction; products stay writable meanwhile
+    atomic = False
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    # The new index is built before the one it replaces is dropped
+    operations = [
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'created_at'], name='products_is_acti_d5bdcf_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='product',
+            name='products_created_e1ba5f_idx',
+        ),
+    ]
@@ -171,7 +171,8 @@ class Product(models.Model):
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['brand', 'is_active']),
             models.Index(fields=['is_active', 'is_featured']),
-            models.Index(fields=['created_at']),
+            # Storefront listings: active products, newest first
+            models.Index(fields=['is_active', 'created_at']),
             models.Index(fields=['price']),
         ]
     
@@ -7,6 +7,8 @@ from django.core.cache import cache
 from django_filters.rest_framework import DjangoFilterBackend
 from fuzzywuzzy import fuzz, process
 
+from utils.db_router import ReplicaReadMixin, use_replica
+
 from .models import Category, Brand, Product, ProductImage, ProductAttribute
 from .serializers import (
     CategorySerializer, BrandSerializer, ProductListSerializer,
@@ -16,7 +18,7 @@ from .serializers import (
 from .filters import ProductFilter
 
 
-class CategoryViewSet(ReadOnlyModelViewSet):
+class CategoryViewSet(ReplicaReadMixin, ReadOnlyModelViewSet):
     """Category viewset"""
     
     serializer_class = CategorySerializer
@@ -59,7 +61,7 @@ class CategoryViewSet(ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
-class BrandViewSet(ReadOnlyModelViewSet):
+class BrandViewSet(ReplicaReadMixin, ReadOnlyModelViewSet):
     """Brand viewset"""
     
     serializer_class = BrandSerializer
@@ -82,7 +84,7 @@ class BrandViewSet(ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(ReplicaReadMixin, ModelViewSet):
     """Product viewset"""
     
     permission_classes = [permissions.AllowAny]
@@ -276,7 +278,7 @@ class ProductViewSet(ModelViewSet):
         return Response(serializer.data)
 
 
-class ProductAttributeViewSet(ReadOnlyModelViewSet):
+class ProductAttributeViewSet(ReplicaReadMixin, ReadOnlyModelViewSet):
     """Product attribute viewset"""
     
     serializer_class = ProductAttributeSerializer
@@ -292,6 +294,7 @@ class ProductAttributeViewSet(ReadOnlyModelViewSet):
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@use_replica
 def product_stats(request):
     """Get product statistics"""
     cache_key = 'product_stats'
@@ -324,6 +327,7 @@ def product_stats(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@use_replica
 def search_suggestions(request):
     """Get search suggestions"""
     query = request.GET.get('q', '').strip()
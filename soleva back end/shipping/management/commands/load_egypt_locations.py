@@ -1,5 +1,7 @@
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
 from shipping.models import Governorate, City
+from shipping.services import ShippingQuoteEngine
 
 
 class Command(BaseCommand):
@@ -70,29 +72,49 @@ class Command(BaseCommand):
         
         self.stdout.write('Loading governorates...')
         
-        for gov_data in governorates_data:
-            governorate, created = Governorate.objects.get_or_create(
-                code=gov_data['code'],
-                defaults=gov_data
-            )
-            if created:
-                self.stdout.write(f'Created governorate: {governorate.name_en}')
-            
-            # Load cities for this governorate
-            if gov_data['code'] in cities_data:
-                self.stdout.write(f'Loading cities for {governorate.name_en}...')
-                for city_data in cities_data[gov_data['code']]:
-                    city, created = City.objects.get_or_create(
-                        governorate=governorate,
-                        name_en=city_data['name_en'],
-                        defaults=city_data
-                    )
-                    if created:
-                        self.stdout.write(f'  Created city: {city.name_en}')
+        # Upsert everything in two statements; names are refreshed on re-runs
+        existing_codes = set(Governorate.objects.values_list('code', flat=True))
+        Governorate.objects.bulk_create(
+            [Governorate(**gov_data) for gov_data in governorates_data],
+            update_conflicts=True,
+            unique_fields=['code'],
+            update_fields=['name_en', 'name_ar'],
+        )
+        governorate_ids = dict(
+            Governorate.objects.filter(
+                code__in=[gov_data['code'] for gov_data in governorates_data]
+            ).values_list('code', 'id')
+        )
+        
+        self.stdout.write('Loading cities...')
+        
+        cities = [
+            City(governorate_id=governorate_ids[code], **city_data)
+            for code, governorate_cities in cities_data.items()
+            for city_data in governorate_cities
+        ]
+        existing_cities = set(
+            City.objects.filter(governorate_id__in=governorate_ids.values()).values_list('governorate_id', 'name_en')
+        )
+        City.objects.bulk_create(
+            cities,
+            update_conflicts=True,
+            unique_fields=['governorate', 'name_en'],
+            update_fields=['name_ar'],
+        )
         
+        # Bulk upserts bypass model signals, so rebuild the quote table and location index here
+        ShippingQuoteEngine.invalidate()
+        cache.delete('governorates_list')
+        
+        created_governorates = len(governorate_ids.keys() - existing_codes)
+        created_cities = sum(
+            1 for city in cities if (city.governorate_id, city.name_en) not in existing_cities
+        )
         self.stdout.write(
             self.style.SUCCESS(
                 f'Successfully loaded {Governorate.objects.count()} governorates '
-                f'and {City.objects.count()} cities'
+                f'and {City.objects.count()} cities '
+                f'({created_governorates} governorates and {created_cities} cities created)'
             )
         )
@@ -0,0 +1,211 @@
+"""
+In-memory location index for address autocomplete and validation
+"""
+
+import bisect
+import difflib
+import re
+from typing import Dict, List, Optional
+
+# Arabic diacritics (tashkeel), superscript alef and tatweel carry no meaning for matching
+ARABIC_DIACRITICS = re.compile('[\u064B-\u0652\u0670\u0640]')
+
+ARABIC_FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',  # alef variants
+    'ى': 'ي', 'ئ': 'ي',                       # alef maksura / yaa with hamza
+    'ة': 'ه',                                 # taa marbuta
+    'ؤ': 'و',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+NON_WORD = re.compile(r'[^\w]+')
+
+# Minimum similarity for fuzzy matches (difflib ratio)
+FUZZY_CUTOFF = 0.75
+
+
+def normalize_location_name(text: str) -> str:
+    """Fold case, Arabic letter variants, diacritics and punctuation"""
+    if not text:
+        return ''
+    text = ARABIC_DIACRITICS.sub('', str(text).casefold())
+    text = text.translate(ARABIC_FOLDING)
+    return ' '.join(NON_WORD.sub(' ', text).split())
+
+
+def _strip_article(word: str) -> str:
+    """Drop the Arabic definite article so 'القاهره' also matches 'قاهره'"""
+    if word.startswith('ال') and len(word) > 3:
+        return word[2:]
+    return word
+
+
+def location_keys(name: str) -> List[str]:
+    """All prefix-searchable keys of a location name"""
+    normalized = normalize_location_name(name)
+    if not normalized:
+        return []
+    keys = {normalized}
+    for word in normalized.split():
+        keys.add(word)
+        keys.add(_strip_article(word))
+    return list(keys)
+
+
+class LocationIndex:
+    """Prefix, substring and fuzzy lookup over active governorates and cities"""
+
+    GOVERNORATE = 'governorate'
+    CITY = 'city'
+
+    def __init__(self, governorates: Dict[int, Dict], cities: Dict[int, Dict]):
+        self.governorates = governorates
+        self.cities = cities
+
+        cities_by_governorate = {governorate_id: [] for governorate_id in governorates}
+        for city in sorted(cities.values(), key=lambda city: (city.get('display_order', 0), city['name_en'])):
+            cities_by_governorate.setdefault(city['governorate_id'], []).append(city['id'])
+        self.cities_by_governorate = {
+            governorate_id: tuple(city_ids) for governorate_id, city_ids in cities_by_governorate.items()
+        }
+
+        keys = []
+        self.names = {}
+        self.exact_governorates = {}
+        self.exact_cities = {}
+        for kind, entries in ((self.GOVERNORATE, governorates), (self.CITY, cities)):
+            for entry in entries.values():
+                names = [entry['name_en'], entry['name_ar']]
+                if kind == self.GOVERNORATE:
+                    names.append(entry['code'])
+                normalized = [normalize_location_name(name) for name in names if name]
+                self.names[(kind, entry['id'])] = tuple(normalized)
+
+                for name in normalized:
+                    if kind == self.GOVERNORATE:
+                        self.exact_governorates.setdefault(name, entry['id'])
+                        self.exact_governorates.setdefault(_strip_article(name), entry['id'])
+                    else:
+                        self.exact_cities.setdefault((entry['governorate_id'], name), entry['id'])
+                        self.exact_cities.setdefault((entry['governorate_id'], _strip_article(name)), entry['id'])
+
+                for name in names:
+                    for key in location_keys(name):
+                        keys.append((key, kind, entry['id']))
+
+        keys.sort()
+        self.keys = keys
+        self.key_strings = [key for key, _, _ in keys]
+
+    def _rank(self, query: str, kind: str, fuzzy: bool) -> List[int]:
+        """IDs of ``kind`` matching ``query``: prefix matches first, then substring, then fuzzy"""
+        ranked = {}
+
+        # Prefix matches on whole names and individual words
+        start = bisect.bisect_left(self.key_strings, query)
+        for position in range(start, len(self.keys)):
+            key, key_kind, entry_id = self.keys[position]
+            if not key.startswith(query):
+                break
+            if key_kind == kind:
+                score = 0 if key == query else 1
+                ranked[entry_id] = min(ranked.get(entry_id, score), score)
+
+        # Substring matches keep parity with the old icontains search
+        for (entry_kind, entry_id), names in self.names.items():
+            if entry_kind == kind and entry_id not in ranked and any(query in name for name in names):
+                ranked[entry_id] = 2
+
+        if fuzzy and not ranked:
+            for (entry_kind, entry_id), names in self.names.items():
+                if entry_kind != kind:
+                    continue
+                best = max(
+                    (difflib.SequenceMatcher(None, query, name).ratio() for name in names),
+                    default=0,
+                )
+                if best >= FUZZY_CUTOFF:
+                    ranked[entry_id] = 3 + (1 - best)
+
+        entries = self.governorates if kind == self.GOVERNORATE else self.cities
+        return sorted(
+            ranked,
+            key=lambda entry_id: (ranked[entry_id], entries[entry_id].get('display_order', 0), entries[entry_id]['name_en'])
+        )
+
+    def search(self, query: str, governorate_limit: int = 5, city_limit: int = 10, fuzzy: bool = True) -> Dict:
+        """Autocomplete results in the search_locations response format"""
+        query = normalize_location_name(query)
+        if not query:
+            return {'governorates': [], 'cities': []}
+
+        governorates = [
+            {
+                'id': governorate_id,
+                'name_en': self.governorates[governorate_id]['name_en'],
+                'name_ar': self.governorates[governorate_id]['name_ar'],
+                'code': self.governorates[governorate_id]['code'],
+            }
+            for governorate_id in self._rank(query, self.GOVERNORATE, fuzzy)[:governorate_limit]
+        ]
+
+        cities = []
+        for city_id in self._rank(query, self.CITY, fuzzy)[:city_limit]:
+            city = self.cities[city_id]
+            governorate = self.governorates[city['governorate_id']]
+            cities.append({
+                'id': city_id,
+                'name_en': city['name_en'],
+                'name_ar': city['name_ar'],
+                'governorate': {
+                    'id': governorate['id'],
+                    'name_en': governorate['name_en'],
+                    'name_ar': governorate['name_ar'],
+                },
+            })
+
+        return {'governorates': governorates, 'cities': cities}
+
+    def match_governorate(self, name: str) -> Optional[Dict]:
+        """Governorate whose name or code equals ``name`` after normalization"""
+        normalized = normalize_location_name(name)
+        governorate_id = self.exact_governorates.get(normalized) or self.exact_governorates.get(_strip_article(normalized))
+        return self.governorates.get(governorate_id) if governorate_id else None
+
+    def match_city(self, governorate_id: int, name: str) -> Optional[Dict]:
+        """City of a governorate whose name equals ``name`` after normalization"""
+        normalized = normalize_location_name(name)
+        city_id = (
+            self.exact_cities.get((governorate_id, normalized)) or
+            self.exact_cities.get((governorate_id, _strip_article(normalized)))
+        )
+        return self.cities.get(city_id) if city_id else None
+
+    def suggest_cities(self, governorate_id: int, name: str, limit: int = 3) -> List[Dict]:
+        """Closest city names within a governorate, for 'did you mean' hints"""
+        normalized = normalize_location_name(name)
+        scored = []
+        for city_id in self.cities_by_governorate.get(governorate_id, ()):
+            names = self.names[(self.CITY, city_id)]
+            best = max((difflib.SequenceMatcher(None, normalized, candidate).ratio() for candidate in names), default=0)
+            if best >= FUZZY_CUTOFF:
+                scored.append((best, city_id))
+        scored.sort(reverse=True)
+        return [self.cities[city_id] for _, city_id in scored[:limit]]
+
+    def suggest_governorates(self, name: str, limit: int = 3) -> List[Dict]:
+        """Closest governorate names, for 'did you mean' hints"""
+        normalized = normalize_location_name(name)
+        scored = []
+        for governorate_id in self.governorates:
+            names = self.names[(self.GOVERNORATE, governorate_id)]
+            best = max((difflib.SequenceMatcher(None, normalized, candidate).ratio() for candidate in names), default=0)
+            if best >= FUZZY_CUTOFF:
+                scored.append((best, governorate_id))
+        scored.sort(reverse=True)
+        return [self.governorates[governorate_id] for _, governorate_id in scored[:limit]]
+
+    def cities_for(self, governorate_id: int) -> List[Dict]:
+        """Active cities of a governorate in display order"""
+        return [self.cities[city_id] for city_id in self.cities_by_governorate.get(governorate_id, ())]
@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from decimal import Decimal
 from .models import Governorate, City, ShippingMethod, ShippingZone, ShippingRate
+from .services import ShippingQuoteEngine
 
 
 class CitySerializer(serializers.ModelSerializer):
@@ -102,22 +104,46 @@ class ShippingCalculationSerializer(serializers.Serializer):
     
     def validate_governorate_id(self, value):
         """Validate governorate exists"""
-        try:
-            Governorate.objects.get(id=value, is_active=True)
-        except Governorate.DoesNotExist:
+        if value not in ShippingQuoteEngine.get_table().governorates:
             raise serializers.ValidationError("Governorate not found.")
         return value
     
     def validate_city_id(self, value):
         """Validate city exists if provided"""
-        if value:
-            try:
-                City.objects.get(id=value, is_active=True)
-            except City.DoesNotExist:
-                raise serializers.ValidationError("City not found.")
+        if value and value not in ShippingQuoteEngine.get_table().cities:
+            raise serializers.ValidationError("City not found.")
         return value
 
 
+class ShippingDestinationSerializer(serializers.Serializer):
+    """One destination of a batch shipping quote"""
+    
+    governorate = serializers.CharField(max_length=100, help_text='Governorate ID, name or code')
+    city = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+    weight = serializers.DecimalField(max_digits=8, decimal_places=3, required=False, default=Decimal('0.500'))
+    order_total = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, default=Decimal('0.00'))
+
+
+class ShippingBatchQuoteSerializer(serializers.Serializer):
+    """Batch shipping quote request serializer"""
+    
+    destinations = ShippingDestinationSerializer(many=True, allow_empty=False, max_length=5000)
+    include_delivery_date = serializers.BooleanField(required=False, default=False)
+
+
+class ShippingPriceMatrixSerializer(serializers.Serializer):
+    """Governorate x weight price matrix request serializer"""
+    
+    weights = serializers.ListField(
+        child=serializers.DecimalField(max_digits=8, decimal_places=3, min_value=Decimal('0.000')),
+        allow_empty=False,
+        max_length=50,
+        default=[Decimal('0.500'), Decimal('1.000'), Decimal('2.000'), Decimal('5.000'), Decimal('10.000')]
+    )
+    order_total = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, default=Decimal('0.00'))
+    governorate_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
 class ShippingOptionSerializer(serializers.Serializer):
     """Shipping option response serializer"""
     
@@ -146,29 +172,25 @@ class AddressValidationSerializer(serializers.Serializer):
         """Validate address components"""
         governorate_name = attrs['governorate']
         city_name = attrs['city']
+        index = ShippingQuoteEngine.get_table().location_index
         
         # Check if governorate exists
-        try:
-            governorate = Governorate.objects.get(
-                Q(name_en__iexact=governorate_name) | Q(name_ar__iexact=governorate_name),
-                is_active=True
-            )
-        except Governorate.DoesNotExist:
-            raise serializers.ValidationError({
-                'governorate': f'Governorate "{governorate_name}" not found.'
-            })
+        governorate = index.match_governorate(governorate_name)
+        if governorate is None:
+            message = f'Governorate "{governorate_name}" not found.'
+            suggestions = index.suggest_governorates(governorate_name)
+            if suggestions:
+                message += ' Did you mean: ' + ', '.join(item['name_en'] for item in suggestions) + '?'
+            raise serializers.ValidationError({'governorate': message})
         
         # Check if city exists in this governorate
-        try:
-            city = City.objects.get(
-                Q(name_en__iexact=city_name) | Q(name_ar__iexact=city_name),
-                governorate=governorate,
-                is_active=True
-            )
-        except City.DoesNotExist:
-            raise serializers.ValidationError({
-                'city': f'City "{city_name}" not found in {governorate.name_en}.'
-            })
+        city = index.match_city(governorate['id'], city_name)
+        if city is None:
+            message = f'City "{city_name}" not found in {governorate["name_en"]}.'
+            suggestions = index.suggest_cities(governorate['id'], city_name)
+            if suggestions:
+                message += ' Did you mean: ' + ', '.join(item['name_en'] for item in suggestions) + '?'
+            raise serializers.ValidationError({'city': message})
         
         attrs['governorate_obj'] = governorate
         attrs['city_obj'] = city
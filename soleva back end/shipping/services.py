@@ -0,0 +1,365 @@
+"""
+Shipping quote engine backed by an in-process rate table
+"""
+
+import bisect
+import logging
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+
+from utils.cache import VersionedCache
+from .search import LocationIndex
+
+logger = logging.getLogger(__name__)
+
+SHIPPING_TABLE_NAMESPACE = 'shipping_rate_table'
+
+# How often a process re-reads the shared table version (seconds)
+SHIPPING_TABLE_VERSION_CHECK_INTERVAL = 5
+
+# Order cost used when the address cannot be matched to a governorate
+DEFAULT_SHIPPING_COST = Decimal('30.00')
+DEFAULT_SHIPPING_METHOD_CODE = 'standard'
+
+
+class InvalidShippingLocation(Exception):
+    """Raised when a governorate/city pair is unknown or inactive"""
+
+
+class RateBracket:
+    """Weight/order-value bracket of a zone ShippingRate"""
+
+    __slots__ = ('min_weight', 'max_weight', 'min_order_value', 'max_order_value', 'base_cost', 'cost_per_kg')
+
+    def __init__(self, rate):
+        self.min_weight = rate.min_weight
+        self.max_weight = rate.max_weight
+        self.min_order_value = rate.min_order_value
+        self.max_order_value = rate.max_order_value
+        self.base_cost = rate.base_cost
+        self.cost_per_kg = rate.cost_per_kg
+
+    def covers(self, weight, order_value):
+        """Same rules as ShippingRate.is_applicable"""
+        if weight < self.min_weight or (self.max_weight and weight > self.max_weight):
+            return False
+        if order_value < self.min_order_value or (self.max_order_value and order_value > self.max_order_value):
+            return False
+        return True
+
+    def cost(self, weight):
+        cost = self.base_cost
+        if weight > 0:
+            cost += self.cost_per_kg * Decimal(str(weight))
+        return cost
+
+
+class RateBrackets:
+    """Brackets of one zone/method pair, sorted for interval lookup on weight"""
+
+    __slots__ = ('brackets', 'min_weights')
+
+    def __init__(self, brackets):
+        self.brackets = tuple(sorted(brackets, key=lambda bracket: (bracket.min_weight, bracket.min_order_value)))
+        self.min_weights = [bracket.min_weight for bracket in self.brackets]
+
+    def find(self, weight, order_value) -> Optional[RateBracket]:
+        """Most specific bracket covering weight and order value"""
+        # Only brackets starting at or below the weight can cover it
+        position = bisect.bisect_right(self.min_weights, weight)
+        for bracket in reversed(self.brackets[:position]):
+            if bracket.covers(weight, order_value):
+                return bracket
+        return None
+
+
+class ShippingRateTable:
+    """Immutable snapshot of locations, methods and zone rates"""
+
+    def __init__(self, version, governorates, cities, methods, rates):
+        self.version = version
+        self.governorates = MappingProxyType(governorates)
+        self.cities = MappingProxyType(cities)
+        self.methods = tuple(methods)
+        self.rates = MappingProxyType(rates)
+
+        self.location_index = LocationIndex(self.governorates, self.cities)
+
+    @classmethod
+    def load(cls, version):
+        """Build a table from the database"""
+        from .models import Governorate, City, ShippingMethod, ShippingZone, ShippingRate
+
+        governorates = {
+            governorate['id']: governorate
+            for governorate in Governorate.objects.filter(is_active=True).values(
+                'id', 'name_en', 'name_ar', 'code', 'base_shipping_cost', 'display_order'
+            )
+        }
+        cities = {
+            city['id']: city
+            for city in City.objects.filter(is_active=True, governorate__is_active=True).values(
+                'id', 'governorate_id', 'name_en', 'name_ar',
+                'additional_shipping_cost', 'estimated_delivery_days', 'display_order'
+            )
+        }
+        methods = list(
+            ShippingMethod.objects.filter(is_active=True).order_by('display_order', 'name_en').values(
+                'id', 'name_en', 'name_ar', 'code', 'description_en', 'base_cost', 'cost_per_kg',
+                'free_shipping_threshold', 'min_delivery_days', 'max_delivery_days', 'max_weight'
+            )
+        )
+
+        # Resolve zones to governorates up front; the first zone with rates wins
+        zone_brackets = {}
+        for rate in ShippingRate.objects.filter(is_active=True, zone__is_active=True, method__is_active=True):
+            zone_brackets.setdefault((rate.zone_id, rate.method_id), []).append(RateBracket(rate))
+
+        rates = {}
+        zone_links = ShippingZone.governorates.through.objects.filter(
+            shippingzone__is_active=True
+        ).order_by('shippingzone_id').values_list('shippingzone_id', 'governorate_id')
+        for zone_id, governorate_id in zone_links:
+            for method in methods:
+                brackets = zone_brackets.get((zone_id, method['id']))
+                if brackets and (governorate_id, method['id']) not in rates:
+                    rates[(governorate_id, method['id'])] = RateBrackets(brackets)
+
+        return cls(version, governorates, cities, methods, rates)
+
+    def resolve_location(self, governorate, city=None) -> Tuple[Dict, Optional[Dict]]:
+        """Resolve a governorate and optional city given by ID or name"""
+        if isinstance(governorate, str) and not governorate.strip().isdigit():
+            governorate_entry = self.location_index.match_governorate(governorate)
+        else:
+            governorate_entry = self.governorates.get(int(governorate)) if governorate else None
+        if governorate_entry is None:
+            raise InvalidShippingLocation(f'Governorate "{governorate}" not found.')
+
+        if not city:
+            return governorate_entry, None
+
+        if isinstance(city, str) and not city.strip().isdigit():
+            city_entry = self.location_index.match_city(governorate_entry['id'], city)
+        else:
+            city_entry = self.cities.get(int(city))
+        if city_entry is None or city_entry['governorate_id'] != governorate_entry['id']:
+            raise InvalidShippingLocation(f'City "{city}" not found in {governorate_entry["name_en"]}.')
+        return governorate_entry, city_entry
+
+    def quote(self, governorate, city=None, weight=Decimal('0.500'), order_total=Decimal('0.00')) -> List[Dict]:
+        """Shipping options for a destination, cheapest first"""
+        governorate_entry, city_entry = self.resolve_location(governorate, city)
+        return self.quote_resolved(governorate_entry, city_entry, weight, order_total)
+
+    def quote_resolved(self, governorate_entry, city_entry, weight, order_total) -> List[Dict]:
+        """Shipping options for an already resolved destination"""
+        weight = Decimal(str(weight))
+        order_total = Decimal(str(order_total))
+        surcharge = governorate_entry['base_shipping_cost']
+        extra_days = 0
+        if city_entry:
+            surcharge += city_entry['additional_shipping_cost']
+            extra_days = city_entry['estimated_delivery_days']
+
+        options = []
+        for method in self.methods:
+            # Check weight restrictions
+            if method['max_weight'] and weight > method['max_weight']:
+                continue
+
+            brackets = self.rates.get((governorate_entry['id'], method['id']))
+            if brackets is not None:
+                # Zone pricing replaces the method's own base and per-kg cost
+                bracket = brackets.find(weight, order_total)
+                if bracket is None:
+                    continue
+                cost = bracket.cost(weight)
+            else:
+                cost = method['base_cost']
+                if weight > 0:
+                    cost += method['cost_per_kg'] * weight
+
+            threshold = method['free_shipping_threshold']
+            is_free = bool(threshold and order_total >= threshold)
+            cost = Decimal('0.00') if is_free else (cost + surcharge).quantize(Decimal('0.01'))
+
+            options.append({
+                'method_id': method['id'],
+                'method_name': method['name_en'],
+                'method_code': method['code'],
+                'description': method['description_en'],
+                'cost': cost,
+                'estimated_days_min': method['min_delivery_days'] + extra_days,
+                'estimated_days_max': method['max_delivery_days'] + extra_days,
+                'is_free': is_free,
+                'free_shipping_threshold': threshold,
+            })
+
+        # Sort by cost
+        options.sort(key=lambda option: option['cost'])
+        return options
+
+    def quote_many(self, destinations) -> List[Dict]:
+        """
+        Quote a list of destinations in one pass
+
+        Each destination is a mapping with ``governorate``, optional ``city``,
+        ``weight`` and ``order_total``. Identical destinations are priced once.
+        Results keep the input order; unknown locations carry an ``error``.
+        """
+        results = []
+        memo = {}
+        for index, destination in enumerate(destinations):
+            governorate = destination.get('governorate')
+            city = destination.get('city')
+            weight = Decimal(str(destination.get('weight', Decimal('0.500'))))
+            order_total = Decimal(str(destination.get('order_total', Decimal('0.00'))))
+            result = {'index': index, 'weight': weight, 'order_total': order_total}
+
+            try:
+                governorate_entry, city_entry = self.resolve_location(governorate, city)
+            except (InvalidShippingLocation, ValueError) as e:
+                result['error'] = str(e)
+                results.append(result)
+                continue
+
+            key = (governorate_entry['id'], city_entry['id'] if city_entry else None, weight, order_total)
+            if key not in memo:
+                memo[key] = self.quote_resolved(governorate_entry, city_entry, weight, order_total)
+            options = memo[key]
+
+            result.update({
+                'governorate_id': governorate_entry['id'],
+                'governorate': governorate_entry['name_en'],
+                'city_id': city_entry['id'] if city_entry else None,
+                'city': city_entry['name_en'] if city_entry else None,
+                'cheapest_cost': options[0]['cost'] if options else None,
+                'shipping_options': options,
+            })
+            results.append(result)
+        return results
+
+    def price_matrix(self, weights, order_total=Decimal('0.00'), governorate_ids=None) -> Dict:
+        """Cheapest cost per governorate and weight, plus per-method costs"""
+        governorates = sorted(self.governorates.values(), key=lambda governorate: governorate['name_en'])
+        if governorate_ids:
+            governorates = [governorate for governorate in governorates if governorate['id'] in governorate_ids]
+
+        rows = []
+        for governorate in governorates:
+            cells = []
+            for weight in weights:
+                options = self.quote_resolved(governorate, None, weight, order_total)
+                cells.append({
+                    'weight': weight,
+                    'cheapest_cost': options[0]['cost'] if options else None,
+                    'methods': {option['method_code']: option['cost'] for option in options},
+                })
+            rows.append({
+                'governorate_id': governorate['id'],
+                'governorate': governorate['name_en'],
+                'governorate_ar': governorate['name_ar'],
+                'costs': cells,
+            })
+
+        return {
+            'weights': list(weights),
+            'order_total': order_total,
+            'methods': [method['code'] for method in self.methods],
+            'rows': rows,
+        }
+
+
+def estimate_delivery_date(business_days, start_date=None):
+    """Add business days to a date, skipping Egyptian weekends (Friday and Saturday)"""
+    from django.utils import timezone
+
+    estimated_date = start_date or timezone.now().date()
+    days_added = 0
+    while days_added < business_days:
+        estimated_date += timedelta(days=1)
+        if estimated_date.weekday() not in [4, 5]:  # 4=Friday, 5=Saturday
+            days_added += 1
+    return estimated_date
+
+
+class ShippingQuoteEngine:
+    """Process-wide access to the current shipping rate table"""
+
+    _table = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_table(cls) -> ShippingRateTable:
+        """Current table; reloaded when the shared version moves"""
+        table = cls._table
+        now = time.monotonic()
+        if table is not None and now - cls._checked_at < SHIPPING_TABLE_VERSION_CHECK_INTERVAL:
+            return table
+
+        version = VersionedCache.get_version(SHIPPING_TABLE_NAMESPACE)
+        if table is not None and table.version == version:
+            cls._checked_at = now
+            return table
+
+        with cls._lock:
+            table = cls._table
+            if table is None or table.version != version:
+                table = ShippingRateTable.load(version)
+                cls._table = table
+                logger.info(f"Shipping rate table loaded (version {version})")
+            cls._checked_at = now
+        return table
+
+    @classmethod
+    def invalidate(cls):
+        """Mark the table stale in every process"""
+        VersionedCache.bump_version(SHIPPING_TABLE_NAMESPACE)
+        cls._table = None
+
+    @classmethod
+    def quote(cls, governorate, city=None, weight=Decimal('0.500'), order_total=Decimal('0.00')):
+        """Shipping options for a destination, cheapest first"""
+        return cls.get_table().quote(governorate, city, weight, order_total)
+
+    @classmethod
+    def quote_many(cls, destinations):
+        """Quote many destinations against one table snapshot"""
+        return cls.get_table().quote_many(destinations)
+
+    @classmethod
+    def order_shipping_cost(cls, governorate, city=None, weight=Decimal('0.500'),
+                            order_total=Decimal('0.00'), method_code=DEFAULT_SHIPPING_METHOD_CODE):
+        """
+        Cost charged for an order to a saved address
+
+        Uses the requested method when it is available for the destination,
+        otherwise the cheapest option. Free-text addresses that do not match a
+        governorate fall back to DEFAULT_SHIPPING_COST.
+        """
+        table = cls.get_table()
+        try:
+            governorate_entry, city_entry = table.resolve_location(governorate)
+            if city:
+                try:
+                    governorate_entry, city_entry = table.resolve_location(governorate, city)
+                except InvalidShippingLocation:
+                    city_entry = None
+        except InvalidShippingLocation:
+            logger.warning(f"No shipping rates for governorate '{governorate}', using default cost")
+            return DEFAULT_SHIPPING_COST
+
+        options = table.quote_resolved(governorate_entry, city_entry, weight, order_total)
+        if not options:
+            return DEFAULT_SHIPPING_COST
+
+        for option in options:
+            if option['method_code'] == method_code:
+                return option['cost']
+        return options[0]['cost']
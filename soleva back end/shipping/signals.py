@@ -0,0 +1,34 @@
+"""
+Invalidate the shipping rate table when admins edit shipping data
+"""
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Governorate, City, ShippingMethod, ShippingZone, ShippingRate
+from .services import ShippingQuoteEngine
+
+
+@receiver(post_save, sender=Governorate)
+@receiver(post_delete, sender=Governorate)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=ShippingMethod)
+@receiver(post_delete, sender=ShippingMethod)
+@receiver(post_save, sender=ShippingZone)
+@receiver(post_delete, sender=ShippingZone)
+@receiver(post_save, sender=ShippingRate)
+@receiver(post_delete, sender=ShippingRate)
+def invalidate_shipping_rate_table(sender, instance, **kwargs):
+    """Move every process to a fresh rate table"""
+    ShippingQuoteEngine.invalidate()
+    cache.delete('governorates_list')
+    cache.delete('shipping_zones')
+
+
+@receiver(m2m_changed, sender=ShippingZone.governorates.through)
+def invalidate_shipping_rate_table_on_zone_change(sender, instance, action, **kwargs):
+    """Zone membership decides which rates a governorate uses"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        ShippingQuoteEngine.invalidate()
+        cache.delete('shipping_zones')
@@ -10,6 +10,8 @@ router.register(r'methods', views.ShippingMethodViewSet, basename='shipping-meth
 urlpatterns = [
     path('', include(router.urls)),
     path('calculate/', views.calculate_shipping, name='calculate-shipping'),
+    path('batch-quote/', views.batch_quote, name='batch-quote'),
+    path('price-matrix/', views.price_matrix, name='price-matrix'),
     path('validate-address/', views.validate_address, name='validate-address'),
     path('estimate-delivery/', views.estimate_delivery, name='estimate-delivery'),
     path('search/', views.search_locations, name='search-locations'),
@@ -13,9 +13,11 @@ from .models import Governorate, City, ShippingMethod, ShippingZone, ShippingRat
 from .serializers import (
     GovernorateSerializer, CitySerializer, ShippingMethodSerializer,
     ShippingCalculationSerializer, ShippingOptionSerializer,
+    ShippingBatchQuoteSerializer, ShippingPriceMatrixSerializer,
     AddressValidationSerializer, DeliveryEstimateSerializer,
     DeliveryEstimateResponseSerializer
 )
+from .services import ShippingQuoteEngine, InvalidShippingLocation, estimate_delivery_date
 
 
 class GovernorateViewSet(ReadOnlyModelViewSet):
@@ -100,72 +102,21 @@ def calculate_shipping(request):
     total_weight = data['total_weight']
     order_total = data['order_total']
     
+    # Quotes are served from the in-process rate table, no queries per request
+    table = ShippingQuoteEngine.get_table()
     try:
-        governorate = Governorate.objects.get(id=governorate_id, is_active=True)
-        city = None
-        if city_id:
-            city = City.objects.get(id=city_id, is_active=True, governorate=governorate)
-    except (Governorate.DoesNotExist, City.DoesNotExist):
+        governorate, city = table.resolve_location(governorate_id, city_id)
+    except InvalidShippingLocation:
         return Response({
             'error': 'Invalid location.'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get available shipping methods
-    shipping_methods = ShippingMethod.objects.filter(is_active=True)
-    shipping_options = []
-    
-    for method in shipping_methods:
-        # Check weight restrictions
-        if method.max_weight and total_weight > method.max_weight:
-            continue
-        
-        # Calculate cost
-        cost = method.calculate_cost(total_weight, order_total)
-        
-        # Add governorate base cost
-        cost += governorate.base_shipping_cost
-        
-        # Add city additional cost if applicable
-        if city:
-            cost += city.additional_shipping_cost
-        
-        # Check if free shipping applies
-        is_free = (
-            method.free_shipping_threshold and 
-            order_total >= method.free_shipping_threshold
-        )
-        
-        if is_free:
-            cost = Decimal('0.00')
-        
-        # Estimate delivery days
-        base_days = method.min_delivery_days
-        max_days = method.max_delivery_days
-        
-        if city:
-            # Add city-specific delivery time
-            base_days += city.estimated_delivery_days
-            max_days += city.estimated_delivery_days
-        
-        shipping_options.append({
-            'method_id': method.id,
-            'method_name': method.name_en,
-            'method_code': method.code,
-            'description': method.description_en,
-            'cost': cost,
-            'estimated_days_min': base_days,
-            'estimated_days_max': max_days,
-            'is_free': is_free,
-            'free_shipping_threshold': method.free_shipping_threshold,
-        })
-    
-    # Sort by cost
-    shipping_options.sort(key=lambda x: x['cost'])
+    shipping_options = table.quote_resolved(governorate, city, total_weight, order_total)
     
     response_data = {
         'location': {
-            'governorate': governorate.name_en,
-            'city': city.name_en if city else None,
+            'governorate': governorate['name_en'],
+            'city': city['name_en'] if city else None,
         },
         'shipping_options': shipping_options,
         'total_weight': total_weight,
@@ -175,6 +126,49 @@ def calculate_shipping(request):
     return Response(response_data)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def batch_quote(request):
+    """Quote many governorate/city/weight/order total combinations at once (admin only)"""
+    serializer = ShippingBatchQuoteSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    table = ShippingQuoteEngine.get_table()
+    results = table.quote_many(serializer.validated_data['destinations'])
+    
+    if serializer.validated_data['include_delivery_date']:
+        today = timezone.now().date()
+        for result in results:
+            for option in result.get('shipping_options', []):
+                option['estimated_date'] = estimate_delivery_date(option['estimated_days_min'], today)
+    
+    return Response({
+        'count': len(results),
+        'table_version': table.version,
+        'results': results,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def price_matrix(request):
+    """Cheapest shipping cost for every governorate and weight bracket (admin only)"""
+    serializer = ShippingPriceMatrixSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    table = ShippingQuoteEngine.get_table()
+    matrix = table.price_matrix(
+        data['weights'],
+        order_total=data['order_total'],
+        governorate_ids=set(data.get('governorate_ids') or []),
+    )
+    matrix['table_version'] = table.version
+    return Response(matrix)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def validate_address(request):
@@ -189,18 +183,18 @@ def validate_address(request):
     return Response({
         'valid': True,
         'governorate': {
-            'id': governorate.id,
-            'name_en': governorate.name_en,
-            'name_ar': governorate.name_ar,
-            'code': governorate.code,
+            'id': governorate['id'],
+            'name_en': governorate['name_en'],
+            'name_ar': governorate['name_ar'],
+            'code': governorate['code'],
         },
         'city': {
-            'id': city.id,
-            'name_en': city.name_en,
-            'name_ar': city.name_ar,
-            'estimated_delivery_days': city.estimated_delivery_days,
+            'id': city['id'],
+            'name_en': city['name_en'],
+            'name_ar': city['name_ar'],
+            'estimated_delivery_days': city['estimated_delivery_days'],
         },
-        'shipping_cost_estimate': governorate.base_shipping_cost + city.additional_shipping_cost,
+        'shipping_cost_estimate': governorate['base_shipping_cost'] + city['additional_shipping_cost'],
     })
 
 
@@ -244,14 +238,7 @@ def estimate_delivery(request):
         max_days += city.estimated_delivery_days
     
     # Calculate estimated date (excluding weekends)
-    estimated_date = timezone.now().date()
-    days_added = 0
-    
-    while days_added < base_days:
-        estimated_date += timedelta(days=1)
-        # Skip weekends (Friday and Saturday in Egypt)
-        if estimated_date.weekday() not in [4, 5]:  # 4=Friday, 5=Saturday
-            days_added += 1
+    estimated_date = estimate_delivery_date(base_days)
     
     note = "Delivery estimate excludes weekends and public holidays."
     if governorate.name_en not in ['Cairo', 'Giza', 'Alexandria']:
@@ -278,37 +265,8 @@ def search_locations(request):
     if not query or len(query) < 2:
         return Response([])
     
-    # Search governorates
-    governorates = Governorate.objects.filter(
-        Q(name_en__icontains=query) | Q(name_ar__icontains=query),
-        is_active=True
-    ).values('id', 'name_en', 'name_ar', 'code')[:5]
-    
-    # Search cities
-    cities = City.objects.filter(
-        Q(name_en__icontains=query) | Q(name_ar__icontains=query),
-        is_active=True
-    ).select_related('governorate').values(
-        'id', 'name_en', 'name_ar', 
-        'governorate__id', 'governorate__name_en', 'governorate__name_ar'
-    )[:10]
-    
-    results = {
-        'governorates': list(governorates),
-        'cities': [
-            {
-                'id': city['id'],
-                'name_en': city['name_en'],
-                'name_ar': city['name_ar'],
-                'governorate': {
-                    'id': city['governorate__id'],
-                    'name_en': city['governorate__name_en'],
-                    'name_ar': city['governorate__name_ar'],
-                }
-            }
-            for city in cities
-        ]
-    }
+    # Served from the in-memory index of the cached rate table
+    results = ShippingQuoteEngine.get_table().location_index.search(query)
     
     return Response(results)
 
@@ -35,6 +35,38 @@ app.conf.beat_schedule = {
         'task': 'products.tasks.check_low_stock',
         'schedule': 3600.0,  # Run every hour
     },
+    'process-tracking-events': {
+        'task': 'tracking.tasks.process_tracking_events',
+        'schedule': 5.0,  # Run every 5 seconds
+    },
+    'flush-idle-funnel-sessions': {
+        'task': 'tracking.tasks.flush_idle_funnel_sessions',
+        'schedule': 60.0,  # Run every minute
+    },
+    'dispatch-server-side-events': {
+        'task': 'tracking.tasks.dispatch_server_side_events',
+        'schedule': 60.0,  # Run every minute
+    },
+    'update-tracking-rollups': {
+        'task': 'tracking.tasks.update_tracking_rollups',
+        'schedule': 300.0,  # Run every 5 minutes
+    },
+    'maintain-tracking-partitions': {
+        'task': 'tracking.tasks.maintain_tracking_partitions',
+        'schedule': 86400.0,  # Run daily
+    },
+    'reconcile-sales-facts': {
+        'task': 'admin_panel.tasks.reconcile_sales_facts',
+        'schedule': 86400.0,  # Run daily
+    },
+    'rescore-customer-metrics': {
+        'task': 'admin_panel.tasks.rescore_customer_metrics',
+        'schedule': 86400.0,  # Run daily
+    },
+    'cleanup-report-jobs': {
+        'task': 'admin_panel.tasks.cleanup_report_jobs',
+        'schedule': 86400.0,  # Run daily
+    },
 }
 
 app.conf.timezone = 'Africa/Cairo'
@@ -103,7 +103,7 @@ THIRD_PARTY_APPS = [
 
 LOCAL_APPS = [
     'users','products','orders','cart','coupons','notifications','accounting',
-    'shipping','payments','tracking','offers','otp','website_management',
+    'shipping','payments','tracking','offers','otp','website_management','admin_panel',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -116,6 +116,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'utils.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -160,10 +161,45 @@ else:
             'PORT': config('DB_PORT', default='5432'),
             'OPTIONS': {
                 'client_encoding': 'UTF8',
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
             },
+            # Reuse connections across requests and Celery tasks for this many
+            # seconds (0 closes them after each one), checking them before reuse
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
         }
     }
 
+    # DB_POOL_MODE=transaction when connecting through pgbouncer in transaction
+    # pooling mode: a server connection is only ours for one transaction, so
+    # server-side cursors (QuerySet.iterator()) and startup options cannot be
+    # used; iterator() then fetches its whole result at once, which is why the
+    # admin exports page through their rows instead.
+    DB_POOL_MODE = config('DB_POOL_MODE', default='session')
+    if DB_POOL_MODE == 'transaction':
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Read replicas: DB_REPLICA_HOSTS=host1,host2 adds replica_1, replica_2, ... with
+# the primary's name and credentials. Reporting, analytics and catalog reads
+# opt in to them (utils/db_router.py); everything else uses the primary. A
+# second alias on the primary itself (DB_REPLICA_HOSTS=postgres, or any value
+# with SQLite) stands in for a replica locally.
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='')
+DATABASE_REPLICAS = []
+for index, host in enumerate([host.strip() for host in DB_REPLICA_HOSTS.split(',') if host.strip()], start=1):
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if not USE_SQLITE:
+        replica['HOST'] = host
+        replica['DISABLE_SERVER_SIDE_CURSORS'] = config('DB_REPLICA_POOL_MODE', default='session') == 'transaction'
+        if not replica['DISABLE_SERVER_SIDE_CURSORS']:
+            # A replica that is accidentally a primary must still refuse writes
+            replica['OPTIONS'] = {**replica['OPTIONS'], 'options': '-c default_transaction_read_only=on'}
+    DATABASES[f'replica_{index}'] = replica
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['utils.db_router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=15, cast=int)
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -189,6 +225,12 @@ if (BASE_DIR / 'static').exists():
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Files only the API may hand out (report exports); never under MEDIA_ROOT, which nginx serves.
+# Mounted from private_media_volume in the backend and celery containers, so it
+# also holds the tracking partition archives (TRACKING_ARCHIVE_DIR, default
+# PRIVATE_MEDIA_ROOT/archives/tracking), which must outlive the containers.
+PRIVATE_MEDIA_ROOT = config('PRIVATE_MEDIA_ROOT', default=str(BASE_DIR / 'private_media'))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework
@@ -200,8 +242,8 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend','rest_framework.filters.SearchFilter','rest_framework.filters.OrderingFilter'],
     'DEFAULT_THROTTLE_CLASSES': ['rest_framework.throttling.AnonRateThrottle','rest_framework.throttling.UserRateThrottle'],
-    'DEFAULT_THROTTLE_RATES': {'anon':'100/hour','user':'1000/hour','login':'5/minute','register':'3/minute','password-reset':'3/hour'},
-    'EXCEPTION_HANDLER': 'soleva_backend.utils.custom_exception_handler',
+    'DEFAULT_THROTTLE_RATES': {'anon':'100/hour','user':'1000/hour','login':'5/minute','register':'3/minute','password-reset':'3/hour','tracking':'600/minute'},
+    'EXCEPTION_HANDLER': 'utils.exception_handler.custom_exception_handler',
 }
 
 SIMPLE_JWT = {
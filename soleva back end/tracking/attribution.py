@@ -0,0 +1,193 @@
+"""
+Multi-touch attribution of purchase revenue to UTM channels
+
+Every session is one touchpoint carrying its first-touch UTM values. A
+purchase is credited to the touchpoints of the same journey (the user's
+sessions, or just the purchasing session for guests) in the lookback window
+before it, under first-touch, last-touch and linear models. Credit is
+stored per purchase day in AttributionRollup so reports only sum daily rows.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ConversionTracking, AttributionRollup
+from .rollups import day_floor
+
+logger = logging.getLogger(__name__)
+
+# Touchpoints older than this before a purchase get no credit
+TRACKING_ATTRIBUTION_LOOKBACK_DAYS = getattr(settings, 'TRACKING_ATTRIBUTION_LOOKBACK_DAYS', 30)
+
+# Purchase days re-attributed on each refresh; late sessions can still change them
+TRACKING_ATTRIBUTION_REFRESH_DAYS = getattr(settings, 'TRACKING_ATTRIBUTION_REFRESH_DAYS', 2)
+
+ATTRIBUTION_MODELS = ['first_touch', 'last_touch', 'linear']
+
+# Report grouping -> AttributionRollup fields
+ATTRIBUTION_GROUPS = {
+    'source': ['utm_source'],
+    'medium': ['utm_source', 'utm_medium'],
+    'campaign': ['utm_source', 'utm_medium', 'utm_campaign'],
+}
+
+DIRECT_CHANNEL = ('(direct)', '(none)', '')
+
+TOUCH_FIELDS = ['user_id', 'session_id', 'utm_source', 'utm_medium', 'utm_campaign']
+
+# When a session touched the journey; rows are flushed some time after landing
+TOUCHED_AT = Coalesce('landing_at', 'created_at')
+
+CENT = Decimal('0.01')
+FRACTION = Decimal('0.0001')
+
+
+def channel(session: Dict) -> Tuple[str, str, str]:
+    """(source, medium, campaign) of a session"""
+    if not session['utm_source']:
+        return DIRECT_CHANNEL
+    return (session['utm_source'][:255], session['utm_medium'][:255], session['utm_campaign'][:255])
+
+
+def credit(touches: List[Tuple[str, str, str]], revenue: Decimal) -> Dict[str, List[Tuple[tuple, Decimal, Decimal]]]:
+    """(channel, conversions, revenue) credited by each model for one purchase"""
+    # Direct visits only get credit when the journey has no campaign touch
+    campaign_touches = [touch for touch in touches if touch != DIRECT_CHANNEL] or touches[-1:]
+
+    shares = []
+    count = len(campaign_touches)
+    revenue_share = (revenue / count).quantize(CENT, rounding=ROUND_HALF_UP)
+    conversion_share = (Decimal(1) / count).quantize(FRACTION, rounding=ROUND_HALF_UP)
+    for index, touch in enumerate(campaign_touches):
+        if index == count - 1:
+            # The last touch absorbs rounding so totals match the order value
+            shares.append((touch, Decimal(1) - conversion_share * (count - 1), revenue - revenue_share * (count - 1)))
+        else:
+            shares.append((touch, conversion_share, revenue_share))
+
+    return {
+        'first_touch': [(campaign_touches[0], Decimal(1), revenue)],
+        'last_touch': [(campaign_touches[-1], Decimal(1), revenue)],
+        'linear': shares,
+    }
+
+
+class AttributionService:
+    """Maintain and read AttributionRollup rows"""
+
+    @staticmethod
+    def journeys(purchases: List[Dict], lookback_days: int) -> Dict[int, List[Dict]]:
+        """Sessions of the purchasing users, oldest first, keyed by user id"""
+        user_ids = {purchase['user_id'] for purchase in purchases if purchase['user_id']}
+        if not user_ids:
+            return {}
+
+        earliest = min(purchase['purchase_at'] for purchase in purchases) - timedelta(days=lookback_days)
+        latest = max(purchase['purchase_at'] for purchase in purchases)
+        journeys = defaultdict(list)
+        # A session row is never written before its landing, so created_at bounds the scan
+        for session in ConversionTracking.objects.filter(
+            user_id__in=user_ids, created_at__gte=earliest
+        ).annotate(touched_at=TOUCHED_AT).filter(
+            touched_at__gte=earliest, touched_at__lte=latest
+        ).values(*TOUCH_FIELDS, 'touched_at').order_by('touched_at', 'id').iterator(chunk_size=2000):
+            journeys[session['user_id']].append(session)
+        return journeys
+
+    @staticmethod
+    def rebuild_days(start: datetime, end: datetime,
+                     lookback_days: int = TRACKING_ATTRIBUTION_LOOKBACK_DAYS) -> int:
+        """Re-attribute the purchases made in [start, end)"""
+        start, end = day_floor(start), day_floor(end)
+        purchases = list(
+            ConversionTracking.objects.filter(purchase_at__gte=start, purchase_at__lt=end)
+            .values(*TOUCH_FIELDS, 'purchase_at', 'order_value')
+        )
+        journeys = AttributionService.journeys(purchases, lookback_days)
+
+        buckets = defaultdict(lambda: [Decimal('0'), Decimal('0.00')])
+        for purchase in purchases:
+            window_start = purchase['purchase_at'] - timedelta(days=lookback_days)
+            sessions = [
+                session for session in journeys.get(purchase['user_id'], [])
+                if window_start <= session['touched_at'] <= purchase['purchase_at']
+            ]
+            if not any(session['session_id'] == purchase['session_id'] for session in sessions):
+                sessions.append(purchase)
+
+            day = day_floor(purchase['purchase_at'])
+            touches = [channel(session) for session in sessions]
+            for model, shares in credit(touches, purchase['order_value'] or Decimal('0.00')).items():
+                for touch, conversions, revenue in shares:
+                    bucket = buckets[(model, day) + touch]
+                    bucket[0] += conversions
+                    bucket[1] += revenue
+
+        rollups = [
+            AttributionRollup(
+                model=model,
+                period_start=day,
+                utm_source=source,
+                utm_medium=medium,
+                utm_campaign=campaign,
+                conversions=conversions,
+                revenue=revenue,
+            )
+            for (model, day, source, medium, campaign), (conversions, revenue) in buckets.items()
+        ]
+        with transaction.atomic():
+            AttributionRollup.objects.filter(period_start__gte=start, period_start__lt=end).delete()
+            AttributionRollup.objects.bulk_create(rollups, batch_size=1000)
+        return len(rollups)
+
+    @staticmethod
+    def refresh(now: Optional[datetime] = None) -> int:
+        """Re-attribute the purchase days that can still change"""
+        tomorrow = day_floor(now or timezone.now()) + timedelta(days=1)
+        return AttributionService.rebuild_days(
+            tomorrow - timedelta(days=TRACKING_ATTRIBUTION_REFRESH_DAYS + 1), tomorrow
+        )
+
+    @staticmethod
+    def rebuild(days: int) -> int:
+        """Backfill the last ``days`` days, one day at a time"""
+        tomorrow = day_floor(timezone.now()) + timedelta(days=1)
+        written = 0
+        for offset in range(days, 0, -1):
+            day_end = tomorrow - timedelta(days=offset - 1)
+            written += AttributionService.rebuild_days(day_end - timedelta(days=1), day_end)
+        return written
+
+    @staticmethod
+    def report(start: datetime, end: datetime, group_by: str = 'campaign') -> List[Dict]:
+        """Conversions and revenue per channel under every model for purchases in [start, end)"""
+        fields = ATTRIBUTION_GROUPS[group_by]
+        aggregates = {}
+        for model in ATTRIBUTION_MODELS:
+            aggregates[f'{model}_conversions'] = Sum('conversions', filter=Q(model=model))
+            aggregates[f'{model}_revenue'] = Sum('revenue', filter=Q(model=model))
+
+        rows = AttributionRollup.objects.filter(
+            period_start__gte=day_floor(start), period_start__lt=end
+        ).values(*fields).annotate(**aggregates).order_by()
+
+        report = []
+        for row in rows:
+            entry = {field: row[field] for field in fields}
+            for model in ATTRIBUTION_MODELS:
+                entry[model] = {
+                    'conversions': row[f'{model}_conversions'] or Decimal('0'),
+                    'revenue': row[f'{model}_revenue'] or Decimal('0.00'),
+                }
+            report.append(entry)
+        report.sort(key=lambda entry: (-entry['linear']['revenue'], [entry[field] for field in fields]))
+        return report
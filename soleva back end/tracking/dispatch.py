@@ -0,0 +1,415 @@
+"""
+Server-side pixel dispatch - forwards unprocessed tracking events to ad platforms
+"""
+
+import hashlib
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .models import TrackingPixel, TrackingEvent
+
+logger = logging.getLogger(__name__)
+
+TRACKING_DISPATCH_CHUNK_SIZE = getattr(settings, 'TRACKING_DISPATCH_CHUNK_SIZE', 500)
+TRACKING_DISPATCH_TIMEOUT = getattr(settings, 'TRACKING_DISPATCH_TIMEOUT', 10)
+
+# Route every pixel to the local mock provider (benchmarks, staging)
+TRACKING_DISPATCH_MOCK = getattr(settings, 'TRACKING_DISPATCH_MOCK', False)
+
+DISPATCH_UPDATE_FIELDS = ['is_processed', 'processed_at', 'error_message']
+
+# One dispatcher per pixel at a time: overlapping runs would resend the same
+# queued events. The lock is renewed every chunk, so it only has to outlive
+# one chunk; a crashed worker's lock expires after this long.
+TRACKING_DISPATCH_LOCK_TTL = getattr(settings, 'TRACKING_DISPATCH_LOCK_TTL', 300)
+DISPATCH_LOCK_KEY = 'tracking_dispatch_lock:{}'
+
+
+class DispatchError(Exception):
+    """
+    A provider rejected a request; ``retryable`` errors leave events queued
+
+    Adapters that split a batch over several requests list the events that
+    reached the provider before the failure in ``delivered``, so they are not
+    sent again.
+    """
+
+    def __init__(self, message, retryable=False, delivered=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.delivered = delivered or []
+
+
+def sha256(value: str) -> str:
+    return hashlib.sha256(value.strip().lower().encode('utf-8')).hexdigest()
+
+
+class PixelAdapter(ABC):
+    """Base adapter: maps tracking events to one provider's server API"""
+
+    name = None
+    max_batch = 1000
+    event_names = {}
+
+    _sessions = {}
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """Pooled HTTP session per provider, reused across batches"""
+        session = PixelAdapter._sessions.get(cls.name)
+        if session is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['POST'],
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            PixelAdapter._sessions[cls.name] = session
+        return session
+
+    def event_name(self, event: TrackingEvent) -> str:
+        return self.event_names.get(event.event_type) or event.event_name
+
+    def post(self, url: str, **kwargs) -> Dict:
+        """POST with pooled connections, mapping failures to DispatchError"""
+        try:
+            response = self.get_session().post(url, timeout=TRACKING_DISPATCH_TIMEOUT, **kwargs)
+        except requests.RequestException as e:
+            raise DispatchError(f'{self.name} request failed: {str(e)}', retryable=True)
+
+        if response.status_code >= 500 or response.status_code == 429:
+            raise DispatchError(f'{self.name} returned {response.status_code}', retryable=True)
+        if response.status_code >= 400:
+            raise DispatchError(f'{self.name} returned {response.status_code}: {response.text[:500]}')
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+    @abstractmethod
+    def send(self, pixel: TrackingPixel, events: List[TrackingEvent]) -> None:
+        """Deliver up to ``max_batch`` events or raise DispatchError"""
+
+
+class FacebookAdapter(PixelAdapter):
+    """Meta Conversions API"""
+
+    name = 'facebook'
+    max_batch = 1000
+    api_url = 'https://graph.facebook.com/v18.0/{pixel_id}/events'
+    event_names = {
+        'page_view': 'PageView',
+        'view_content': 'ViewContent',
+        'add_to_cart': 'AddToCart',
+        'initiate_checkout': 'InitiateCheckout',
+        'add_payment_info': 'AddPaymentInfo',
+        'purchase': 'Purchase',
+        'search': 'Search',
+        'lead': 'Lead',
+        'complete_registration': 'CompleteRegistration',
+    }
+
+    def payload(self, event: TrackingEvent) -> Dict:
+        user_data = {
+            'client_ip_address': event.ip_address,
+            'client_user_agent': event.user_agent,
+        }
+        if event.user_id and event.user.email:
+            user_data['em'] = [sha256(event.user.email)]
+
+        custom_data = {'currency': event.currency}
+        if event.value is not None:
+            custom_data['value'] = float(event.value)
+        if event.product_id:
+            custom_data['content_ids'] = [event.product_id]
+            custom_data['content_type'] = 'product'
+        if event.product_name:
+            custom_data['content_name'] = event.product_name
+        if event.order_id:
+            custom_data['order_id'] = event.order_id
+
+        return {
+            'event_name': self.event_name(event),
+            'event_time': int(event.created_at.timestamp()),
+            'event_id': str(event.id),
+            'action_source': 'website',
+            'event_source_url': event.page_url or None,
+            'user_data': user_data,
+            'custom_data': custom_data,
+        }
+
+    def send(self, pixel, events):
+        self.post(
+            self.api_url.format(pixel_id=pixel.pixel_id),
+            params={'access_token': pixel.access_token},
+            json={'data': [self.payload(event) for event in events]},
+        )
+
+
+class TikTokAdapter(PixelAdapter):
+    """TikTok Events API"""
+
+    name = 'tiktok'
+    max_batch = 1000
+    api_url = 'https://business-api.tiktok.com/open_api/v1.3/event/track/'
+    event_names = {
+        'page_view': 'Pageview',
+        'view_content': 'ViewContent',
+        'add_to_cart': 'AddToCart',
+        'initiate_checkout': 'InitiateCheckout',
+        'add_payment_info': 'AddPaymentInfo',
+        'purchase': 'CompletePayment',
+        'search': 'Search',
+        'lead': 'SubmitForm',
+        'complete_registration': 'CompleteRegistration',
+    }
+
+    def payload(self, event: TrackingEvent) -> Dict:
+        user = {'ip': event.ip_address, 'user_agent': event.user_agent}
+        if event.user_id and event.user.email:
+            user['email'] = sha256(event.user.email)
+
+        properties = {'currency': event.currency}
+        if event.value is not None:
+            properties['value'] = float(event.value)
+        if event.product_id:
+            properties['contents'] = [{
+                'content_id': event.product_id,
+                'content_name': event.product_name,
+                'price': float(event.product_price) if event.product_price is not None else None,
+                'quantity': event.quantity,
+            }]
+        if event.order_id:
+            properties['order_id'] = event.order_id
+
+        return {
+            'event': self.event_name(event),
+            'event_time': int(event.created_at.timestamp()),
+            'event_id': str(event.id),
+            'user': user,
+            'page': {'url': event.page_url, 'referrer': event.referrer},
+            'properties': properties,
+        }
+
+    def send(self, pixel, events):
+        response = self.post(
+            self.api_url,
+            headers={'Access-Token': pixel.access_token},
+            json={
+                'event_source': 'web',
+                'event_source_id': pixel.pixel_id,
+                'data': [self.payload(event) for event in events],
+            },
+        )
+        if response.get('code') not in (None, 0):
+            raise DispatchError(f"tiktok error {response.get('code')}: {response.get('message', '')}")
+
+
+class GoogleAnalyticsAdapter(PixelAdapter):
+    """GA4 Measurement Protocol (``access_token`` holds the API secret)"""
+
+    name = 'google_analytics'
+    max_batch = 25
+    api_url = 'https://www.google-analytics.com/mp/collect'
+    event_names = {
+        'page_view': 'page_view',
+        'view_content': 'view_item',
+        'add_to_cart': 'add_to_cart',
+        'initiate_checkout': 'begin_checkout',
+        'add_payment_info': 'add_payment_info',
+        'purchase': 'purchase',
+        'search': 'search',
+        'lead': 'generate_lead',
+        'complete_registration': 'sign_up',
+    }
+
+    def payload(self, event: TrackingEvent) -> Dict:
+        params = {
+            'currency': event.currency,
+            'page_location': event.page_url,
+            'engagement_time_msec': 1,
+        }
+        if event.value is not None:
+            params['value'] = float(event.value)
+        if event.order_id:
+            params['transaction_id'] = event.order_id
+        if event.product_id:
+            params['items'] = [{
+                'item_id': event.product_id,
+                'item_name': event.product_name,
+                'item_category': event.product_category,
+                'price': float(event.product_price) if event.product_price is not None else None,
+                'quantity': event.quantity or 1,
+            }]
+        return {'name': self.event_name(event), 'params': params}
+
+    def send(self, pixel, events):
+        # Every request carries a single client, so group by session
+        clients = {}
+        for event in events:
+            clients.setdefault(event.session_id or str(event.user_id or event.id), []).append(event)
+
+        # The Measurement Protocol has no idempotency key: report which clients
+        # went through so a retry resends only the others
+        delivered = []
+        rejected = []
+        for client_id, client_events in clients.items():
+            try:
+                self.post(
+                    self.api_url,
+                    params={'measurement_id': pixel.pixel_id, 'api_secret': pixel.access_token},
+                    json={
+                        'client_id': client_id,
+                        'timestamp_micros': int(client_events[0].created_at.timestamp() * 1_000_000),
+                        'events': [self.payload(event) for event in client_events],
+                    },
+                )
+            except DispatchError as e:
+                if e.retryable:
+                    raise DispatchError(str(e), retryable=True, delivered=delivered)
+                rejected.append(str(e))
+                continue
+            delivered.extend(client_events)
+        if rejected:
+            raise DispatchError('; '.join(rejected), delivered=delivered)
+
+
+class MockAdapter(PixelAdapter):
+    """Local provider that accepts everything; ``latency`` simulates a round trip"""
+
+    name = 'mock'
+    max_batch = 1000
+    latency = 0.0
+    sent = 0
+
+    def send(self, pixel, events):
+        if self.latency:
+            time.sleep(self.latency)
+        MockAdapter.sent += len(events)
+
+
+ADAPTERS = {
+    adapter.name: adapter
+    for adapter in (FacebookAdapter, TikTokAdapter, GoogleAnalyticsAdapter, MockAdapter)
+}
+
+
+def get_adapter(pixel: TrackingPixel) -> Optional[PixelAdapter]:
+    """Adapter for a pixel, or None when its provider has no server API here"""
+    if TRACKING_DISPATCH_MOCK:
+        return MockAdapter()
+    adapter = ADAPTERS.get(pixel.pixel_type)
+    return adapter() if adapter else None
+
+
+class PixelDispatcher:
+    """Drain unprocessed events per server-side pixel in keyset-paginated chunks"""
+
+    @staticmethod
+    def dispatch_pixel(pixel: TrackingPixel, adapter: Optional[PixelAdapter] = None,
+                       chunk_size: int = TRACKING_DISPATCH_CHUNK_SIZE,
+                       limit: Optional[int] = None) -> Dict[str, int]:
+        """Forward one pixel's queued events; returns sent/failed counts"""
+        adapter = adapter or get_adapter(pixel)
+        stats = {'sent': 0, 'failed': 0}
+        if adapter is None:
+            return stats
+
+        lock_key = DISPATCH_LOCK_KEY.format(pixel.pk)
+        token = uuid.uuid4().hex
+        if not cache.add(lock_key, token, TRACKING_DISPATCH_LOCK_TTL):
+            logger.info(f"Dispatch to {pixel.name} skipped: another run is in progress")
+            return stats
+        try:
+            return PixelDispatcher.dispatch_locked(pixel, adapter, chunk_size, limit, stats, lock_key)
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    @staticmethod
+    def dispatch_locked(pixel: TrackingPixel, adapter: PixelAdapter, chunk_size: int,
+                        limit: Optional[int], stats: Dict[str, int], lock_key: str) -> Dict[str, int]:
+        """Send queued events chunk by chunk while holding the pixel's lock"""
+        last_id = 0
+        while limit is None or stats['sent'] + stats['failed'] < limit:
+            size = chunk_size if limit is None else min(chunk_size, limit - stats['sent'] - stats['failed'])
+            chunk = list(
+                TrackingEvent.objects.filter(pixel=pixel, is_processed=False, id__gt=last_id)
+                .select_related('user').order_by('id')[:size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            cache.touch(lock_key, TRACKING_DISPATCH_LOCK_TTL)
+
+            processed = []
+            for start in range(0, len(chunk), adapter.max_batch):
+                batch = chunk[start:start + adapter.max_batch]
+                try:
+                    adapter.send(pixel, batch)
+                    delivered, error = batch, ''
+                except DispatchError as e:
+                    delivered, error = e.delivered, str(e)
+                    if e.retryable:
+                        # Provider is unavailable; keep the undelivered rest queued for the next run
+                        logger.warning(f"Dispatch to {pixel.name} paused: {error}")
+                        processed.extend(PixelDispatcher.stamp(delivered, ''))
+                        stats['sent'] += len(delivered)
+                        PixelDispatcher.mark(processed)
+                        return stats
+
+                delivered_ids = {event.id for event in delivered}
+                rejected = [event for event in batch if event.id not in delivered_ids]
+                if rejected:
+                    logger.error(f"Dispatch to {pixel.name} rejected {len(rejected)} events: {error}")
+                processed.extend(PixelDispatcher.stamp(delivered, ''))
+                processed.extend(PixelDispatcher.stamp(rejected, error))
+                stats['sent'] += len(delivered)
+                stats['failed'] += len(rejected)
+
+            PixelDispatcher.mark(processed)
+        return stats
+
+    @staticmethod
+    def stamp(events: List[TrackingEvent], error: str) -> List[TrackingEvent]:
+        """Flag events as processed, with the provider's error when it rejected them"""
+        now = timezone.now()
+        for event in events:
+            event.is_processed = True
+            event.processed_at = now
+            event.error_message = error
+        return events
+
+    @staticmethod
+    def mark(events: List[TrackingEvent]) -> None:
+        if events:
+            TrackingEvent.objects.bulk_update(events, DISPATCH_UPDATE_FIELDS, batch_size=TRACKING_DISPATCH_CHUNK_SIZE)
+
+    @staticmethod
+    def dispatch_all(adapter: Optional[PixelAdapter] = None, chunk_size: int = TRACKING_DISPATCH_CHUNK_SIZE,
+                     limit: Optional[int] = None) -> Dict[str, int]:
+        """Forward queued events for every active server-side pixel"""
+        totals = {'sent': 0, 'failed': 0}
+        pixels = TrackingPixel.objects.filter(is_active=True, server_side_tracking=True)
+        if adapter is None and not TRACKING_DISPATCH_MOCK:
+            pixels = pixels.exclude(access_token='')
+        for pixel in pixels:
+            stats = PixelDispatcher.dispatch_pixel(pixel, adapter=adapter, chunk_size=chunk_size, limit=limit)
+            totals['sent'] += stats['sent']
+            totals['failed'] += stats['failed']
+        return totals
@@ -0,0 +1,125 @@
+"""
+Ingestion-time filtering of tracking events
+
+Crawler traffic, double-fired events and request floods are dropped on the
+request path so they never reach the buffer or the database.
+"""
+
+import hashlib
+import logging
+import re
+import time
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import SimpleRateThrottle
+
+from utils.cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Case-insensitive fragments of crawler, monitoring and HTTP library user agents.
+# Bare "bot" inside a word is not enough: device names such as CUBOT_X19 contain it.
+BOT_USER_AGENT_PATTERNS = [
+    r'\bbot\b', r'bot/\d', r'\+https?://',
+    r'(google|bing|yandex|baidu|duckduck|apple|ahrefs|semrush|mj12|dot|petal|amazon|seznam|'
+    r'twitter|linkedin|discord|telegram|slack|pinterest)bot',
+    r'bytespider', r'crawl', r'spider', r'slurp', r'scrap', r'fetch',
+    r'facebookexternalhit', r'facebot', r'embedly', r'preview', r'whatsapp',
+    r'lighthouse', r'pagespeed', r'gtmetrix', r'pingdom', r'uptime', r'monitor',
+    r'headless', r'phantomjs', r'selenium', r'puppeteer', r'playwright',
+    r'curl', r'wget', r'python-requests', r'python-urllib', r'aiohttp', r'httpx',
+    r'go-http-client', r'java/', r'okhttp', r'axios', r'node-fetch', r'postman', r'insomnia',
+]
+BOT_USER_AGENT_PATTERN = re.compile(
+    '|'.join(BOT_USER_AGENT_PATTERNS + getattr(settings, 'TRACKING_BOT_USER_AGENT_PATTERNS', [])),
+    re.IGNORECASE
+)
+
+# Identical events from one session inside this window are treated as double fires
+TRACKING_DEDUP_WINDOW = getattr(settings, 'TRACKING_DEDUP_WINDOW', 10)
+
+# A purchase is recorded once per order
+TRACKING_PURCHASE_DEDUP_WINDOW = 86400
+
+DEDUP_KEY = 'tracking:dedup:{}'
+
+# Fields that identify an event for deduplication (client timestamps differ between double fires)
+FINGERPRINT_FIELDS = ['event_type', 'event_name', 'page_url', 'product_id', 'value', 'quantity', 'order_id']
+
+
+class TrackingRateThrottle(SimpleRateThrottle):
+    """Per-IP fixed-window request limit for the ingestion endpoints (``tracking`` rate)"""
+
+    scope = 'tracking'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        # One atomic counter per window instead of DRF's per-request history list
+        window = int(time.time() // self.duration)
+        key = f'{self.get_cache_key(request, view)}:{window}'
+        self.window_ends = (window + 1) * self.duration
+        try:
+            cache.add(key, 0, self.duration)
+            count = cache.incr(key)
+        except ValueError:
+            # The counter expired between add and incr
+            cache.set(key, 1, self.duration)
+            count = 1
+        return count <= self.num_requests
+
+    def wait(self):
+        return max(self.window_ends - time.time(), 0)
+
+
+class TrackingEventFilter:
+    """Drop bot and duplicate events before they are buffered"""
+
+    @staticmethod
+    def is_bot(user_agent: str) -> bool:
+        """Whether a user agent is missing or belongs to a crawler or script"""
+        return not user_agent or BOT_USER_AGENT_PATTERN.search(user_agent) is not None
+
+    @staticmethod
+    def fingerprint(envelope: Dict) -> tuple:
+        """(key, ttl) identifying an event within its dedup window"""
+        data = envelope['data']
+        if data['event_type'] == 'purchase' and data.get('order_id'):
+            parts = ['purchase', data['order_id']]
+            ttl = TRACKING_PURCHASE_DEDUP_WINDOW
+        else:
+            parts = [envelope['session_id']] + [str(data.get(field) or '') for field in FINGERPRINT_FIELDS]
+            ttl = TRACKING_DEDUP_WINDOW
+        digest = hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+        return DEDUP_KEY.format(digest), ttl
+
+    @staticmethod
+    def deduplicate(envelopes: List[Dict]) -> List[Dict]:
+        """Events not already seen inside their dedup window"""
+        if not envelopes:
+            return envelopes
+        fingerprints = [TrackingEventFilter.fingerprint(envelope) for envelope in envelopes]
+
+        client = get_redis_client()
+        if client is None:
+            first_seen = [cache.add(key, 1, ttl) for key, ttl in fingerprints]
+        else:
+            pipeline = client.pipeline(transaction=False)
+            for key, ttl in fingerprints:
+                pipeline.set(key, 1, nx=True, ex=ttl)
+            try:
+                first_seen = pipeline.execute()
+            except Exception as e:
+                logger.warning(f"Tracking dedup unavailable, accepting events: {str(e)}")
+                return envelopes
+
+        unique = [envelope for envelope, fresh in zip(envelopes, first_seen) if fresh]
+        if len(unique) < len(envelopes):
+            logger.debug(f"Dropped {len(envelopes) - len(unique)} duplicate tracking events")
+        return unique
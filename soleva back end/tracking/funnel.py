@@ -0,0 +1,386 @@
+"""
+Sessionized conversion funnel
+
+Funnel progress is accumulated per session in Redis while the session is
+active and written to ConversionTracking once, when the session purchases or
+goes idle. A flush claims each session first, so an idle flush and a
+purchase flush racing on one session cannot both insert its row. Without
+Redis each ingestion batch is folded and written directly.
+"""
+
+import json
+import logging
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from utils.cache import get_redis_client
+from .models import ConversionTracking
+
+logger = logging.getLogger(__name__)
+
+UTM_FIELDS = ['utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content']
+
+# Event type -> funnel timestamp field on ConversionTracking
+FUNNEL_STEP_FIELDS = {
+    'page_view': 'landing_at',
+    'view_content': 'product_view_at',
+    'add_to_cart': 'add_to_cart_at',
+    'initiate_checkout': 'checkout_start_at',
+    'add_payment_info': 'payment_info_at',
+    'purchase': 'purchase_at',
+}
+
+# Attributes kept from the first event that carries them
+FIRST_TOUCH_FIELDS = ['user_id', 'referrer'] + UTM_FIELDS
+
+# Attributes overwritten by the latest event that carries them
+LAST_TOUCH_FIELDS = ['cart_value', 'order_value', 'order_id']
+
+# A session with no events for this long is flushed
+TRACKING_SESSION_TIMEOUT = getattr(settings, 'TRACKING_SESSION_TIMEOUT', 1800)
+
+# Safety expiry for session state that is never flushed
+FUNNEL_STATE_TTL = 7 * 86400
+
+FUNNEL_FLUSH_BATCH_SIZE = 500
+
+# Longest a flush may hold its sessions before another flush can take them over
+FUNNEL_FLUSH_CLAIM_TTL = 60
+
+SESSION_KEY = 'tracking:funnel:session:{}'
+PRODUCTS_KEY = 'tracking:funnel:products:{}'
+ACTIVE_KEY = 'tracking:funnel:active'
+CLAIM_KEY = 'tracking:funnel:flushing:{}'
+
+# Applies one event atomically: step times keep their minimum, products their
+# first view time and the activity index its latest event, so the result does
+# not depend on the order concurrent consumers apply events in.
+RECORD_SCRIPT = """
+local session_key, products_key, active_key = KEYS[1], KEYS[2], KEYS[3]
+local session_id, moment, ttl = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+local update = cjson.decode(ARGV[4])
+
+for field, value in pairs(update['steps']) do
+    local current = redis.call('HGET', session_key, field)
+    if not current or tonumber(value) < tonumber(current) then
+        redis.call('HSET', session_key, field, value)
+    end
+end
+for field, value in pairs(update['first']) do
+    redis.call('HSETNX', session_key, field, value)
+end
+for field, value in pairs(update['last']) do
+    redis.call('HSET', session_key, field, value)
+end
+if update['product'] ~= '' then
+    local seen = redis.call('ZSCORE', products_key, update['product'])
+    if not seen or moment < tonumber(seen) then
+        redis.call('ZADD', products_key, moment, update['product'])
+    end
+    redis.call('EXPIRE', products_key, ttl)
+end
+
+local last = redis.call('ZSCORE', active_key, session_id)
+if not last or moment > tonumber(last) then
+    redis.call('ZADD', active_key, moment, session_id)
+end
+redis.call('EXPIRE', session_key, ttl)
+return 1
+"""
+
+# Drops flushed state unless another event arrived after it was read
+RELEASE_SCRIPT = """
+local last = redis.call('ZSCORE', KEYS[3], ARGV[1])
+if last and tonumber(last) == tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# Drops a flush claim only if it is still ours
+UNCLAIM_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def to_millis(moment: datetime) -> int:
+    return int(moment.timestamp() * 1000)
+
+
+def from_millis(value) -> datetime:
+    return datetime.fromtimestamp(int(value) / 1000, tz=dt_timezone.utc)
+
+
+def event_update(envelope: Dict) -> Dict:
+    """Funnel changes carried by one ingested event"""
+    data = envelope['data']
+    event_type = data['event_type']
+    moment = to_millis(envelope['occurred_at'])
+
+    update = {'steps': {}, 'first': {}, 'last': {}, 'product': ''}
+    step_field = FUNNEL_STEP_FIELDS.get(event_type)
+    if step_field:
+        update['steps'][step_field] = moment
+
+    if envelope.get('user_id'):
+        update['first']['user_id'] = str(envelope['user_id'])
+    if data.get('referrer'):
+        update['first']['referrer'] = data['referrer']
+    for field in UTM_FIELDS:
+        if envelope['utm'].get(field):
+            update['first'][field] = envelope['utm'][field]
+
+    if event_type == 'view_content' and data.get('product_name'):
+        update['product'] = data['product_name']
+    elif event_type == 'add_to_cart' and data.get('value'):
+        update['last']['cart_value'] = str(data['value'])
+    elif event_type == 'purchase':
+        if data.get('value'):
+            update['last']['order_value'] = str(data['value'])
+        if data.get('order_id'):
+            update['last']['order_id'] = data['order_id']
+    return update
+
+
+class FunnelSessionStore:
+    """Accumulate funnel state per session and flush it to ConversionTracking"""
+
+    _record_script = None
+    _release_script = None
+    _unclaim_script = None
+
+    @staticmethod
+    def record(envelopes: List[Dict]) -> None:
+        """Apply a batch of ingested events to their sessions' funnel state"""
+        if not envelopes:
+            return
+
+        client = get_redis_client()
+        if client is None:
+            FunnelSessionStore.write(FunnelSessionStore.fold(envelopes))
+            return
+
+        if FunnelSessionStore._record_script is None:
+            FunnelSessionStore._record_script = client.register_script(RECORD_SCRIPT)
+
+        purchased = []
+        pipeline = client.pipeline(transaction=False)
+        for envelope in envelopes:
+            session_id = envelope['session_id']
+            FunnelSessionStore._record_script(
+                keys=[SESSION_KEY.format(session_id), PRODUCTS_KEY.format(session_id), ACTIVE_KEY],
+                args=[session_id, to_millis(envelope['occurred_at']), FUNNEL_STATE_TTL,
+                      json.dumps(event_update(envelope))],
+                client=pipeline,
+            )
+            if envelope['data']['event_type'] == 'purchase':
+                purchased.append(session_id)
+        try:
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Funnel session store unavailable, writing batch directly: {str(e)}")
+            FunnelSessionStore.write(FunnelSessionStore.fold(envelopes))
+            return
+
+        # A purchase completes the funnel, so it is written right away; only once
+        # the batch commits, as flushing releases the Redis state a rollback would need
+        if purchased:
+            transaction.on_commit(lambda: FunnelSessionStore.flush(purchased), robust=True)
+
+    @staticmethod
+    def fold(envelopes: Iterable[Dict]) -> Dict[str, Dict]:
+        """Combine events into per-session state in Python (no Redis)"""
+        states = {}
+        seen_products = {}
+        for envelope in sorted(envelopes, key=lambda envelope: envelope['occurred_at']):
+            session_id = envelope['session_id']
+            state = states.setdefault(session_id, {
+                'steps': {}, 'first': {}, 'last': {}, 'products': [],
+            })
+            update = event_update(envelope)
+            for field, moment in update['steps'].items():
+                state['steps'].setdefault(field, moment)
+            for field, value in update['first'].items():
+                state['first'].setdefault(field, value)
+            state['last'].update(update['last'])
+
+            products = seen_products.setdefault(session_id, set())
+            if update['product'] and update['product'] not in products:
+                products.add(update['product'])
+                state['products'].append(update['product'])
+        return states
+
+    @staticmethod
+    def flush(session_ids: Iterable[str]) -> int:
+        """Write the Redis state of ``session_ids`` and release it; returns sessions written"""
+        session_ids = list(dict.fromkeys(session_ids))
+        client = get_redis_client()
+        if client is None or not session_ids:
+            return 0
+
+        # Sessions another flush is already writing are left to it
+        token = uuid.uuid4().hex
+        pipeline = client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipeline.set(CLAIM_KEY.format(session_id), token, nx=True, ex=FUNNEL_FLUSH_CLAIM_TTL)
+        claimed = [session_id for session_id, won in zip(session_ids, pipeline.execute()) if won]
+        if len(claimed) < len(session_ids):
+            logger.debug(f"Skipped {len(session_ids) - len(claimed)} funnel sessions being flushed elsewhere")
+        if not claimed:
+            return 0
+
+        try:
+            return FunnelSessionStore.flush_claimed(client, claimed)
+        finally:
+            if FunnelSessionStore._unclaim_script is None:
+                FunnelSessionStore._unclaim_script = client.register_script(UNCLAIM_SCRIPT)
+            pipeline = client.pipeline(transaction=False)
+            for session_id in claimed:
+                FunnelSessionStore._unclaim_script(
+                    keys=[CLAIM_KEY.format(session_id)], args=[token], client=pipeline
+                )
+            pipeline.execute()
+
+    @staticmethod
+    def flush_claimed(client, session_ids: List[str]) -> int:
+        """Write and release sessions this flush has claimed"""
+        pipeline = client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipeline.hgetall(SESSION_KEY.format(session_id))
+            pipeline.zrange(PRODUCTS_KEY.format(session_id), 0, -1)
+            pipeline.zscore(ACTIVE_KEY, session_id)
+        results = pipeline.execute()
+
+        states = {}
+        seen = {}
+        for index, session_id in enumerate(session_ids):
+            fields, products, last_seen = results[index * 3:index * 3 + 3]
+            if last_seen is None:
+                continue
+            fields = {key.decode(): value.decode() for key, value in fields.items()}
+            states[session_id] = {
+                'steps': {field: int(fields[field]) for field in FUNNEL_STEP_FIELDS.values() if field in fields},
+                'first': {field: fields[field] for field in FIRST_TOUCH_FIELDS if field in fields},
+                'last': {field: fields[field] for field in LAST_TOUCH_FIELDS if field in fields},
+                'products': [product.decode() for product in products],
+            }
+            seen[session_id] = last_seen
+
+        FunnelSessionStore.write(states)
+
+        if FunnelSessionStore._release_script is None:
+            FunnelSessionStore._release_script = client.register_script(RELEASE_SCRIPT)
+        pipeline = client.pipeline(transaction=False)
+        for session_id, last_seen in seen.items():
+            FunnelSessionStore._release_script(
+                keys=[SESSION_KEY.format(session_id), PRODUCTS_KEY.format(session_id), ACTIVE_KEY],
+                args=[session_id, int(last_seen)],
+                client=pipeline,
+            )
+        pipeline.execute()
+        return len(states)
+
+    @staticmethod
+    def flush_idle(timeout: int = TRACKING_SESSION_TIMEOUT, now: Optional[datetime] = None) -> int:
+        """Flush every session without events for ``timeout`` seconds"""
+        client = get_redis_client()
+        if client is None:
+            return 0
+
+        cutoff = to_millis(now or timezone.now()) - timeout * 1000
+        flushed = 0
+        while True:
+            session_ids = [
+                session_id.decode()
+                for session_id in client.zrangebyscore(ACTIVE_KEY, '-inf', cutoff, start=0, num=FUNNEL_FLUSH_BATCH_SIZE)
+            ]
+            if not session_ids:
+                return flushed
+            written = FunnelSessionStore.flush(session_ids)
+            flushed += written
+            # Nothing written means the batch is claimed by other flushes; the next run retries it
+            if len(session_ids) < FUNNEL_FLUSH_BATCH_SIZE or not written:
+                return flushed
+
+    @staticmethod
+    def merge(conversion: ConversionTracking, state: Dict) -> List[str]:
+        """Merge session state into a ConversionTracking row; returns changed fields"""
+        changed = []
+        for field, moment in state['steps'].items():
+            moment = from_millis(moment)
+            current = getattr(conversion, field)
+            if current is None or moment < current:
+                setattr(conversion, field, moment)
+                changed.append(field)
+
+        for field, value in state['first'].items():
+            if field == 'user_id':
+                if conversion.user_id is None:
+                    conversion.user_id = int(value)
+                    changed.append('user')
+            elif not getattr(conversion, field):
+                setattr(conversion, field, value)
+                changed.append(field)
+
+        for field, value in state['last'].items():
+            if field != 'order_id':
+                value = Decimal(value)
+            if getattr(conversion, field) != value:
+                setattr(conversion, field, value)
+                changed.append(field)
+
+        if state['products']:
+            products_viewed = list(conversion.products_viewed or [])
+            known = set(products_viewed)
+            new_products = [product for product in state['products'] if product not in known]
+            if new_products:
+                conversion.products_viewed = products_viewed + new_products
+                changed.append('products_viewed')
+            if not conversion.first_product_viewed:
+                conversion.first_product_viewed = (products_viewed or new_products)[0][:255]
+                changed.append('first_product_viewed')
+        return changed
+
+    @staticmethod
+    def write(states: Dict[str, Dict]) -> None:
+        """Create or update one ConversionTracking row per session"""
+        if not states:
+            return
+
+        conversions = {}
+        for conversion in ConversionTracking.objects.filter(session_id__in=list(states)).order_by('-id'):
+            conversions[conversion.session_id] = conversion
+
+        new_conversions = []
+        updated = []
+        updated_fields = set()
+        for session_id, state in states.items():
+            conversion = conversions.get(session_id)
+            if conversion is None:
+                conversion = ConversionTracking(session_id=session_id)
+                FunnelSessionStore.merge(conversion, state)
+                new_conversions.append(conversion)
+                continue
+
+            fields = FunnelSessionStore.merge(conversion, state)
+            if fields:
+                updated.append(conversion)
+                updated_fields.update(fields)
+
+        ConversionTracking.objects.bulk_create(new_conversions)
+        if updated:
+            now = timezone.now()
+            for conversion in updated:
+                conversion.updated_at = now
+            ConversionTracking.objects.bulk_update(updated, sorted(updated_fields | {'updated_at'}))
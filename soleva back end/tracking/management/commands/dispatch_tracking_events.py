@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from tracking.dispatch import PixelDispatcher, MockAdapter, TRACKING_DISPATCH_CHUNK_SIZE
+from tracking.models import TrackingPixel
+
+
+class Command(BaseCommand):
+    help = 'Forward unprocessed tracking events to server-side pixel APIs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pixel', type=int, help='Only dispatch events of this pixel ID')
+        parser.add_argument('--limit', type=int, help='Maximum events per pixel')
+        parser.add_argument('--chunk-size', type=int, default=TRACKING_DISPATCH_CHUNK_SIZE)
+        parser.add_argument('--mock', action='store_true', help='Send to the local mock provider')
+        parser.add_argument('--mock-latency', type=float, default=0,
+                            help='Simulated provider round trip in milliseconds (with --mock)')
+
+    def handle(self, *args, **options):
+        adapter = None
+        if options['mock']:
+            adapter = MockAdapter()
+            adapter.latency = options['mock_latency'] / 1000
+
+        started = time.monotonic()
+        if options['pixel']:
+            try:
+                pixel = TrackingPixel.objects.get(id=options['pixel'])
+            except TrackingPixel.DoesNotExist:
+                raise CommandError(f'Tracking pixel {options["pixel"]} does not exist.')
+            stats = PixelDispatcher.dispatch_pixel(
+                pixel, adapter=adapter, chunk_size=options['chunk_size'], limit=options['limit']
+            )
+        else:
+            stats = PixelDispatcher.dispatch_all(
+                adapter=adapter, chunk_size=options['chunk_size'], limit=options['limit']
+            )
+
+        elapsed = time.monotonic() - started
+        total = stats['sent'] + stats['failed']
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Dispatched {stats["sent"]} events ({stats["failed"]} rejected) '
+            f'in {elapsed:.2f}s - {rate:.0f} events/s'
+        ))
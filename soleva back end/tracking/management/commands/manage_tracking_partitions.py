@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from tracking.partitions import (
+    TrackingPartitionService, TRACKING_PARTITIONS_AHEAD, TRACKING_RETENTION_MONTHS, TRACKING_ARCHIVE_DIR
+)
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly tracking event partitions and archive/drop expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=TRACKING_PARTITIONS_AHEAD,
+                            help='Months of partitions to create ahead of the current one')
+        parser.add_argument('--retain-months', type=int, default=TRACKING_RETENTION_MONTHS,
+                            help='Months of events to keep')
+        parser.add_argument('--archive-dir', default=TRACKING_ARCHIVE_DIR,
+                            help='Directory for gzipped CSV archives of dropped partitions')
+        parser.add_argument('--no-archive', action='store_true', help='Drop expired partitions without archiving')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be dropped')
+
+    def handle(self, *args, **options):
+        if not TrackingPartitionService.is_partitioned():
+            # SQLite / unmigrated databases keep a plain table
+            count = TrackingPartitionService.purge_expired_events(
+                options['retain_months'], dry_run=options['dry_run']
+            )
+            verb = 'Would delete' if options['dry_run'] else 'Deleted'
+            self.stdout.write(self.style.SUCCESS(
+                f'{verb} {count} tracking events older than {options["retain_months"]} months '
+                f'(table is not partitioned)'
+            ))
+            return
+
+        if not options['dry_run']:
+            for name in TrackingPartitionService.ensure_partitions(options['ahead']):
+                self.stdout.write(f'Created partition {name}')
+
+        expired = TrackingPartitionService.apply_retention(
+            options['retain_months'],
+            archive=not options['no_archive'],
+            directory=options['archive_dir'],
+            dry_run=options['dry_run'],
+        )
+        for name in expired:
+            self.stdout.write(f'{"Would drop" if options["dry_run"] else "Dropped"} partition {name}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Tracking partitions up to date ({len(expired)} expired)'
+        ))
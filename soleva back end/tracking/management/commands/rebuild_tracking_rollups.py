@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from tracking.attribution import AttributionService
+from tracking.rollups import TrackingRollupService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly/daily tracking and attribution rollups from raw events and sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Number of past days to rebuild')
+
+    def handle(self, *args, **options):
+        written = TrackingRollupService.rebuild(options['days'])
+        written += AttributionService.rebuild(options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} rollup rows for the last {options["days"]} days'
+        ))
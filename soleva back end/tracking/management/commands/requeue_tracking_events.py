@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from tracking.services import TRACKING_DEAD_LETTER_KEY, TrackingEventBuffer
+
+
+class Command(BaseCommand):
+    help = 'Move dead-lettered tracking events back to the ingestion buffer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many events are dead-lettered')
+
+    def handle(self, *args, **options):
+        waiting = TrackingEventBuffer.dead_letter_size()
+        if options['dry_run'] or not waiting:
+            self.stdout.write(f'{waiting} events in {TRACKING_DEAD_LETTER_KEY}')
+            return
+
+        requeued = TrackingEventBuffer.requeue_dead_letters()
+        self.stdout.write(self.style.SUCCESS(f'Requeued {requeued} tracking events'))
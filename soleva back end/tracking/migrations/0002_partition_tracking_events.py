@@ -0,0 +1,100 @@
+"""
+Convert tracking_events into a table range-partitioned by month on created_at.
+
+PostgreSQL only; on other databases this migration is a no-op and retention
+falls back to chunked deletes (see tracking/partitions.py).
+"""
+
+from datetime import date, datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = 'tracking_events'
+LEGACY_TABLE = 'tracking_events_unpartitioned'
+MONTHS_AHEAD = 3
+
+
+def add_months(month, months):
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + year, month_index + 1, 1)
+
+
+def month_bound(month):
+    return timezone.make_aware(datetime(month.year, month.month, 1))
+
+
+def partition_tracking_events(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    quote_name = connection.ops.quote_name
+    table, legacy = quote_name(TABLE), quote_name(LEGACY_TABLE)
+
+    with connection.cursor() as cursor:
+        # Secondary indexes and foreign keys are recreated on the partitioned table
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND indexname NOT IN ("
+            "  SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'"
+            ")",
+            [TABLE, TABLE]
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT MIN(created_at) FROM {table}')
+        oldest = cursor.fetchone()[0]
+
+    schema_editor.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+    for name, _ in foreign_keys:
+        schema_editor.execute(f'ALTER TABLE {legacy} DROP CONSTRAINT {quote_name(name)}')
+    for name, _ in indexes:
+        schema_editor.execute(f'DROP INDEX {quote_name(name)}')
+
+    # Partition keys must be part of the primary key
+    schema_editor.execute(f'CREATE TABLE {table} (LIKE {legacy}) PARTITION BY RANGE (created_at)')
+    schema_editor.execute(f'ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+    schema_editor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)')
+    schema_editor.execute(
+        f'CREATE TABLE {quote_name(TABLE + "_default")} PARTITION OF {table} DEFAULT'
+    )
+
+    current = timezone.localdate().replace(day=1)
+    month = timezone.localtime(oldest).date().replace(day=1) if oldest else current
+    last = add_months(current, MONTHS_AHEAD)
+    while month <= last:
+        schema_editor.execute(
+            f'CREATE TABLE {quote_name(f"{TABLE}_{month:%Y_%m}")} PARTITION OF {table} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [month_bound(month), month_bound(add_months(month, 1))]
+        )
+        month = add_months(month, 1)
+
+    schema_editor.execute(f'INSERT INTO {table} SELECT * FROM {legacy}')
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+    )
+    schema_editor.execute(f'DROP TABLE {legacy}')
+
+    for _, definition in indexes:
+        schema_editor.execute(definition)
+    for name, definition in foreign_keys:
+        schema_editor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {quote_name(name)} {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tracking_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0002_partition_tracking_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10, verbose_name='period')),
+                ('period_start', models.DateTimeField(verbose_name='period start')),
+                ('dimension', models.CharField(choices=[('event_type', 'Event Type'), ('product', 'Product Views'), ('utm_source', 'UTM Source'), ('funnel_step', 'Funnel Step')], max_length=20, verbose_name='dimension')),
+                ('key', models.CharField(blank=True, max_length=255, verbose_name='key')),
+                ('count', models.PositiveBigIntegerField(default=0, verbose_name='count')),
+                ('value_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='value sum')),
+                ('value_count', models.PositiveBigIntegerField(default=0, verbose_name='value count')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'Tracking Rollup',
+                'verbose_name_plural': 'Tracking Rollups',
+                'db_table': 'tracking_rollups',
+                'indexes': [models.Index(fields=['period', 'dimension', 'period_start'], name='tracking_ro_period_3cfbd0_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trackingrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'dimension', 'period_start', 'key'), name='unique_tracking_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0003_tracking_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttributionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('first_touch', 'First Touch'), ('last_touch', 'Last Touch'), ('linear', 'Linear')], max_length=20, verbose_name='attribution model')),
+                ('period_start', models.DateTimeField(verbose_name='period start')),
+                ('utm_source', models.CharField(blank=True, max_length=255, verbose_name='UTM source')),
+                ('utm_medium', models.CharField(blank=True, max_length=255, verbose_name='UTM medium')),
+                ('utm_campaign', models.CharField(blank=True, max_length=255, verbose_name='UTM campaign')),
+                ('conversions', models.DecimalField(decimal_places=4, default=0, max_digits=14, verbose_name='conversions')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='revenue')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'Attribution Rollup',
+                'verbose_name_plural': 'Attribution Rollups',
+                'db_table': 'tracking_attribution_rollups',
+                'indexes': [models.Index(fields=['model', 'period_start'], name='tracking_at_model_2a9e6d_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='attributionrollup',
+            constraint=models.UniqueConstraint(fields=('model', 'period_start', 'utm_source', 'utm_medium', 'utm_campaign'), name='unique_attribution_rollup_bucket'),
+        ),
+    ]
@@ -254,3 +254,89 @@ class AbandonedCart(models.Model):
     
     def __str__(self):
         return f"Abandoned cart - {self.user.email} - {self.cart_value}"
+
+
+class TrackingRollup(models.Model):
+    """Pre-aggregated tracking counts per time bucket and dimension"""
+    
+    PERIOD_CHOICES = [
+        ('hour', _('Hour')),
+        ('day', _('Day')),
+    ]
+    
+    DIMENSION_CHOICES = [
+        ('event_type', _('Event Type')),
+        ('product', _('Product Views')),
+        ('utm_source', _('UTM Source')),
+        ('funnel_step', _('Funnel Step')),
+    ]
+    
+    period = models.CharField(_('period'), max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateTimeField(_('period start'))
+    dimension = models.CharField(_('dimension'), max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(_('key'), max_length=255, blank=True)
+    
+    # Aggregates
+    count = models.PositiveBigIntegerField(_('count'), default=0)
+    value_sum = models.DecimalField(_('value sum'), max_digits=16, decimal_places=2, default=0)
+    value_count = models.PositiveBigIntegerField(_('value count'), default=0)
+    
+    # Timestamps
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Tracking Rollup')
+        verbose_name_plural = _('Tracking Rollups')
+        db_table = 'tracking_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'dimension', 'period_start', 'key'],
+                name='unique_tracking_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'dimension', 'period_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.dimension}:{self.key} @ {self.period_start} ({self.period})"
+
+
+class AttributionRollup(models.Model):
+    """Revenue and conversions credited to a traffic channel per purchase day"""
+    
+    MODEL_CHOICES = [
+        ('first_touch', _('First Touch')),
+        ('last_touch', _('Last Touch')),
+        ('linear', _('Linear')),
+    ]
+    
+    model = models.CharField(_('attribution model'), max_length=20, choices=MODEL_CHOICES)
+    period_start = models.DateTimeField(_('period start'))
+    utm_source = models.CharField(_('UTM source'), max_length=255, blank=True)
+    utm_medium = models.CharField(_('UTM medium'), max_length=255, blank=True)
+    utm_campaign = models.CharField(_('UTM campaign'), max_length=255, blank=True)
+    
+    # Aggregates (linear attribution credits fractions of a conversion)
+    conversions = models.DecimalField(_('conversions'), max_digits=14, decimal_places=4, default=0)
+    revenue = models.DecimalField(_('revenue'), max_digits=16, decimal_places=2, default=0)
+    
+    # Timestamps
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Attribution Rollup')
+        verbose_name_plural = _('Attribution Rollups')
+        db_table = 'tracking_attribution_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model', 'period_start', 'utm_source', 'utm_medium', 'utm_campaign'],
+                name='unique_attribution_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['model', 'period_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.model} {self.period_start:%Y-%m-%d} {self.utm_source}/{self.utm_medium}/{self.utm_campaign}"
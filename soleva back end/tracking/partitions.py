@@ -0,0 +1,178 @@
+"""
+Monthly range partitions and retention for tracking events
+
+On PostgreSQL ``tracking_events`` is partitioned by ``created_at`` (see
+migration 0002). Old months are archived to gzipped CSV under
+TRACKING_ARCHIVE_DIR and dropped as a whole partition; other databases fall
+back to chunked deletes.
+"""
+
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TrackingEvent
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLE = TrackingEvent._meta.db_table
+DEFAULT_PARTITION = f'{PARTITIONED_TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{PARTITIONED_TABLE}_(\d{{4}})_(\d{{2}})$')
+
+TRACKING_PARTITIONS_AHEAD = getattr(settings, 'TRACKING_PARTITIONS_AHEAD', 3)
+TRACKING_RETENTION_MONTHS = getattr(settings, 'TRACKING_RETENTION_MONTHS', 13)
+# On private_media_volume, so archives survive container rebuilds and are never served
+TRACKING_ARCHIVE_DIR = getattr(
+    settings, 'TRACKING_ARCHIVE_DIR', os.path.join(settings.PRIVATE_MEDIA_ROOT, 'archives', 'tracking')
+)
+TRACKING_PURGE_CHUNK_SIZE = 5000
+
+
+def month_start(day: date) -> date:
+    """First day of the month containing ``day``"""
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` after ``month``"""
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + year, month_index + 1, 1)
+
+
+def month_bound(month: date) -> datetime:
+    """Aware midnight at the start of ``month`` in the project time zone"""
+    return timezone.make_aware(datetime(month.year, month.month, 1))
+
+
+def partition_name(month: date) -> str:
+    return f'{PARTITIONED_TABLE}_{month:%Y_%m}'
+
+
+def create_partition_sql(month: date, quote_name) -> Tuple[str, list]:
+    """DDL creating the partition for ``month`` if it does not exist"""
+    return (
+        f'CREATE TABLE IF NOT EXISTS {quote_name(partition_name(month))} '
+        f'PARTITION OF {quote_name(PARTITIONED_TABLE)} FOR VALUES FROM (%s) TO (%s)',
+        [month_bound(month), month_bound(add_months(month, 1))],
+    )
+
+
+class TrackingPartitionService:
+    """Create, archive and drop monthly tracking event partitions"""
+
+    @staticmethod
+    def is_partitioned() -> bool:
+        """Whether the events table is a PostgreSQL partitioned table"""
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)',
+                [PARTITIONED_TABLE]
+            )
+            return cursor.fetchone() is not None
+
+    @staticmethod
+    def partitions() -> List[Tuple[date, str]]:
+        """Existing monthly partitions, oldest first"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT child.relname FROM pg_inherits '
+                'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+                'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                'WHERE parent.relname = %s',
+                [PARTITIONED_TABLE]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+
+        months = []
+        for name in names:
+            match = PARTITION_NAME.match(name)
+            if match:
+                months.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+        return sorted(months)
+
+    @staticmethod
+    def ensure_partitions(ahead: int = TRACKING_PARTITIONS_AHEAD, today: Optional[date] = None) -> List[str]:
+        """Create partitions for the current month and ``ahead`` months after it"""
+        current = month_start(today or timezone.localdate())
+        existing = {name for _, name in TrackingPartitionService.partitions()}
+        created = []
+        for offset in range(ahead + 1):
+            month = add_months(current, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+            sql, params = create_partition_sql(month, connection.ops.quote_name)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, params)
+            created.append(name)
+            logger.info(f"Created tracking partition {name}")
+        return created
+
+    @staticmethod
+    def archive_partition(name: str, directory: str = TRACKING_ARCHIVE_DIR) -> str:
+        """Write a partition to ``<directory>/<name>.csv.gz`` with COPY"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{name}.csv.gz')
+        with gzip.open(path, 'wb') as archive, connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(name)} TO STDOUT WITH (FORMAT csv, HEADER)',
+                archive
+            )
+        return path
+
+    @staticmethod
+    def drop_partition(name: str) -> None:
+        """Detach and drop one partition"""
+        quote_name = connection.ops.quote_name
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'ALTER TABLE {quote_name(PARTITIONED_TABLE)} DETACH PARTITION {quote_name(name)}'
+            )
+            cursor.execute(f'DROP TABLE {quote_name(name)}')
+        logger.info(f"Dropped tracking partition {name}")
+
+    @staticmethod
+    def expired_partitions(retain_months: int = TRACKING_RETENTION_MONTHS,
+                           today: Optional[date] = None) -> List[str]:
+        """Partitions whose whole month is older than the retention window"""
+        cutoff = add_months(month_start(today or timezone.localdate()), -retain_months)
+        return [name for month, name in TrackingPartitionService.partitions() if month < cutoff]
+
+    @staticmethod
+    def apply_retention(retain_months: int = TRACKING_RETENTION_MONTHS, archive: bool = True,
+                        directory: str = TRACKING_ARCHIVE_DIR, dry_run: bool = False) -> List[str]:
+        """Archive and drop expired partitions; returns the partitions handled"""
+        expired = TrackingPartitionService.expired_partitions(retain_months)
+        if dry_run:
+            return expired
+        for name in expired:
+            if archive:
+                path = TrackingPartitionService.archive_partition(name, directory)
+                logger.info(f"Archived tracking partition {name} to {path}")
+            TrackingPartitionService.drop_partition(name)
+        return expired
+
+    @staticmethod
+    def purge_expired_events(retain_months: int = TRACKING_RETENTION_MONTHS, dry_run: bool = False) -> int:
+        """Fallback for unpartitioned databases: delete expired events in chunks"""
+        cutoff = month_bound(add_months(month_start(timezone.localdate()), -retain_months))
+        expired = TrackingEvent.objects.filter(created_at__lt=cutoff)
+        if dry_run:
+            return expired.count()
+
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:TRACKING_PURGE_CHUNK_SIZE])
+            if not ids:
+                return deleted
+            TrackingEvent.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
@@ -0,0 +1,249 @@
+"""
+Incremental rollups of tracking events and conversion sessions for dashboards
+
+Buckets are recomputed from the raw rows of a bounded recent window (which
+only touches recent event partitions) and replaced, so re-running a refresh
+is always safe. The window starts at the watermark left by the last
+successful refresh, so missed runs are caught up. Hourly rows only feed the
+daily ones and are pruned after TRACKING_ROLLUP_HOUR_RETENTION_DAYS.
+"""
+
+import logging
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import TrackingEvent, ConversionTracking, TrackingRollup
+
+logger = logging.getLogger(__name__)
+
+# Hours of events re-aggregated on each refresh; covers events still in the ingestion buffer
+TRACKING_ROLLUP_LOOKBACK_HOURS = getattr(settings, 'TRACKING_ROLLUP_LOOKBACK_HOURS', 2)
+
+# Days of sessions re-aggregated on each refresh; sessions keep advancing through the funnel
+TRACKING_ROLLUP_SESSION_DAYS = getattr(settings, 'TRACKING_ROLLUP_SESSION_DAYS', 2)
+
+# Days hourly rollups are kept; refreshes never catch up further back than this
+TRACKING_ROLLUP_HOUR_RETENTION_DAYS = getattr(settings, 'TRACKING_ROLLUP_HOUR_RETENTION_DAYS', 14)
+
+# Start of the buckets that could still change at the last successful refresh
+ROLLUP_WATERMARK_KEY = 'tracking_rollup_watermark'
+
+EVENT_DIMENSIONS = ['event_type', 'product']
+SESSION_DIMENSIONS = ['utm_source', 'funnel_step']
+
+# Funnel step key -> ConversionTracking timestamp field (None counts every session)
+FUNNEL_STEPS = OrderedDict([
+    ('sessions', None),
+    ('landing', 'landing_at'),
+    ('product_view', 'product_view_at'),
+    ('add_to_cart', 'add_to_cart_at'),
+    ('checkout_start', 'checkout_start_at'),
+    ('payment_info', 'payment_info_at'),
+    ('purchase', 'purchase_at'),
+])
+
+
+def hour_floor(moment: datetime) -> datetime:
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def day_floor(moment: datetime) -> datetime:
+    return timezone.localtime(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class TrackingRollupService:
+    """Maintain and read TrackingRollup rows"""
+
+    @staticmethod
+    def replace(period: str, dimensions: List[str], start: datetime, end: datetime,
+                rollups: List[TrackingRollup]) -> int:
+        """Swap the buckets of ``dimensions`` in [start, end) for freshly computed ones"""
+        with transaction.atomic():
+            TrackingRollup.objects.filter(
+                period=period,
+                dimension__in=dimensions,
+                period_start__gte=start,
+                period_start__lt=end,
+            ).delete()
+            TrackingRollup.objects.bulk_create(rollups, batch_size=1000)
+        return len(rollups)
+
+    @staticmethod
+    def rebuild_event_hours(start: datetime, end: datetime) -> int:
+        """Hourly event_type and product view counts from raw events"""
+        start, end = hour_floor(start), hour_floor(end)
+        events = TrackingEvent.objects.filter(created_at__gte=start, created_at__lt=end)
+
+        rollups = [
+            TrackingRollup(
+                period='hour',
+                period_start=row['bucket'],
+                dimension='event_type',
+                key=row['event_type'],
+                count=row['count'],
+                value_sum=row['value_sum'] or Decimal('0.00'),
+                value_count=row['value_count'],
+            )
+            for row in events.annotate(bucket=TruncHour('created_at')).values('bucket', 'event_type').annotate(
+                count=Count('id'), value_sum=Sum('value'), value_count=Count('value')
+            ).order_by()
+        ]
+        rollups.extend(
+            TrackingRollup(
+                period='hour',
+                period_start=row['bucket'],
+                dimension='product',
+                key=row['product_name'][:255],
+                count=row['count'],
+            )
+            for row in events.filter(event_type='view_content').exclude(product_name='').annotate(
+                bucket=TruncHour('created_at')
+            ).values('bucket', 'product_name').annotate(count=Count('id')).order_by()
+        )
+        return TrackingRollupService.replace('hour', EVENT_DIMENSIONS, start, end, rollups)
+
+    @staticmethod
+    def rebuild_event_days(start: datetime, end: datetime) -> int:
+        """Daily event rollups summed from the hourly ones"""
+        start, end = day_floor(start), day_floor(end)
+        rows = TrackingRollup.objects.filter(
+            period='hour',
+            dimension__in=EVENT_DIMENSIONS,
+            period_start__gte=start,
+            period_start__lt=end,
+        ).annotate(bucket=TruncDay('period_start')).values('bucket', 'dimension', 'key').annotate(
+            total=Sum('count'), total_value=Sum('value_sum'), total_value_count=Sum('value_count')
+        ).order_by()
+
+        rollups = [
+            TrackingRollup(
+                period='day',
+                period_start=row['bucket'],
+                dimension=row['dimension'],
+                key=row['key'],
+                count=row['total'],
+                value_sum=row['total_value'] or Decimal('0.00'),
+                value_count=row['total_value_count'] or 0,
+            )
+            for row in rows
+        ]
+        return TrackingRollupService.replace('day', EVENT_DIMENSIONS, start, end, rollups)
+
+    @staticmethod
+    def rebuild_session_days(start: datetime, end: datetime) -> int:
+        """Daily funnel step and traffic source counts from conversion sessions"""
+        start, end = day_floor(start), day_floor(end)
+        sessions = ConversionTracking.objects.filter(created_at__gte=start, created_at__lt=end).annotate(
+            bucket=TruncDay('created_at')
+        )
+
+        step_counts = {
+            step: Count('id', filter=Q(**{f'{field}__isnull': False})) if field else Count('id')
+            for step, field in FUNNEL_STEPS.items()
+        }
+        rollups = []
+        for row in sessions.values('bucket').annotate(**step_counts).order_by():
+            rollups.extend(
+                TrackingRollup(
+                    period='day',
+                    period_start=row['bucket'],
+                    dimension='funnel_step',
+                    key=step,
+                    count=row[step],
+                )
+                for step in FUNNEL_STEPS
+            )
+
+        rollups.extend(
+            TrackingRollup(
+                period='day',
+                period_start=row['bucket'],
+                dimension='utm_source',
+                key=row['utm_source'],
+                count=row['count'],
+            )
+            for row in sessions.values('bucket', 'utm_source').annotate(count=Count('id')).order_by()
+        )
+        return TrackingRollupService.replace('day', SESSION_DIMENSIONS, start, end, rollups)
+
+    @staticmethod
+    def prune_hours(before: datetime) -> int:
+        """Delete hourly rollups older than ``before``; daily rows keep their totals"""
+        deleted, _ = TrackingRollup.objects.filter(period='hour', period_start__lt=before).delete()
+        return deleted
+
+    @staticmethod
+    def refresh(now: Optional[datetime] = None) -> int:
+        """Recompute the buckets that can still change or were missed since the last refresh"""
+        now = now or timezone.now()
+        next_hour = hour_floor(now) + timedelta(hours=1)
+        tomorrow = day_floor(now) + timedelta(days=1)
+        # Hourly rows before this are pruned, so days before it cannot be re-summed
+        cutoff = day_floor(day_floor(now) - timedelta(days=TRACKING_ROLLUP_HOUR_RETENTION_DAYS))
+
+        start = next_hour - timedelta(hours=TRACKING_ROLLUP_LOOKBACK_HOURS + 1)
+        watermark = cache.get(ROLLUP_WATERMARK_KEY)
+        if watermark is not None and watermark < start:
+            start = max(watermark, cutoff)
+            logger.info(f"Catching up tracking rollups from {start.isoformat()}")
+
+        written = TrackingRollupService.rebuild_event_hours(start, next_hour)
+        # The window may reach into earlier days
+        written += TrackingRollupService.rebuild_event_days(start, tomorrow)
+        written += TrackingRollupService.rebuild_session_days(
+            min(start, tomorrow - timedelta(days=TRACKING_ROLLUP_SESSION_DAYS + 1)), tomorrow
+        )
+        TrackingRollupService.prune_hours(cutoff)
+
+        cache.set(ROLLUP_WATERMARK_KEY, hour_floor(now - timedelta(hours=TRACKING_ROLLUP_LOOKBACK_HOURS)), None)
+        return written
+
+    @staticmethod
+    def rebuild(days: int) -> int:
+        """Backfill the last ``days`` days, one day at a time"""
+        tomorrow = day_floor(timezone.now()) + timedelta(days=1)
+        written = 0
+        for offset in range(days, 0, -1):
+            day_end = tomorrow - timedelta(days=offset - 1)
+            day_start = day_end - timedelta(days=1)
+            written += TrackingRollupService.rebuild_event_hours(day_start, day_end)
+            written += TrackingRollupService.rebuild_event_days(day_start, day_end)
+            written += TrackingRollupService.rebuild_session_days(day_start, day_end)
+        return written
+
+    @staticmethod
+    def daily_rows(dimension: str, since: Optional[datetime] = None) -> List[Dict]:
+        """Daily rollup rows of one dimension"""
+        rows = TrackingRollup.objects.filter(period='day', dimension=dimension)
+        if since is not None:
+            rows = rows.filter(period_start__gte=day_floor(since))
+        return list(rows.values('period_start', 'key', 'count', 'value_sum', 'value_count'))
+
+    @staticmethod
+    def totals(dimension: str, since: Optional[datetime] = None) -> Dict[str, Dict]:
+        """Per-key totals of a dimension across daily buckets"""
+        totals = defaultdict(lambda: {'count': 0, 'value_sum': Decimal('0.00'), 'value_count': 0})
+        for row in TrackingRollupService.daily_rows(dimension, since):
+            total = totals[row['key']]
+            total['count'] += row['count']
+            total['value_sum'] += row['value_sum']
+            total['value_count'] += row['value_count']
+        return dict(totals)
+
+    @staticmethod
+    def top(dimension: str, since: Optional[datetime] = None, limit: int = 10) -> List[tuple]:
+        """(key, count) pairs with the highest counts"""
+        totals = TrackingRollupService.totals(dimension, since)
+        return sorted(
+            ((key, total['count']) for key, total in totals.items()),
+            key=lambda item: (-item[1], item[0])
+        )[:limit]
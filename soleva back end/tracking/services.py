@@ -0,0 +1,446 @@
+"""
+Tracking event ingestion - buffered on the request path, written in micro-batches
+"""
+
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from utils.cache import get_redis_client
+from utils.live_metrics import LiveMetrics
+from .funnel import FunnelSessionStore, UTM_FIELDS
+from .models import TrackingPixel, TrackingEvent, AbandonedCart
+
+logger = logging.getLogger(__name__)
+
+TRACKING_BUFFER_KEY = getattr(settings, 'TRACKING_BUFFER_KEY', 'tracking:events')
+TRACKING_BATCH_SIZE = getattr(settings, 'TRACKING_BATCH_SIZE', 500)
+
+# Events that failed this many writes move to the dead-letter list instead of the buffer
+TRACKING_MAX_ATTEMPTS = getattr(settings, 'TRACKING_MAX_ATTEMPTS', 10)
+TRACKING_DEAD_LETTER_KEY = getattr(settings, 'TRACKING_DEAD_LETTER_KEY', 'tracking:events:dead')
+
+# Upper bound on batches drained by one consumer run so a backlog cannot pin a worker
+TRACKING_MAX_BATCHES_PER_RUN = getattr(settings, 'TRACKING_MAX_BATCHES_PER_RUN', 20)
+
+DECIMAL_FIELDS = ('product_price', 'value')
+
+# Largest batch accepted by the batch endpoint
+TRACKING_MAX_EVENTS_PER_REQUEST = getattr(settings, 'TRACKING_MAX_EVENTS_PER_REQUEST', 100)
+
+# Client timestamps outside this window are replaced by the server time
+CLIENT_TIMESTAMP_MAX_AGE = timedelta(hours=24)
+CLIENT_TIMESTAMP_MAX_SKEW = timedelta(minutes=5)
+
+
+def get_client_ip(request) -> Optional[str]:
+    """Get client IP address"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+class TrackingEventSchema:
+    """
+    Plain-Python validation for batched events
+
+    Mirrors TrackEventSerializer without building a serializer per event,
+    which dominates the cost of a 50-event beacon.
+    """
+
+    EVENT_TYPES = frozenset(choice for choice, _ in TrackingEvent._meta.get_field('event_type').choices)
+
+    # field -> max length
+    STRING_FIELDS = {
+        'event_name': 100,
+        'session_id': 100,
+        'product_id': 100,
+        'product_name': 255,
+        'product_category': 255,
+        'currency': 3,
+        'order_id': 100,
+    }
+    URL_FIELDS = {'page_url': 200, 'referrer': 200}
+    MAX_DECIMAL = Decimal('99999999.99')
+
+    @staticmethod
+    def validate(raw) -> Tuple[Optional[Dict], Dict]:
+        """Return (data, errors) for one raw event"""
+        if not isinstance(raw, dict):
+            return None, {'non_field_errors': 'Event must be an object.'}
+
+        data = {}
+        errors = {}
+
+        event_type = raw.get('event_type')
+        if event_type not in TrackingEventSchema.EVENT_TYPES:
+            errors['event_type'] = f'"{event_type}" is not a valid choice.'
+        data['event_type'] = event_type
+
+        if not raw.get('event_name'):
+            errors['event_name'] = 'This field is required.'
+
+        for field, max_length in TrackingEventSchema.STRING_FIELDS.items():
+            value = raw.get(field)
+            if value is None or value == '':
+                continue
+            if not isinstance(value, (str, int)) or len(str(value)) > max_length:
+                errors[field] = f'Must be a string of at most {max_length} characters.'
+            else:
+                data[field] = str(value)
+
+        for field, max_length in TrackingEventSchema.URL_FIELDS.items():
+            value = raw.get(field)
+            if not value:
+                continue
+            if (not isinstance(value, str) or len(value) > max_length or
+                    not value.startswith(('http://', 'https://'))):
+                errors[field] = 'Enter a valid URL.'
+            else:
+                data[field] = value
+
+        for field in DECIMAL_FIELDS:
+            value = raw.get(field)
+            if value is None or value == '':
+                continue
+            try:
+                number = Decimal(str(value)).quantize(Decimal('0.01'))
+            except (InvalidOperation, ValueError):
+                errors[field] = 'A valid number is required.'
+                continue
+            if not number.is_finite() or abs(number) > TrackingEventSchema.MAX_DECIMAL:
+                errors[field] = 'A valid number is required.'
+            else:
+                data[field] = number
+
+        quantity = raw.get('quantity')
+        if quantity is not None and quantity != '':
+            if isinstance(quantity, bool) or not str(quantity).isdigit():
+                errors['quantity'] = 'A valid integer is required.'
+            else:
+                data['quantity'] = int(quantity)
+
+        event_data = raw.get('event_data')
+        if event_data is not None and not isinstance(event_data, dict):
+            errors['event_data'] = 'Must be an object.'
+        data['event_data'] = event_data or {}
+
+        pixel_types = raw.get('pixel_types') or []
+        if not isinstance(pixel_types, list) or not all(isinstance(item, str) for item in pixel_types):
+            errors['pixel_types'] = 'Must be a list of strings.'
+        data['pixel_types'] = pixel_types
+
+        data.setdefault('currency', 'EGP')
+
+        if errors:
+            return None, errors
+        return data, {}
+
+    @staticmethod
+    def occurred_at(raw, now: datetime) -> datetime:
+        """Client event time (``timestamp`` in epoch milliseconds) when plausible"""
+        timestamp = raw.get('timestamp') if isinstance(raw, dict) else None
+        if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+            try:
+                moment = datetime.fromtimestamp(timestamp / 1000, tz=now.tzinfo)
+            except (OverflowError, OSError, ValueError):
+                return now
+            if now - CLIENT_TIMESTAMP_MAX_AGE <= moment <= now + CLIENT_TIMESTAMP_MAX_SKEW:
+                return min(moment, now)
+        return now
+
+
+class TrackingEventBuffer:
+    """Redis list used as the ingestion queue between requests and the consumer"""
+
+    @staticmethod
+    def push(envelopes: List[Dict]) -> bool:
+        """Append events to the buffer; returns False when no buffer is available"""
+        connection = get_redis_client()
+        if connection is None:
+            return False
+        try:
+            connection.rpush(
+                TRACKING_BUFFER_KEY,
+                *[json.dumps(envelope, cls=DjangoJSONEncoder) for envelope in envelopes]
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"Tracking buffer unavailable, ingesting inline: {str(e)}")
+            return False
+
+    @staticmethod
+    def pop_batch(size: int = TRACKING_BATCH_SIZE) -> List[Dict]:
+        """Atomically take up to ``size`` events from the head of the buffer"""
+        connection = get_redis_client()
+        if connection is None:
+            return []
+        pipeline = connection.pipeline(transaction=True)
+        pipeline.lrange(TRACKING_BUFFER_KEY, 0, size - 1)
+        pipeline.ltrim(TRACKING_BUFFER_KEY, size, -1)
+        raw_events, _ = pipeline.execute()
+
+        envelopes = []
+        for raw in raw_events:
+            try:
+                envelopes.append(json.loads(raw))
+            except (TypeError, ValueError):
+                logger.error(f"Dropping malformed tracking event: {raw!r}")
+        return envelopes
+
+    @staticmethod
+    def size() -> int:
+        """Number of events waiting in the buffer"""
+        connection = get_redis_client()
+        if connection is None:
+            return 0
+        return connection.llen(TRACKING_BUFFER_KEY)
+
+    @staticmethod
+    def dead_letter(envelopes: List[Dict], error: str) -> bool:
+        """
+        Park events that keep failing, with the last error, for inspection and requeueing
+
+        Returns False when Redis is unreachable; the events are then written to
+        the error log, which is the only copy left.
+        """
+        failed_at = timezone.now().isoformat()
+        payloads = [
+            json.dumps(dict(envelope, error=error, failed_at=failed_at), cls=DjangoJSONEncoder)
+            for envelope in envelopes
+        ]
+        connection = get_redis_client()
+        try:
+            if connection is None:
+                raise ConnectionError('no Redis connection')
+            connection.rpush(TRACKING_DEAD_LETTER_KEY, *payloads)
+            return True
+        except Exception as e:
+            logger.error(f"Could not dead-letter {len(payloads)} tracking events ({str(e)}): {payloads}")
+            return False
+
+    @staticmethod
+    def dead_letter_size() -> int:
+        """Number of events waiting in the dead-letter list"""
+        connection = get_redis_client()
+        if connection is None:
+            return 0
+        return connection.llen(TRACKING_DEAD_LETTER_KEY)
+
+    @staticmethod
+    def requeue_dead_letters() -> int:
+        """Move every dead-lettered event back to the buffer with a fresh attempt count"""
+        connection = get_redis_client()
+        if connection is None:
+            return 0
+        pipeline = connection.pipeline(transaction=True)
+        pipeline.lrange(TRACKING_DEAD_LETTER_KEY, 0, -1)
+        pipeline.delete(TRACKING_DEAD_LETTER_KEY)
+        raw_events, _ = pipeline.execute()
+
+        envelopes = []
+        for raw in raw_events:
+            envelope = json.loads(raw)
+            for field in ('attempts', 'error', 'failed_at'):
+                envelope.pop(field, None)
+            envelopes.append(envelope)
+        if envelopes:
+            connection.rpush(TRACKING_BUFFER_KEY, *[json.dumps(envelope) for envelope in envelopes])
+        return len(envelopes)
+
+
+class TrackingIngestionService:
+    """Turn buffered tracking events into TrackingEvent, funnel and abandoned cart rows"""
+
+    @staticmethod
+    def build_envelope(request, data: Dict, session_id: str, occurred_at: Optional[datetime] = None) -> Dict:
+        """Capture everything the consumer needs from the request at ingestion time"""
+        user = request.user if request.user.is_authenticated else None
+        return {
+            'data': data,
+            'session_id': session_id,
+            'user_id': user.pk if user else None,
+            'ip_address': get_client_ip(request),
+            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+            'utm': {field: request.GET.get(field, '') for field in UTM_FIELDS},
+            'occurred_at': (occurred_at or timezone.now()).isoformat(),
+        }
+
+    @staticmethod
+    def build_envelopes(request, events: List[Tuple[Dict, datetime]], session_id: str) -> List[Dict]:
+        """Envelopes for a batch, reading request metadata once"""
+        base = TrackingIngestionService.build_envelope(request, {}, session_id)
+        envelopes = []
+        for data, occurred_at in events:
+            envelope = dict(base, data=data, occurred_at=occurred_at.isoformat())
+            if data.get('session_id'):
+                envelope['session_id'] = data['session_id']
+            envelopes.append(envelope)
+        return envelopes
+
+    @staticmethod
+    def enqueue(envelopes: List[Dict]) -> None:
+        """Buffer events for the consumer, processing inline when no buffer is reachable"""
+        if not envelopes:
+            return
+        LiveMetrics.record_events(len(envelopes))
+        if not TrackingEventBuffer.push(envelopes):
+            TrackingIngestionService.process_batch(
+                json.loads(json.dumps(envelopes, cls=DjangoJSONEncoder))
+            )
+
+    @staticmethod
+    def decode(envelope: Dict) -> Dict:
+        """Restore typed values lost in the JSON round trip"""
+        data = dict(envelope['data'])
+        for field in DECIMAL_FIELDS:
+            if data.get(field) is not None:
+                data[field] = Decimal(str(data[field]))
+        envelope = dict(envelope, data=data)
+        envelope['occurred_at'] = parse_datetime(envelope['occurred_at']) or timezone.now()
+        return envelope
+
+    @staticmethod
+    def pixels_for(pixels: List[TrackingPixel], pixel_types: List[str]) -> List[TrackingPixel]:
+        """Pixels an event is recorded on (all e-commerce pixels when none are requested)"""
+        if not pixel_types:
+            return [pixel for pixel in pixels if pixel.track_ecommerce]
+        return [pixel for pixel in pixels if pixel.pixel_type in pixel_types]
+
+    @staticmethod
+    def process_batch(envelopes: List[Dict]) -> int:
+        """Write one micro-batch; returns the number of TrackingEvent rows created"""
+        if not envelopes:
+            return 0
+
+        envelopes = [TrackingIngestionService.decode(envelope) for envelope in envelopes]
+        pixels = list(TrackingPixel.objects.filter(is_active=True))
+
+        events = []
+        for envelope in envelopes:
+            data = envelope['data']
+            for pixel in TrackingIngestionService.pixels_for(pixels, data.get('pixel_types') or []):
+                events.append(TrackingEvent(
+                    event_name=data['event_name'],
+                    event_type=data['event_type'],
+                    user_id=envelope['user_id'],
+                    session_id=envelope['session_id'],
+                    ip_address=envelope['ip_address'],
+                    user_agent=envelope['user_agent'],
+                    referrer=data.get('referrer', ''),
+                    page_url=data.get('page_url', ''),
+                    event_data=data.get('event_data', {}),
+                    product_id=data.get('product_id', ''),
+                    product_name=data.get('product_name', ''),
+                    product_category=data.get('product_category', ''),
+                    product_price=data.get('product_price'),
+                    quantity=data.get('quantity'),
+                    value=data.get('value'),
+                    currency=data.get('currency', 'EGP'),
+                    order_id=data.get('order_id', ''),
+                    pixel=pixel,
+                ))
+
+        with transaction.atomic():
+            TrackingEvent.objects.bulk_create(events, batch_size=TRACKING_BATCH_SIZE)
+            FunnelSessionStore.record(envelopes)
+            TrackingIngestionService.update_abandoned_carts(envelopes)
+
+        return len(events)
+
+    @staticmethod
+    def update_abandoned_carts(envelopes: List[Dict]) -> None:
+        """Create or refresh abandoned carts for signed-in add_to_cart events"""
+        latest_values = OrderedDict()
+        for envelope in envelopes:
+            if envelope['data']['event_type'] == 'add_to_cart' and envelope['user_id']:
+                key = (envelope['user_id'], envelope['session_id'])
+                latest_values[key] = envelope['data'].get('value') or latest_values.get(key)
+        if not latest_values:
+            return
+
+        existing = {
+            (cart.user_id, cart.session_id): cart
+            for cart in AbandonedCart.objects.filter(
+                user_id__in={user_id for user_id, _ in latest_values},
+                session_id__in={session_id for _, session_id in latest_values},
+                is_recovered=False,
+            )
+        }
+
+        new_carts = []
+        changed_carts = []
+        for (user_id, session_id), value in latest_values.items():
+            cart = existing.get((user_id, session_id))
+            if cart is None:
+                new_carts.append(AbandonedCart(
+                    user_id=user_id,
+                    session_id=session_id,
+                    cart_items=[],
+                    cart_value=value or Decimal('0.00'),
+                ))
+            elif value:
+                cart.cart_value = value
+                cart.updated_at = timezone.now()
+                changed_carts.append(cart)
+
+        AbandonedCart.objects.bulk_create(new_carts)
+        if changed_carts:
+            AbandonedCart.objects.bulk_update(changed_carts, ['cart_value', 'updated_at'])
+
+    @staticmethod
+    def drain(max_batches: int = TRACKING_MAX_BATCHES_PER_RUN, batch_size: int = TRACKING_BATCH_SIZE) -> int:
+        """Consume buffered events batch by batch; returns the events written"""
+        written = 0
+        for _ in range(max_batches):
+            envelopes = TrackingEventBuffer.pop_batch(batch_size)
+            if not envelopes:
+                break
+            try:
+                written += TrackingIngestionService.process_batch(envelopes)
+            except Exception as e:
+                logger.error(f"Failed to write tracking batch of {len(envelopes)} events: {str(e)}")
+                written += TrackingIngestionService.retry_failed(envelopes, str(e))
+                break
+        return written
+
+    @staticmethod
+    def retry_failed(envelopes: List[Dict], error: str) -> int:
+        """
+        Put a failed batch back on the buffer, counting the attempt
+
+        Events on their last attempt, and all of them when the buffer cannot
+        take them back, are written one by one, so a single bad event does not
+        take the rest of its batch to the dead-letter list. Returns the
+        TrackingEvent rows those single writes created.
+        """
+        retry = []
+        exhausted = []
+        for envelope in envelopes:
+            envelope['attempts'] = envelope.get('attempts', 0) + 1
+            (exhausted if envelope['attempts'] >= TRACKING_MAX_ATTEMPTS else retry).append(envelope)
+        if retry and not TrackingEventBuffer.push(retry):
+            logger.warning(f"Could not requeue {len(retry)} tracking events, writing them inline")
+            exhausted.extend(retry)
+
+        written = 0
+        dead = []
+        for envelope in exhausted:
+            try:
+                written += TrackingIngestionService.process_batch([envelope])
+            except Exception as e:
+                error = str(e)
+                dead.append(envelope)
+        if dead and TrackingEventBuffer.dead_letter(dead, error):
+            logger.error(f"Moved {len(dead)} tracking events to {TRACKING_DEAD_LETTER_KEY}: {error}")
+        return written
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from utils.cache import VersionedCache
+from .models import TrackingPixel
+
+# Versioned cache namespace of the public pixel configuration
+PIXEL_CONFIG_NAMESPACE = 'pixel_config'
+
+
+@receiver([post_save, post_delete], sender=TrackingPixel)
+def invalidate_pixel_config(sender, instance, **kwargs):
+    """Rebuild the public pixel configuration after any pixel change"""
+    VersionedCache.bump_version(PIXEL_CONFIG_NAMESPACE)
@@ -0,0 +1,94 @@
+from celery import shared_task
+import logging
+
+from .attribution import AttributionService
+from .dispatch import PixelDispatcher
+from .funnel import FunnelSessionStore
+from .partitions import TrackingPartitionService
+from .rollups import TrackingRollupService
+from .services import TrackingIngestionService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_tracking_events():
+    """
+    Drain buffered tracking events into the database in micro-batches
+    """
+    try:
+        written = TrackingIngestionService.drain()
+        if written:
+            logger.info(f"Wrote {written} tracking events")
+        return written
+
+    except Exception as e:
+        logger.error(f"Error in process_tracking_events task: {str(e)}")
+        return 0
+
+
+@shared_task
+def maintain_tracking_partitions():
+    """
+    Create upcoming event partitions and archive/drop expired ones
+    """
+    try:
+        if not TrackingPartitionService.is_partitioned():
+            return TrackingPartitionService.purge_expired_events()
+
+        created = TrackingPartitionService.ensure_partitions()
+        dropped = TrackingPartitionService.apply_retention()
+        logger.info(f"Tracking partitions: created {len(created)}, dropped {len(dropped)}")
+        return len(dropped)
+
+    except Exception as e:
+        logger.error(f"Error in maintain_tracking_partitions task: {str(e)}")
+        return 0
+
+
+@shared_task
+def update_tracking_rollups():
+    """
+    Refresh the recent hourly/daily tracking and attribution rollups read by the dashboards
+    """
+    try:
+        written = TrackingRollupService.refresh()
+        written += AttributionService.refresh()
+        logger.info(f"Refreshed {written} tracking rollup rows")
+        return written
+
+    except Exception as e:
+        logger.error(f"Error in update_tracking_rollups task: {str(e)}")
+        return 0
+
+
+@shared_task
+def dispatch_server_side_events():
+    """
+    Forward unprocessed events of server-side pixels to their providers
+    """
+    try:
+        stats = PixelDispatcher.dispatch_all()
+        if stats['sent'] or stats['failed']:
+            logger.info(f"Dispatched {stats['sent']} tracking events, {stats['failed']} rejected")
+        return stats['sent']
+
+    except Exception as e:
+        logger.error(f"Error in dispatch_server_side_events task: {str(e)}")
+        return 0
+
+
+@shared_task
+def flush_idle_funnel_sessions():
+    """
+    Write the funnel state of sessions that went idle to ConversionTracking
+    """
+    try:
+        flushed = FunnelSessionStore.flush_idle()
+        if flushed:
+            logger.info(f"Flushed {flushed} idle funnel sessions")
+        return flushed
+
+    except Exception as e:
+        logger.error(f"Error in flush_idle_funnel_sessions task: {str(e)}")
+        return 0
@@ -1,5 +1,18 @@
 from django.urls import path
+from . import views
 
 urlpatterns = [
-    # Placeholder for tracking URLs
-]
\ No newline at end of file
+    # Event ingestion (public)
+    path('event/', views.TrackEventView.as_view(), name='track-event'),
+    path('events/batch/', views.TrackBatchView.as_view(), name='track-event-batch'),
+    path('pixel-config/', views.get_pixel_config, name='pixel-config'),
+    path('utm/', views.track_utm_parameters, name='track-utm'),
+    
+    # Analytics (admin only)
+    path('pixels/', views.TrackingPixelListView.as_view(), name='tracking-pixels'),
+    path('events/', views.TrackingEventListView.as_view(), name='tracking-events'),
+    path('funnel/', views.conversion_funnel, name='conversion-funnel'),
+    path('attribution/', views.attribution_report, name='attribution-report'),
+    path('stats/', views.tracking_stats, name='tracking-stats'),
+    path('abandoned-carts/', views.abandoned_cart_list, name='abandoned-carts'),
+]
@@ -2,19 +2,29 @@ from rest_framework import status, permissions, generics
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.conf import settings
-from django.db.models import Count, Sum, Avg, Q
+from django.db.models import Count, Q
 from django.utils import timezone
-from django.core.cache import cache
-from datetime import timedelta, date
+from datetime import datetime, timedelta, date
+import json
 from decimal import Decimal
 
+from utils.cache import ConditionalCache
+from utils.db_router import ReplicaReadMixin, use_replica
+
 from .models import TrackingPixel, TrackingEvent, ConversionTracking, AbandonedCart
 from .serializers import (
     TrackingPixelSerializer, TrackingEventSerializer, TrackEventSerializer,
     ConversionTrackingSerializer, AbandonedCartSerializer, PixelConfigSerializer,
     ConversionFunnelSerializer, TrackingStatsSerializer, UTMParametersSerializer
 )
+from .attribution import AttributionService, ATTRIBUTION_GROUPS, TRACKING_ATTRIBUTION_LOOKBACK_DAYS
+from .filters import TrackingEventFilter, TrackingRateThrottle
+from .rollups import TrackingRollupService
+from .signals import PIXEL_CONFIG_NAMESPACE
+from .services import TrackingIngestionService, TrackingEventSchema, TRACKING_MAX_EVENTS_PER_REQUEST
 
 
 class TrackingPixelListView(generics.ListCreateAPIView):
@@ -35,179 +45,123 @@ class TrackEventView(APIView):
     """Track events endpoint"""
     
     permission_classes = [permissions.AllowAny]  # Allow anonymous tracking
+    throttle_classes = [TrackingRateThrottle]
     
     def post(self, request):
         """Track an event"""
+        if TrackingEventFilter.is_bot(request.META.get('HTTP_USER_AGENT', '')):
+            # Accepted but not recorded, so crawlers get nothing to react to
+            return Response({'message': 'Event accepted for tracking.', 'events_queued': 0},
+                            status=status.HTTP_202_ACCEPTED)
+        
         serializer = TrackEventSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         data = serializer.validated_data
+        session_id = self.get_session_id(request, data)
         
-        # Get user info
-        user = request.user if request.user.is_authenticated else None
+        # Events, funnel and abandoned cart rows are written by the tracking consumer
+        envelopes = TrackingEventFilter.deduplicate([
+            TrackingIngestionService.build_envelope(request, data, session_id)
+        ])
+        TrackingIngestionService.enqueue(envelopes)
         
-        # Get request metadata
-        ip_address = self.get_client_ip(request)
-        user_agent = request.META.get('HTTP_USER_AGENT', '')
-        
-        # Get or create session ID
+        return Response({
+            'message': 'Event accepted for tracking.',
+            'events_queued': len(envelopes),
+            'session_id': session_id
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    def get_session_id(self, request, data):
+        """Get or create session ID"""
         session_id = data.get('session_id') or request.session.session_key
         if not session_id:
             request.session.create()
             session_id = request.session.session_key
+        return session_id
+
+
+class BeaconSessionAuthentication(SessionAuthentication):
+    """Session authentication without the CSRF check; sendBeacon cannot send the token"""
+    
+    def enforce_csrf(self, request):
+        return
+
+
+class TrackBatchView(APIView):
+    """Track several events in one request (fetch or navigator.sendBeacon)"""
+    
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = [JWTAuthentication, BeaconSessionAuthentication]
+    throttle_classes = [TrackingRateThrottle]
+    
+    def post(self, request):
+        """Track a batch of events"""
+        if TrackingEventFilter.is_bot(request.META.get('HTTP_USER_AGENT', '')):
+            return Response({'message': 'Events accepted for tracking.', 'events_queued': 0},
+                            status=status.HTTP_202_ACCEPTED)
         
-        # Get active pixels to track
-        pixel_types = data.get('pixel_types', [])
-        if not pixel_types:
-            # Track on all active pixels if none specified
-            pixels = TrackingPixel.objects.filter(is_active=True, track_ecommerce=True)
+        # Beacons arrive as text/plain, so the body is parsed here instead of by DRF
+        try:
+            payload = json.loads(request.body or b'null')
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid JSON payload.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if isinstance(payload, dict):
+            raw_events = payload.get('events')
+            batch_session_id = payload.get('session_id')
         else:
-            pixels = TrackingPixel.objects.filter(
-                is_active=True,
-                pixel_type__in=pixel_types
-            )
+            raw_events = payload
+            batch_session_id = None
         
-        # Create tracking events
-        events_created = []
-        for pixel in pixels:
-            event = TrackingEvent.objects.create(
-                event_name=data['event_name'],
-                event_type=data['event_type'],
-                user=user,
-                session_id=session_id,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                referrer=data.get('referrer', ''),
-                page_url=data.get('page_url', ''),
-                event_data=data.get('event_data', {}),
-                product_id=data.get('product_id', ''),
-                product_name=data.get('product_name', ''),
-                product_category=data.get('product_category', ''),
-                product_price=data.get('product_price'),
-                quantity=data.get('quantity'),
-                value=data.get('value'),
-                currency=data.get('currency', 'EGP'),
-                order_id=data.get('order_id', ''),
-                pixel=pixel
-            )
-            events_created.append(event)
+        if not isinstance(raw_events, list) or not raw_events:
+            return Response({'error': 'A non-empty list of events is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_events) > TRACKING_MAX_EVENTS_PER_REQUEST:
+            return Response({
+                'error': f'At most {TRACKING_MAX_EVENTS_PER_REQUEST} events can be sent per request.'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Update conversion tracking
-        self.update_conversion_tracking(request, data, session_id, user)
+        now = timezone.now()
+        accepted = []
+        errors = {}
+        for index, raw in enumerate(raw_events):
+            data, event_errors = TrackingEventSchema.validate(raw)
+            if event_errors:
+                errors[index] = event_errors
+            else:
+                accepted.append((data, TrackingEventSchema.occurred_at(raw, now)))
+        
+        if not accepted:
+            return Response({'error': 'No valid events.', 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        session_id = batch_session_id if isinstance(batch_session_id, str) and batch_session_id else None
+        session_id = (session_id or request.session.session_key or '')[:100]
+        if not session_id:
+            request.session.create()
+            session_id = request.session.session_key
         
-        # Check for abandoned cart
-        if data['event_type'] == 'add_to_cart' and user:
-            self.check_abandoned_cart(user, session_id, data)
+        envelopes = TrackingEventFilter.deduplicate(
+            TrackingIngestionService.build_envelopes(request, accepted, session_id)
+        )
+        TrackingIngestionService.enqueue(envelopes)
         
         return Response({
-            'message': f'Event tracked successfully on {len(events_created)} pixels.',
-            'events_created': len(events_created),
+            'message': f'{len(accepted)} of {len(raw_events)} events accepted for tracking.',
+            'events_queued': len(envelopes),
+            'errors': errors,
             'session_id': session_id
-        }, status=status.HTTP_201_CREATED)
-    
-    def get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-    
-    def update_conversion_tracking(self, request, data, session_id, user):
-        """Update conversion tracking funnel"""
-        try:
-            # Get or create conversion tracking record
-            conversion, created = ConversionTracking.objects.get_or_create(
-                session_id=session_id,
-                defaults={
-                    'user': user,
-                    'utm_source': request.GET.get('utm_source', ''),
-                    'utm_medium': request.GET.get('utm_medium', ''),
-                    'utm_campaign': request.GET.get('utm_campaign', ''),
-                    'utm_term': request.GET.get('utm_term', ''),
-                    'utm_content': request.GET.get('utm_content', ''),
-                    'referrer': data.get('referrer', ''),
-                }
-            )
-            
-            # Update funnel step timestamps
-            now = timezone.now()
-            event_type = data['event_type']
-            
-            if event_type == 'page_view' and not conversion.landing_at:
-                conversion.landing_at = now
-            elif event_type == 'view_content' and not conversion.product_view_at:
-                conversion.product_view_at = now
-                if data.get('product_name') and not conversion.first_product_viewed:
-                    conversion.first_product_viewed = data['product_name']
-                
-                # Add to viewed products list
-                products_viewed = conversion.products_viewed or []
-                if data.get('product_name') and data['product_name'] not in products_viewed:
-                    products_viewed.append(data['product_name'])
-                    conversion.products_viewed = products_viewed
-                    
-            elif event_type == 'add_to_cart' and not conversion.add_to_cart_at:
-                conversion.add_to_cart_at = now
-                if data.get('value'):
-                    conversion.cart_value = data['value']
-                    
-            elif event_type == 'initiate_checkout' and not conversion.checkout_start_at:
-                conversion.checkout_start_at = now
-                
-            elif event_type == 'add_payment_info' and not conversion.payment_info_at:
-                conversion.payment_info_at = now
-                
-            elif event_type == 'purchase' and not conversion.purchase_at:
-                conversion.purchase_at = now
-                if data.get('value'):
-                    conversion.order_value = data['value']
-                if data.get('order_id'):
-                    conversion.order_id = data['order_id']
-            
-            conversion.save()
-            
-        except Exception:
-            # Don't fail the main request if conversion tracking fails
-            pass
-    
-    def check_abandoned_cart(self, user, session_id, data):
-        """Check and create abandoned cart record"""
-        try:
-            # Create or update abandoned cart
-            abandoned_cart, created = AbandonedCart.objects.get_or_create(
-                user=user,
-                session_id=session_id,
-                is_recovered=False,
-                defaults={
-                    'cart_items': [],
-                    'cart_value': Decimal('0.00')
-                }
-            )
-            
-            # Update cart value
-            if data.get('value'):
-                abandoned_cart.cart_value = data['value']
-                abandoned_cart.save()
-                
-        except Exception:
-            # Don't fail the main request
-            pass
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def get_pixel_config(request):
     """Get pixel configuration for frontend"""
-    cache_key = 'pixel_config'
-    config = cache.get(cache_key)
-    
-    if not config:
+    def build():
         # Get active pixels
         pixels = TrackingPixel.objects.filter(is_active=True)
-        
+
         config = {
             'facebook_pixel_id': getattr(settings, 'FACEBOOK_PIXEL_ID', ''),
             'google_analytics_id': getattr(settings, 'GOOGLE_ANALYTICS_ID', ''),
@@ -215,7 +169,7 @@ def get_pixel_config(request):
             'snapchat_pixel_id': getattr(settings, 'SNAPCHAT_PIXEL_ID', ''),
             'custom_pixels': []
         }
-        
+
         # Add database-configured pixels
         for pixel in pixels:
             if pixel.pixel_type == 'facebook' and pixel.pixel_id:
@@ -232,32 +186,36 @@ def get_pixel_config(request):
                     'head_code': pixel.head_code,
                     'body_code': pixel.body_code,
                 })
-        
-        # Cache for 30 minutes
-        cache.set(cache_key, config, 1800)
-    
-    serializer = PixelConfigSerializer(config)
-    return Response(serializer.data)
+
+        return PixelConfigSerializer(config).data
+
+    # Rebuilt when a pixel changes (see signals), so it can be kept for a day
+    snapshot = ConditionalCache.get_snapshot(PIXEL_CONFIG_NAMESPACE, build)
+    return ConditionalCache.response(request, snapshot)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def conversion_funnel(request):
     """Get conversion funnel analytics"""
     # Get date range
     days = int(request.GET.get('days', 30))
     start_date = timezone.now() - timedelta(days=days)
     
-    # Get conversion data
-    conversions = ConversionTracking.objects.filter(created_at__gte=start_date)
+    # Funnel step counts come from the daily session rollups
+    steps = TrackingRollupService.totals('funnel_step', since=start_date)
+    
+    def step_count(step):
+        return steps.get(step, {}).get('count', 0)
     
-    total_sessions = conversions.count()
-    landing_page = conversions.filter(landing_at__isnull=False).count()
-    product_views = conversions.filter(product_view_at__isnull=False).count()
-    add_to_cart = conversions.filter(add_to_cart_at__isnull=False).count()
-    checkout_start = conversions.filter(checkout_start_at__isnull=False).count()
-    payment_info = conversions.filter(payment_info_at__isnull=False).count()
-    purchases = conversions.filter(purchase_at__isnull=False).count()
+    total_sessions = step_count('sessions')
+    landing_page = step_count('landing')
+    product_views = step_count('product_view')
+    add_to_cart = step_count('add_to_cart')
+    checkout_start = step_count('checkout_start')
+    payment_info = step_count('payment_info')
+    purchases = step_count('purchase')
     
     # Calculate conversion rates
     def safe_divide(a, b):
@@ -285,55 +243,116 @@ def conversion_funnel(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
+def attribution_report(request):
+    """Revenue attribution per UTM channel (first touch, last touch, linear)"""
+    group_by = request.GET.get('group_by', 'campaign')
+    if group_by not in ATTRIBUTION_GROUPS:
+        return Response(
+            {'error': f"group_by must be one of: {', '.join(ATTRIBUTION_GROUPS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    if start_date and end_date:
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    else:
+        days = int(request.GET.get('days', 30))
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=days - 1)
+
+    # Purchase days are bucketed in local time; the end date is inclusive
+    start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    channels = AttributionService.report(start, end, group_by)
+
+    totals = {
+        'conversions': sum((row['last_touch']['conversions'] for row in channels), Decimal('0')),
+        'revenue': sum((row['last_touch']['revenue'] for row in channels), Decimal('0.00')),
+    }
+    return Response({
+        'period': {'start_date': start_date, 'end_date': end_date},
+        'group_by': group_by,
+        'lookback_days': TRACKING_ATTRIBUTION_LOOKBACK_DAYS,
+        'totals': totals,
+        'channels': channels,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@use_replica
 def tracking_stats(request):
     """Get tracking statistics"""
     # Get date ranges
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
+    today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago = today_start - timedelta(days=7)
+    month_ago = today_start - timedelta(days=30)
+    
+    # Event counts from the daily rollups (refreshed every few minutes)
+    total_events = today_events = week_events = month_events = 0
+    event_totals = {}
+    for row in TrackingRollupService.daily_rows('event_type'):
+        total = event_totals.setdefault(row['key'], {'count': 0, 'value_sum': Decimal('0.00'), 'value_count': 0})
+        total['count'] += row['count']
+        total['value_sum'] += row['value_sum']
+        total['value_count'] += row['value_count']
+        
+        total_events += row['count']
+        if row['period_start'] >= today_start:
+            today_events += row['count']
+        if row['period_start'] >= week_ago:
+            week_events += row['count']
+        if row['period_start'] >= month_ago:
+            month_events += row['count']
     
-    # Get event counts
-    all_events = TrackingEvent.objects.all()
-    total_events = all_events.count()
-    page_views = all_events.filter(event_type='page_view').count()
-    product_views = all_events.filter(event_type='view_content').count()
-    add_to_cart_events = all_events.filter(event_type='add_to_cart').count()
-    purchase_events = all_events.filter(event_type='purchase').count()
+    def event_count(event_type):
+        return event_totals.get(event_type, {}).get('count', 0)
     
-    # Time-based counts
-    today_events = all_events.filter(created_at__date=today).count()
-    week_events = all_events.filter(created_at__date__gte=week_ago).count()
-    month_events = all_events.filter(created_at__date__gte=month_ago).count()
+    page_views = event_count('page_view')
+    product_views = event_count('view_content')
+    add_to_cart_events = event_count('add_to_cart')
+    purchase_events = event_count('purchase')
     
     # Conversion data
-    conversions = ConversionTracking.objects.all()
-    total_conversions = conversions.filter(purchase_at__isnull=False).count()
+    total_conversions = TrackingRollupService.totals('funnel_step').get('purchase', {}).get('count', 0)
     conversion_rate = (total_conversions / total_events * 100) if total_events > 0 else 0
     
     # Average order value
-    purchase_values = all_events.filter(
-        event_type='purchase',
-        value__isnull=False
-    ).aggregate(avg_value=Avg('value'))
-    average_order_value = purchase_values['avg_value'] or Decimal('0.00')
+    purchases = event_totals.get('purchase')
+    if purchases and purchases['value_count']:
+        average_order_value = purchases['value_sum'] / purchases['value_count']
+    else:
+        average_order_value = Decimal('0.00')
     
     # Abandoned cart data
-    abandoned_carts = AbandonedCart.objects.count()
-    recovered_carts = AbandonedCart.objects.filter(is_recovered=True).count()
+    cart_counts = AbandonedCart.objects.aggregate(
+        total=Count('id'),
+        recovered=Count('id', filter=Q(is_recovered=True)),
+    )
+    abandoned_carts = cart_counts['total']
+    recovered_carts = cart_counts['recovered']
     cart_recovery_rate = (recovered_carts / abandoned_carts * 100) if abandoned_carts > 0 else 0
     
     # Top traffic sources
-    top_sources = conversions.values('utm_source').annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
+    top_sources = [
+        {'utm_source': source, 'count': count}
+        for source, count in TrackingRollupService.top('utm_source', limit=5)
+    ]
     
     # Top products
-    top_products = all_events.filter(
-        event_type='view_content',
-        product_name__isnull=False
-    ).values('product_name').annotate(
-        views=Count('id')
-    ).order_by('-views')[:10]
+    top_products = [
+        {'product_name': product_name, 'views': views}
+        for product_name, views in TrackingRollupService.top('product', limit=10)
+    ]
     
     stats_data = {
         'total_events': total_events,
@@ -350,8 +369,8 @@ def tracking_stats(request):
         'today_events': today_events,
         'week_events': week_events,
         'month_events': month_events,
-        'top_traffic_sources': list(top_sources),
-        'top_products': list(top_products),
+        'top_traffic_sources': top_sources,
+        'top_products': top_products,
     }
     
     serializer = TrackingStatsSerializer(stats_data)
@@ -360,6 +379,7 @@ def tracking_stats(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@use_replica
 def abandoned_cart_list(request):
     """Get abandoned carts list"""
     abandoned_carts = AbandonedCart.objects.filter(
@@ -396,7 +416,7 @@ def track_utm_parameters(request):
     })
 
 
-class TrackingEventListView(generics.ListAPIView):
+class TrackingEventListView(ReplicaReadMixin, generics.ListAPIView):
     """List tracking events (admin only)"""
     
     serializer_class = TrackingEventSerializer
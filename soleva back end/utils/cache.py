@@ -8,8 +8,11 @@ from functools import wraps
 from django.core.cache import cache
 from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
+from django.utils import timezone
 from django.utils.encoding import force_str
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
 import hashlib
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -242,6 +245,147 @@ class SessionCache:
         cache_key = SessionCache.get_session_key(session_key, prefix)
         CacheManager.delete_cache(cache_key)
 
+# Namespace versioning for snapshot-style caches
+class VersionedCache:
+    """Versioned cache namespaces - bumping the version invalidates every key at once"""
+
+    @staticmethod
+    def get_version_key(namespace: str) -> str:
+        """Generate the version counter key for a namespace"""
+        return f"version:{namespace}"
+
+    @staticmethod
+    def get_version(namespace: str, timeout: Optional[int] = None) -> int:
+        """Get the current version of a namespace, initialising it if missing
+
+        ``timeout`` lets per-object namespaces expire; an expired counter is
+        re-seeded, which only costs a miss.
+        """
+        version_key = VersionedCache.get_version_key(namespace)
+        try:
+            version = cache.get(version_key)
+            if version is None:
+                # Seed from the clock so a flushed counter never reuses old keys
+                cache.add(version_key, int(time.time() * 1000), timeout)
+                version = cache.get(version_key)
+            return int(version or 0)
+        except Exception as e:
+            logger.error(f"Cache version read error for {namespace}: {e}")
+            return 0
+
+    @staticmethod
+    def bump_version(namespace: str) -> int:
+        """Invalidate a namespace by moving it to a new version"""
+        version_key = VersionedCache.get_version_key(namespace)
+        try:
+            return cache.incr(version_key)
+        except ValueError:
+            version = int(time.time() * 1000)
+            cache.set(version_key, version, None)
+            return version
+        except Exception as e:
+            logger.error(f"Cache version bump error for {namespace}: {e}")
+            return 0
+
+    @staticmethod
+    def make_key(namespace: str, *parts, version: Optional[int] = None,
+                 version_timeout: Optional[int] = None) -> str:
+        """Generate a key scoped to the current (or given) namespace version"""
+        if version is None:
+            version = VersionedCache.get_version(namespace, version_timeout)
+        suffix = ':'.join(str(part) for part in parts)
+        return f"{namespace}:v{version}:{suffix}" if suffix else f"{namespace}:v{version}"
+
+    @staticmethod
+    def get_or_build(namespace: str, builder: Callable[[], Any], *parts,
+                     timeout: Union[int, str] = 'medium', version_timeout: Optional[int] = None) -> Any:
+        """Return the cached value for the current version, building it on a miss"""
+        if isinstance(timeout, str):
+            timeout = CACHE_TIMEOUTS.get(timeout, CACHE_TIMEOUTS['medium'])
+
+        cache_key = VersionedCache.make_key(namespace, *parts, version_timeout=version_timeout)
+        try:
+            value = cache.get(cache_key)
+        except Exception as e:
+            logger.error(f"Cache get error for key {cache_key}: {e}")
+            value = None
+        if value is not None:
+            return value
+
+        value = builder()
+        try:
+            cache.set(cache_key, value, timeout)
+        except Exception as e:
+            logger.error(f"Cache set error for key {cache_key}: {e}")
+        return value
+
+# Versioned public payloads with HTTP validators
+class ConditionalCache:
+    """Versioned payload snapshots carrying ETag/Last-Modified so clients can revalidate with 304s"""
+
+    @staticmethod
+    def make_snapshot(data: Any, valid_until: Any = None) -> dict:
+        """Payload with its validators"""
+        body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+        return {
+            'data': data,
+            'etag': f'"{hashlib.md5(body.encode()).hexdigest()}"',
+            'last_modified': int(time.time()),
+            'valid_until': valid_until,
+        }
+
+    @staticmethod
+    def get_snapshot(namespace: str, builder: Callable[[], Any], *parts,
+                     timeout: Union[int, str] = 'long',
+                     valid_until: Optional[Callable[[], Any]] = None) -> dict:
+        """Cached snapshot of ``builder()``; ``valid_until`` bounds time-dependent payloads"""
+        def build():
+            return ConditionalCache.make_snapshot(builder(), valid_until() if valid_until else None)
+
+        snapshot = VersionedCache.get_or_build(namespace, build, *parts, timeout=timeout)
+        if snapshot['valid_until'] is not None and snapshot['valid_until'] <= timezone.now():
+            # Something scheduled started or ended since the snapshot was built
+            VersionedCache.bump_version(namespace)
+            snapshot = VersionedCache.get_or_build(namespace, build, *parts, timeout=timeout)
+        return snapshot
+
+    @staticmethod
+    def not_modified(request, snapshot: dict) -> bool:
+        """Whether the request's validators match the snapshot"""
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            # Compression middleware may have weakened the ETag we sent
+            etags = [etag[2:] if etag.startswith('W/') else etag for etag in parse_etags(if_none_match)]
+            return '*' in etags or snapshot['etag'] in etags
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE') or '')
+        return if_modified_since is not None and snapshot['last_modified'] <= if_modified_since
+
+    @staticmethod
+    def response(request, snapshot: dict, private: bool = False):
+        """DRF response for a snapshot: 304 when the client copy is current"""
+        from rest_framework import status
+        from rest_framework.response import Response
+
+        if ConditionalCache.not_modified(request, snapshot):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(snapshot['data'])
+        response['ETag'] = snapshot['etag']
+        response['Last-Modified'] = http_date(snapshot['last_modified'])
+        # Caches may store the payload but must revalidate it every time;
+        # per-customer payloads stay out of shared caches
+        response['Cache-Control'] = f"{'private' if private else 'public'}, max-age=0, must-revalidate"
+        return response
+
+# Direct Redis access for structures the cache API cannot express (lists, hashes, sorted sets)
+def get_redis_client():
+    """Raw Redis client behind the default cache, or None when the cache is not Redis"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
 # Cache warming utilities
 class CacheWarmer:
     """Utilities to pre-warm cache with important data"""
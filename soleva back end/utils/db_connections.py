@@ -0,0 +1,78 @@
+"""
+Per-process database connection metrics
+
+Counts connections opened per alias against requests and Celery tasks
+served, so the reuse ratio shows whether persistent connections (or the
+pooler) are doing their job in this process.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
+from celery.signals import task_postrun
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+class ConnectionMetrics:
+    """Counters of this process; every worker process keeps its own"""
+
+    lock = threading.Lock()
+    started_at = time.time()
+    opened: Dict[str, int] = defaultdict(int)
+    units = 0
+
+    @staticmethod
+    def connection_opened(alias: str) -> None:
+        with ConnectionMetrics.lock:
+            ConnectionMetrics.opened[alias] += 1
+
+    @staticmethod
+    def unit_finished() -> None:
+        """A request or task finished"""
+        with ConnectionMetrics.lock:
+            ConnectionMetrics.units += 1
+
+    @staticmethod
+    def snapshot() -> Dict:
+        with ConnectionMetrics.lock:
+            opened = dict(ConnectionMetrics.opened)
+            units = ConnectionMetrics.units
+        databases = {}
+        for alias in connections:
+            settings_dict = connections.settings[alias]
+            databases[alias] = {
+                'connections_opened': opened.get(alias, 0),
+                'conn_max_age': settings_dict.get('CONN_MAX_AGE', 0),
+                'health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+                'server_side_cursors': not settings_dict.get('DISABLE_SERVER_SIDE_CURSORS', False),
+            }
+        total_opened = sum(opened.values())
+        return {
+            'pid': os.getpid(),
+            'uptime_seconds': int(time.time() - ConnectionMetrics.started_at),
+            'requests_and_tasks': units,
+            'connections_opened': total_opened,
+            'requests_per_connection': round(units / total_opened, 2) if total_opened else None,
+            'databases': databases,
+        }
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    ConnectionMetrics.connection_opened(connection.alias)
+
+
+@receiver(request_finished)
+def count_request(sender, **kwargs):
+    ConnectionMetrics.unit_finished()
+
+
+@task_postrun.connect
+def count_task(sender=None, **kwargs):
+    ConnectionMetrics.unit_finished()
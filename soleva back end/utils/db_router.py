@@ -0,0 +1,164 @@
+"""
+Read replica routing
+
+Reads go to the primary unless a view or task opts in (``ReplicaReadMixin``,
+``use_replica`` or ``replica_reads``); inside that scope they are served by
+one of the DATABASE_REPLICAS aliases. Reads stay on the primary when:
+
+* the scope already wrote the model (read-your-writes within a request),
+* a transaction is open on the primary,
+* the user wrote something in the last REPLICA_STICKY_SECONDS seconds, so
+  replication lag never hides a customer's own order or cart change.
+"""
+
+import logging
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+DATABASE_REPLICAS = getattr(settings, 'DATABASE_REPLICAS', [])
+
+# Longer than the worst replication lag we accept
+REPLICA_STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 15)
+
+# Writes to these apps (sessions, analytics beacons) do not pin a user to the primary
+REPLICA_PIN_EXEMPT_APPS = getattr(settings, 'REPLICA_PIN_EXEMPT_APPS', ['sessions', 'tracking'])
+
+PIN_KEY = 'db_primary_pin:{}'
+
+
+class RoutingState:
+    """Routing decisions of one request or task"""
+
+    def __init__(self):
+        self.replica = False
+        self.alias: Optional[str] = None
+        self.written: Set[str] = set()
+
+    def replica_alias(self) -> str:
+        # One replica per scope so its reads see a single snapshot
+        if self.alias is None:
+            self.alias = random.choice(DATABASE_REPLICAS)
+        return self.alias
+
+
+_state: ContextVar[Optional[RoutingState]] = ContextVar('db_routing_state', default=None)
+
+
+def primary_pinned(user) -> bool:
+    """Whether ``user`` wrote recently enough that replicas may not have their change"""
+    if user is None or not user.is_authenticated:
+        return False
+    try:
+        return bool(cache.get(PIN_KEY.format(user.pk)))
+    except Exception as e:
+        logger.warning(f"Replica pin unavailable: {str(e)}")
+        return True
+
+
+def pin_to_primary(user) -> None:
+    try:
+        cache.set(PIN_KEY.format(user.pk), 1, REPLICA_STICKY_SECONDS)
+    except Exception as e:
+        logger.warning(f"Replica pin unavailable: {str(e)}")
+
+
+@contextmanager
+def replica_reads(user=None):
+    """Serve reads in this block from a replica (tasks, commands)"""
+    token = _state.set(RoutingState()) if _state.get() is None else None
+    state = _state.get()
+    previous = state.replica
+    state.replica = bool(DATABASE_REPLICAS) and not primary_pinned(user)
+    try:
+        yield
+    finally:
+        state.replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def route_request_to_replica(request) -> None:
+    """Serve the rest of a safe request's reads from a replica"""
+    state = _state.get()
+    if state is not None and DATABASE_REPLICAS and request.method in SAFE_METHODS:
+        state.replica = not primary_pinned(request.user)
+
+
+def use_replica(view):
+    """Function view reading from a replica; place it below ``@api_view``"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        route_request_to_replica(request)
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+class ReplicaReadMixin:
+    """Viewset whose safe requests read from a replica"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # After authentication, so JWT users are known for the pin check
+        route_request_to_replica(request)
+
+
+class ReplicaRouter:
+    """Writes and migrations on the primary; reads on a replica inside a replica scope"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica:
+            return None
+        if model._meta.label in state.written or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.written.add(model._meta.label)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        if db in DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Scope routing state to a request and pin users who wrote to the primary"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        # DRF copies the authenticated (JWT) user onto the Django request
+        user = getattr(request, 'user', None)
+        pinning_writes = {label for label in state.written if label.split('.')[0] not in REPLICA_PIN_EXEMPT_APPS}
+        if pinning_writes and user is not None and user.is_authenticated:
+            pin_to_primary(user)
+        return response
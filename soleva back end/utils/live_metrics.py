@@ -0,0 +1,148 @@
+"""
+Live dashboard counters kept in Redis
+
+Writers increment per-minute and per-day counters as orders, carts and
+tracking events happen; readers share one snapshot per process per
+interval, so the cost of the live dashboard does not grow with the number
+of admins watching it.
+"""
+
+import logging
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from utils.cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Seconds between snapshots pushed to live dashboards
+LIVE_METRICS_INTERVAL = getattr(settings, 'LIVE_METRICS_INTERVAL', 2)
+
+# Minutes of per-minute history included in a snapshot
+LIVE_METRICS_WINDOW = getattr(settings, 'LIVE_METRICS_WINDOW', 60)
+
+# A cart counts as active while it changed within this many seconds
+LIVE_CART_ACTIVITY = getattr(settings, 'LIVE_CART_ACTIVITY', 1800)
+
+MINUTE_KEY = 'live:{}:minute:{}'
+DAY_KEY = 'live:{}:day:{}'
+ACTIVE_CARTS_KEY = 'live:carts:active'
+
+MINUTE_TTL = 2 * 3600
+DAY_TTL = 3 * 86400
+
+COUNTERS = ['orders', 'revenue', 'events']
+
+
+class LiveMetrics:
+    """Increment and read the live dashboard counters"""
+
+    _snapshot = None
+    _snapshot_at = 0.0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def increment(counters: Dict[str, float], moment: Optional[float] = None) -> None:
+        """Add to the current minute and day of each counter; never raises"""
+        client = get_redis_client()
+        if client is None:
+            return
+        moment = moment or time.time()
+        minute = int(moment // 60)
+        day = timezone.localdate().isoformat()
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for name, amount in counters.items():
+                for key, ttl in ((MINUTE_KEY.format(name, minute), MINUTE_TTL),
+                                 (DAY_KEY.format(name, day), DAY_TTL)):
+                    if isinstance(amount, int):
+                        pipeline.incrby(key, amount)
+                    else:
+                        pipeline.incrbyfloat(key, float(amount))
+                    pipeline.expire(key, ttl)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Live metrics unavailable: {str(e)}")
+
+    @staticmethod
+    def record_order(total_amount: Decimal) -> None:
+        LiveMetrics.increment({'orders': 1, 'revenue': total_amount or Decimal('0.00')})
+
+    @staticmethod
+    def record_events(count: int) -> None:
+        if count:
+            LiveMetrics.increment({'events': count})
+
+    @staticmethod
+    def touch_cart(cart_id) -> None:
+        """Mark a cart as active now"""
+        client = get_redis_client()
+        if client is None:
+            return
+        now = time.time()
+        try:
+            pipeline = client.pipeline(transaction=False)
+            pipeline.zadd(ACTIVE_CARTS_KEY, {str(cart_id): now})
+            pipeline.zremrangebyscore(ACTIVE_CARTS_KEY, '-inf', now - LIVE_CART_ACTIVITY)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Live metrics unavailable: {str(e)}")
+
+    @staticmethod
+    def read() -> Dict:
+        """Current counters straight from Redis (one round trip)"""
+        now = time.time()
+        current_minute = int(now // 60)
+        minutes = list(range(current_minute - LIVE_METRICS_WINDOW + 1, current_minute + 1))
+        day = timezone.localdate().isoformat()
+
+        snapshot = {
+            'available': False,
+            'generated_at': timezone.now().isoformat(),
+            'today': {name: 0 for name in COUNTERS},
+            'per_minute': {name: [0] * len(minutes) for name in COUNTERS},
+            'active_carts': 0,
+        }
+        client = get_redis_client()
+        if client is None:
+            return snapshot
+
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for name in COUNTERS:
+                pipeline.get(DAY_KEY.format(name, day))
+                pipeline.mget([MINUTE_KEY.format(name, minute) for minute in minutes])
+            pipeline.zcount(ACTIVE_CARTS_KEY, now - LIVE_CART_ACTIVITY, '+inf')
+            results = pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Live metrics unavailable: {str(e)}")
+            return snapshot
+
+        def number(value, name):
+            if value is None:
+                return 0
+            return round(float(value), 2) if name == 'revenue' else int(value)
+
+        for index, name in enumerate(COUNTERS):
+            day_total, per_minute = results[index * 2:index * 2 + 2]
+            snapshot['today'][name] = number(day_total, name)
+            snapshot['per_minute'][name] = [number(value, name) for value in per_minute]
+        snapshot['active_carts'] = results[-1]
+        snapshot['events_per_minute'] = snapshot['per_minute']['events'][-2] if len(minutes) > 1 else 0
+        snapshot['minute_start'] = minutes[0] * 60
+        snapshot['available'] = True
+        return snapshot
+
+    @staticmethod
+    def snapshot() -> Dict:
+        """Counters shared by every stream in this process, refreshed once per interval"""
+        with LiveMetrics._lock:
+            if LiveMetrics._snapshot is None or time.monotonic() - LiveMetrics._snapshot_at >= LIVE_METRICS_INTERVAL:
+                LiveMetrics._snapshot = LiveMetrics.read()
+                LiveMetrics._snapshot_at = time.monotonic()
+            return LiveMetrics._snapshot
@@ -0,0 +1,74 @@
+"""
+Dashboard statistics built as one conditional aggregation per table
+"""
+
+import logging
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+
+logger = logging.getLogger(__name__)
+
+# Dashboards are polled; a short TTL absorbs bursts without hiding new orders for long
+STATS_CACHE_TIMEOUT = getattr(settings, 'STATS_CACHE_TIMEOUT', 60)
+
+
+class StatsQuery:
+    """
+    Named counters over one queryset, computed in a single scan
+
+    Each counter becomes ``COUNT/SUM/AVG(... ) FILTER (WHERE ...)`` (a CASE
+    expression on databases without FILTER) in one ``aggregate()`` call.
+    """
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.aggregates = {}
+        self.defaults = {}
+
+    @staticmethod
+    def condition(conditions, lookups) -> Optional[Q]:
+        condition = Q(*conditions, **lookups)
+        return condition if condition else None
+
+    def count(self, name: str, *conditions: Q, **lookups) -> 'StatsQuery':
+        self.aggregates[name] = Count('pk', filter=self.condition(conditions, lookups))
+        self.defaults[name] = 0
+        return self
+
+    def sum(self, name: str, field: str, *conditions: Q, default: Any = Decimal('0.00'), **lookups) -> 'StatsQuery':
+        self.aggregates[name] = Sum(field, filter=self.condition(conditions, lookups))
+        self.defaults[name] = default
+        return self
+
+    def avg(self, name: str, field: str, *conditions: Q, default: Any = Decimal('0.00'), **lookups) -> 'StatsQuery':
+        self.aggregates[name] = Avg(field, filter=self.condition(conditions, lookups))
+        self.defaults[name] = default
+        return self
+
+    def run(self) -> Dict[str, Any]:
+        """Evaluate every counter with one query"""
+        results = self.queryset.aggregate(**self.aggregates)
+        return {
+            name: self.defaults[name] if value is None else value
+            for name, value in results.items()
+        }
+
+    def cached(self, key: str, timeout: int = STATS_CACHE_TIMEOUT) -> Dict[str, Any]:
+        """``run()`` behind a short-lived cache entry; ``key`` must include the scope"""
+        cache_key = f'stats:{key}'
+        try:
+            results = cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Stats cache unavailable: {str(e)}")
+            return self.run()
+        if results is None:
+            results = self.run()
+            try:
+                cache.set(cache_key, results, timeout)
+            except Exception as e:
+                logger.warning(f"Stats cache unavailable: {str(e)}")
+        return results
@@ -1,10 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import UserMessage, SiteConfiguration
+from utils.cache import VersionedCache
+from .models import UserMessage, SiteConfiguration, WebsiteSection, NotificationBanner
 
 User = get_user_model()
 
+# Versioned cache namespace of the public sections, config and banners endpoints
+PUBLIC_CONTENT_NAMESPACE = 'website_public'
+
 
 @receiver(post_save, sender=User)
 def create_welcome_message(sender, instance, created, **kwargs):
@@ -43,3 +47,11 @@ def update_site_config_cache(sender, instance, **kwargs):
     from django.core.cache import cache
     cache.delete('site_configuration')
     cache.delete('site_config_public')
+
+
+@receiver([post_save, post_delete], sender=WebsiteSection)
+@receiver([post_save, post_delete], sender=SiteConfiguration)
+@receiver([post_save, post_delete], sender=NotificationBanner)
+def invalidate_public_content(sender, instance, **kwargs):
+    """Rebuild the public content snapshots after any change"""
+    VersionedCache.bump_version(PUBLIC_CONTENT_NAMESPACE)
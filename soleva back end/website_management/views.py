@@ -3,10 +3,14 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Q, Min
 from django.utils import timezone
+from datetime import timedelta
+
+from utils.cache import ConditionalCache
 
 from .models import WebsiteSection, SiteConfiguration, NotificationBanner, UserMessage
+from .signals import PUBLIC_CONTENT_NAMESPACE
 from .serializers import (
     WebsiteSectionSerializer, SiteConfigurationSerializer, 
     NotificationBannerSerializer, UserMessageSerializer, UserMessageCreateSerializer,
@@ -104,23 +108,32 @@ class UserMessageDetailView(generics.RetrieveUpdateDestroyAPIView):
 def website_sections_public(request):
     """Public endpoint to get active website sections"""
     section_type = request.GET.get('section_type')
-    
-    queryset = WebsiteSection.objects.filter(is_active=True).order_by('display_order', 'created_at')
-    
-    if section_type:
-        queryset = queryset.filter(section_type=section_type)
-    
-    serializer = WebsiteSectionPublicSerializer(queryset, many=True)
-    return Response(serializer.data)
+    # Only known types get a cache entry, so arbitrary values cannot fill the cache
+    if section_type and section_type not in dict(WebsiteSection.SECTION_TYPES):
+        return Response({
+            'error': f'Unknown section_type: {section_type}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    def build():
+        queryset = WebsiteSection.objects.filter(is_active=True).order_by('display_order', 'created_at')
+        if section_type:
+            queryset = queryset.filter(section_type=section_type)
+        return WebsiteSectionPublicSerializer(queryset, many=True).data
+
+    snapshot = ConditionalCache.get_snapshot(PUBLIC_CONTENT_NAMESPACE, build, 'sections', section_type or 'all')
+    return ConditionalCache.response(request, snapshot)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def site_configuration_public(request):
     """Public endpoint to get site configuration"""
-    config, created = SiteConfiguration.objects.get_or_create()
-    serializer = SiteConfigurationPublicSerializer(config)
-    return Response(serializer.data)
+    def build():
+        config, created = SiteConfiguration.objects.get_or_create()
+        return SiteConfigurationPublicSerializer(config).data
+
+    snapshot = ConditionalCache.get_snapshot(PUBLIC_CONTENT_NAMESPACE, build, 'config')
+    return ConditionalCache.response(request, snapshot)
 
 
 @api_view(['GET'])
@@ -128,19 +141,41 @@ def site_configuration_public(request):
 def notification_banners_public(request):
     """Public endpoint to get active notification banners"""
     location = request.GET.get('location', 'all_pages')
-    
-    now = timezone.now()
-    queryset = NotificationBanner.objects.filter(
+    if location not in dict(NotificationBanner.DISPLAY_LOCATIONS):
+        return Response({
+            'error': f'Unknown location: {location}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    banners = NotificationBanner.objects.filter(
         is_active=True,
         display_location__in=[location, 'all_pages']
-    ).filter(
-        Q(start_date__isnull=True) | Q(start_date__lte=now)
-    ).filter(
-        Q(end_date__isnull=True) | Q(end_date__gte=now)
-    ).order_by('-priority', 'display_order')
-    
-    serializer = NotificationBannerPublicSerializer(queryset, many=True)
-    return Response(serializer.data)
+    )
+
+    def build():
+        now = timezone.now()
+        queryset = banners.filter(
+            Q(start_date__isnull=True) | Q(start_date__lte=now)
+        ).filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=now)
+        ).order_by('-priority', 'display_order')
+        return NotificationBannerPublicSerializer(queryset, many=True).data
+
+    def next_change():
+        """The next moment a scheduled banner appears or disappears"""
+        now = timezone.now()
+        boundaries = banners.aggregate(
+            next_start=Min('start_date', filter=Q(start_date__gt=now)),
+            next_end=Min('end_date', filter=Q(end_date__gte=now)),
+        )
+        moments = [boundaries['next_start']]
+        if boundaries['next_end']:
+            moments.append(boundaries['next_end'] + timedelta(microseconds=1))
+        moments = [moment for moment in moments if moment]
+        return min(moments) if moments else None
+
+    snapshot = ConditionalCache.get_snapshot(
+        PUBLIC_CONTENT_NAMESPACE, build, 'banners', location, valid_until=next_change
+    )
+    return ConditionalCache.response(request, snapshot)
 
 
 # User Views (require authentication)
@@ -241,6 +276,22 @@ def bulk_send_message(request):
     if target_criteria.get('last_login_after'):
         users_queryset = users_queryset.filter(last_login__gte=target_criteria['last_login_after'])
     
+    # Filter by purchase history (indexed lookups on the customer metrics table)
+    if target_criteria.get('segments'):
+        users_queryset = users_queryset.filter(customer_metrics__segment__in=target_criteria['segments'])
+    
+    if target_criteria.get('min_lifetime_value'):
+        users_queryset = users_queryset.filter(customer_metrics__lifetime_value__gte=target_criteria['min_lifetime_value'])
+    
+    if target_criteria.get('min_orders'):
+        users_queryset = users_queryset.filter(customer_metrics__order_count__gte=target_criteria['min_orders'])
+    
+    if target_criteria.get('last_order_after'):
+        users_queryset = users_queryset.filter(customer_metrics__last_order_at__gte=target_criteria['last_order_after'])
+    
+    if target_criteria.get('last_order_before'):
+        users_queryset = users_queryset.filter(customer_metrics__last_order_at__lte=target_criteria['last_order_before'])
+    
     # Create messages
     messages_created = 0
     for user in users_queryset: